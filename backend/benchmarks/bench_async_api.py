@@ -0,0 +1,81 @@
+"""
+So sánh throughput /api/feed giữa handler sync (client redis blocking, chạy trong threadpool)
+và handler async (redis.asyncio) ở 50-500 client đồng thời, qua ASGI in-process.
+
+    python -m benchmarks.bench_async_api --clients 50 100 250 500 --requests 2000
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.common import db, reset_db, emit
+import main
+
+def seed(n_channels=50, videos_per_channel=40):
+    pipe = db.r.pipeline(transaction=False)
+    for c in range(n_channels):
+        cid = f"UCbench{c:04d}"
+        pipe.hset(f"channel:{cid}:info", mapping={"id": cid, "name": f"Kênh {c}", "avatar": "", "last_sync": 0})
+        pipe.sadd(db.CHANNEL_REGISTRY_KEY, cid)
+        for i in range(videos_per_channel):
+            vid = f"v{c:04d}{i:04d}"
+            ts = 1_700_000_000 + c * videos_per_channel + i
+            pipe.set(f"video:{vid}", db.pack_video(vid, cid, ts, f"Video {vid}"))
+            pipe.zadd(f"channel:{cid}:videos", {vid: ts})
+            pipe.zadd("videos:all", {vid: ts})
+            pipe.zadd("videos:score", {vid: random.randint(0, 100)})
+        pipe.execute()
+
+def legacy_sync_app():
+    """Handler sync kiểu cũ: blocking redis, FastAPI đẩy vào threadpool"""
+    app = FastAPI()
+
+    @app.get("/api/feed")
+    def get_feed(limit: int = 10):
+        video_ids = db.get_global_video_ids(limit=200, sort_by="score_asc")
+        random.shuffle(video_ids)
+        return [main.to_video_response(v) for v in db.get_videos_from_ids(video_ids[:limit])]
+
+    return app
+
+async def run_load(app, clients, total_requests):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        per_client = max(1, total_requests // clients)
+
+        async def one_client():
+            for _ in range(per_client):
+                resp = await client.get("/api/feed?limit=10")
+                resp.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_client() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    return round(per_client * clients / elapsed, 1)
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 100, 250, 500])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    reset_db()
+    seed()
+    sync_app = legacy_sync_app()
+    results = []
+    for clients in args.clients:
+        results.append({
+            "clients": clients,
+            "sync_rps": asyncio.run(run_load(sync_app, clients, args.requests)),
+            "async_rps": asyncio.run(run_load(main.app, clients, args.requests)),
+        })
+        # Pool async gắn với event loop của lần chạy trước
+        asyncio.run(main.adb.close())
+    emit("async_api", results)
+
+if __name__ == "__main__":
+    main_()
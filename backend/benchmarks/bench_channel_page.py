@@ -0,0 +1,68 @@
+"""
+Đo bytes tải về + CPU time mỗi lần lấy info kênh trên trang giả lập ~1 MB:
+- legacy: tải cả trang rồi chạy 4 regex không neo trên toàn bộ chuỗi
+- stream: đọc từng khúc, đủ field thì dừng (lần đầu, chưa có ETag)
+- conditional: lần sau, gửi If-None-Match -> 304, không tải/parse lại
+
+    python -m benchmarks.bench_channel_page --channels 50 --page-kb 1024
+"""
+import argparse
+import re
+import time
+
+import requests
+
+from benchmarks.common import reset_db, emit
+from benchmarks.fake_youtube import start_server
+import channel_page
+import http_client
+
+def legacy_channel_details(url):
+    """Logic cũ của worker.get_channel_details (giữ lại làm mốc so sánh)"""
+    html = requests.get(url, timeout=10).text
+    name = re.search(r'<meta property="og:title" content="(.*?)">', html)
+    avatar = re.search(r'<meta property="og:image" content="(.*?)">', html)
+    desc = re.search(r'"description":\{"simpleText":"(.*?)"\}', html)
+    if not desc:
+        desc = re.search(r'<meta property="og:description" content="(.*?)">', html, re.DOTALL)
+    return len(html.encode()), (name and name.group(1), avatar and avatar.group(1), desc and desc.group(1))
+
+def run(fn, channel_ids):
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for cid in channel_ids:
+        fn(cid)
+    return time.process_time() - cpu_start, time.perf_counter() - wall_start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--page-kb", type=int, default=1024)
+    args = parser.parse_args()
+
+    reset_db()
+    server, base_url = start_server(padding_kb=args.page_kb)
+    http_client.limiter = http_client.HostRateLimiter(rate=0)
+    channel_ids = [f"UCfake{i:05d}" for i in range(args.channels)]
+    results = {}
+
+    legacy_bytes = []
+    cpu, wall = run(lambda cid: legacy_bytes.append(legacy_channel_details(f"{base_url}/channel/{cid}")[0]), channel_ids)
+    results["legacy"] = {"bytes_per_sync": sum(legacy_bytes) // len(channel_ids),
+                         "cpu_ms_per_sync": round(cpu * 1000 / len(channel_ids), 3),
+                         "wall_ms_per_sync": round(wall * 1000 / len(channel_ids), 3)}
+
+    for label in ("stream", "conditional"):
+        before = dict(channel_page.stats)
+        cpu, wall = run(lambda cid: channel_page.fetch_channel_details(f"{base_url}/channel/{cid}", cid), channel_ids)
+        results[label] = {
+            "bytes_per_sync": (channel_page.stats["bytes"] - before["bytes"]) // len(channel_ids),
+            "cpu_ms_per_sync": round(cpu * 1000 / len(channel_ids), 3),
+            "wall_ms_per_sync": round(wall * 1000 / len(channel_ids), 3),
+            "early_stops": channel_page.stats["early_stops"] - before["early_stops"],
+            "not_modified": channel_page.stats["not_modified"] - before["not_modified"],
+        }
+    server.shutdown()
+    emit("channel_page", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Đo 2 thứ của định dạng video gọn:
+- memory: bytes Redis mỗi video (hash 5 field kiểu cũ vs 1 chuỗi gọn), theo INFO used_memory
+- serialize: thời gian dựng 1 trang feed (Pydantic VideoResponse + json vs orjson, mảnh cache lạnh/nóng)
+
+    python -m benchmarks.bench_compact --videos 100000 --page 10
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.common import db, reset_db, emit
+import main
+import responses
+
+def used_memory():
+    return db.r.info("memory")["used_memory"]
+
+def write_legacy(n):
+    pipe = db.r.pipeline(transaction=False)
+    for i in range(n):
+        vid = f"lg{i:09d}"
+        pipe.hset(f"video:{vid}", mapping={
+            "id": vid, "channel_id": "UCbench000001", "title": f"Video benchmark {i}",
+            "thumbnail": db.thumbnail_url(vid), "published_at": 1_700_000_000 + i,
+        })
+        if len(pipe) >= 5000:
+            pipe.execute()
+    pipe.execute()
+
+def write_packed(n):
+    pipe = db.r.pipeline(transaction=False)
+    for i in range(n):
+        vid = f"pk{i:09d}"
+        pipe.set(f"video:{vid}", db.pack_video(vid, "UCbench000001", 1_700_000_000 + i, f"Video benchmark {i}"))
+        if len(pipe) >= 5000:
+            pipe.execute()
+    pipe.execute()
+
+def bytes_per_video(write, n):
+    reset_db()
+    before = used_memory()
+    write(n)
+    return round((used_memory() - before) / n, 1)
+
+def bench_serialize(page_size, pages):
+    videos = [{**db.unpack_video(f"pk{i:09d}", db.pack_video(f"pk{i:09d}", "UCbench000001", 1_700_000_000 + i,
+                                                             f"Video benchmark {i}")),
+               "channel_name": "Kênh benchmark", "channel_avatar": "https://yt3.example/a.jpg"}
+              for i in range(page_size * pages)]
+    page_list = [videos[i:i + page_size] for i in range(0, len(videos), page_size)]
+
+    def pydantic_page(page):
+        return json.dumps(jsonable_encoder([main.VideoResponse(**main.to_video_response(v)) for v in page])).encode()
+
+    results = {}
+    start = time.perf_counter()
+    for page in page_list:
+        pydantic_page(page)
+    results["pydantic_us_per_page"] = round((time.perf_counter() - start) * 1e6 / len(page_list), 2)
+
+    responses.fragments = responses.FragmentCache(max_size=len(videos))
+    for label in ("orjson_cold_us_per_page", "orjson_warm_us_per_page"):
+        start = time.perf_counter()
+        for page in page_list:
+            responses.feed_json(page)
+        results[label] = round((time.perf_counter() - start) * 1e6 / len(page_list), 2)
+
+    # Cùng nội dung JSON
+    assert json.loads(pydantic_page(page_list[0])) == json.loads(responses.feed_json(page_list[0]))
+    return results
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=100_000)
+    parser.add_argument("--page", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=2000)
+    args = parser.parse_args()
+
+    emit("compact", {
+        "memory_bytes_per_video": {
+            "legacy_hash": bytes_per_video(write_legacy, args.videos),
+            "packed": bytes_per_video(write_packed, args.videos),
+        },
+        "serialize": bench_serialize(args.page, args.pages),
+    })
+    reset_db()
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,47 @@
+"""
+Đo thời gian crawl theo số luồng (concurrency) với server YouTube giả lập.
+Mỗi kênh = fetch trang kênh (qua http_client, có rate limit theo host) + ghi Redis.
+
+    python -m benchmarks.bench_crawl --channels 40 --latency 0.2
+"""
+import argparse
+
+from benchmarks.common import db, reset_db, emit
+from benchmarks.fake_youtube import start_server
+import crawler
+import http_client
+import worker
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="Độ trễ mỗi request (giây)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--host-rps", type=float, default=0, help="0 = không giới hạn")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency)
+    worker.YOUTUBE_BASE_URL = base_url
+    http_client.limiter = http_client.HostRateLimiter(rate=args.host_rps, burst=max(1, int(args.host_rps)))
+
+    def fake_sync(channel_id, limit=10):
+        name, avatar, desc = worker.get_channel_details(channel_id)
+        db.add_channel_to_db(channel_id, name, avatar, desc)
+        return 1
+
+    channel_ids = [f"UCfake{i:05d}" for i in range(args.channels)]
+    results = []
+    for concurrency in args.concurrency:
+        reset_db()
+        report = crawler.crawl_channels(channel_ids, concurrency=concurrency, sync_fn=fake_sync)
+        results.append({
+            "concurrency": concurrency,
+            "channels": args.channels,
+            "wall_seconds": report["elapsed"],
+            "ok": sum(1 for res in report["results"] if res["status"] == "ok"),
+        })
+    server.shutdown()
+    emit("crawl", results)
+
+if __name__ == "__main__":
+    main()
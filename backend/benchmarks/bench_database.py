@@ -0,0 +1,100 @@
+"""
+Micro-benchmark từng hàm trong database.py trên dữ liệu seed (benchmarks/seed.py).
+Mỗi hàm: p50/p95/mean (ms) + số round trip Redis mỗi lần gọi.
+Các hàm ghi (view, sub/unsub, ingest) có làm thay đổi dữ liệu seed một chút.
+
+    python -m benchmarks.bench_database --channels 1000 --videos 1000000 --users 100000
+    python -m benchmarks.bench_database --reuse --repeat 200 --only get_subscribed session
+    python -m benchmarks.bench_database --videos 1000000 --only search   # tiền tố ngắn ở quy mô 1M
+"""
+import argparse
+import random
+
+from benchmarks.common import db, measure, emit
+from benchmarks import seed as seeding
+
+def build_cases(scale, rng):
+    def rand_video():
+        return seeding.video_id(rng.randrange(scale["videos"]))
+
+    def rand_user():
+        return seeding.user_id(rng.randrange(scale["users"]))
+
+    def rand_channel():
+        return seeding.channel_id(rng.randrange(scale["channels"]))
+
+    page_ids = [rand_video() for _ in range(10)]
+    ingest_counter = iter(range(10 ** 9))
+
+    def ingest_batch():
+        n = next(ingest_counter)
+        videos = [{"id": f"bi{n:07d}{i:02d}", "title": f"Ingest {n}/{i}",
+                   "thumbnail": "https://i.ytimg.com/vi/x/hqdefault.jpg"} for i in range(25)]
+        db.add_videos_to_db(rand_channel(), videos)
+
+    def sub_unsub():
+        # Kênh 0 luôn có follower khác -> unsub không kéo theo xóa kênh
+        user, channel = rand_user(), seeding.channel_id(0)
+        db.subscribe_channel(user, channel)
+        db.unsubscribe_channel(user, channel)
+
+    def session_page():
+        session_id = f"bench-session-{rng.randrange(50)}"
+        remaining = db.get_videos_from_session(session_id, limit=10)
+        if not remaining:
+            db.init_feed_session(session_id)
+
+    return {
+        "get_global_video_ids:score_asc": lambda: db.get_global_video_ids(limit=200, sort_by="score_asc"),
+        "get_global_video_ids:time": lambda: db.get_global_video_ids(limit=200, sort_by="time"),
+        "get_subscribed_video_ids:time": lambda: db.get_subscribed_video_ids(rand_user(), sort_by="time"),
+        "get_subscribed_video_ids:score_asc": lambda: db.get_subscribed_video_ids(rand_user(), sort_by="score_asc"),
+        "get_subscribed_sampled_ids": lambda: db.get_subscribed_sampled_ids(rand_user(), size=200),
+        "rebuild_user_feed": lambda: db.rebuild_user_feed(rand_user()),
+        "get_videos_from_ids:10": lambda: db.get_videos_from_ids(page_ids),
+        "get_videos_from_ids:random10": lambda: db.get_videos_from_ids([rand_video() for _ in range(10)]),
+        "get_channels_info:20": lambda: db.get_channels_info([rand_channel() for _ in range(20)]),
+        "get_channels_page": lambda: db.get_channels_page(0, 50),
+        "get_explore_page": lambda: db.get_explore_page(rand_user(), 0, 50),
+        "search:common_token": lambda: db.search("video", "videos", 0, 20),
+        "search:prefix": lambda: db.search(f"benchmark {rng.randrange(scale['videos'])}", "videos", 0, 20),
+        # Tiền tố ngắn ở quy mô 1M video: "vid" -> "video" (mọi video), "benchmark 1" -> token phổ biến + 50 số
+        "search:prefix_short": lambda: db.search("vid", "videos", 0, 20),
+        "search:common_token+short_prefix": lambda: db.search(f"benchmark {rng.randrange(10)}", "videos", 0, 20),
+        "search:channels": lambda: db.search(f"kenh {rng.randrange(scale['channels'])}", "channels", 0, 20),
+        "get_user_subscriptions": lambda: db.get_user_subscriptions(rand_user()),
+        "init_feed_session": lambda: db.init_feed_session(f"bench-init-{rng.random()}"),
+        "get_videos_from_session": session_page,
+        "increase_video_score": lambda: db.increase_video_score(rand_video()),
+        "increase_video_scores:50": lambda: db.increase_video_scores({rand_video(): 1 for _ in range(50)}),
+        "subscribe+unsubscribe": sub_unsub,
+        "add_videos_to_db:25": ingest_batch,
+        "is_channel_exist": lambda: db.is_channel_exist(rand_channel()),
+    }
+
+def run(args):
+    scale = seeding.ensure_seeded(args)
+    rng = random.Random(args.rng_seed)
+    cases = build_cases(scale, rng)
+    results = {}
+    for name, fn in cases.items():
+        if args.only and not any(part in name for part in args.only):
+            continue
+        results[name] = measure(fn, repeat=args.repeat, warmup=args.warmup)
+    return {"scale": scale, "functions": results}
+
+def add_arguments(parser):
+    seeding.add_arguments(parser)
+    parser.add_argument("--reuse", action="store_true", help="Dùng dữ liệu đã seed, không seed lại")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="Chỉ chạy các hàm có tên chứa chuỗi này")
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+    emit("database", run(args))
+
+if __name__ == "__main__":
+    main()
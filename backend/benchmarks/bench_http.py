@@ -0,0 +1,111 @@
+"""
+Load test các endpoint chính qua ASGI in-process (không cần chạy uvicorn), trên dữ liệu seed.
+Mỗi endpoint: `--clients` client đồng thời gửi tổng `--requests` request,
+đo req/s, p50/p95/p99 (ms), số lỗi và số round trip Redis trung bình mỗi request.
+
+    python -m benchmarks.bench_http --reuse --clients 100 --requests 5000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+from benchmarks.common import db, emit
+from benchmarks import seed as seeding
+import main
+
+def build_scenarios(scale, rng):
+    def rand_video():
+        return seeding.video_id(rng.randrange(scale["videos"]))
+
+    def rand_user():
+        return seeding.user_id(rng.randrange(scale["users"]))
+
+    def rand_channel():
+        return seeding.channel_id(rng.randrange(scale["channels"]))
+
+    # Mỗi scenario trả về (method, url, json body)
+    return {
+        "feed:guest": lambda: ("GET", "/api/feed?limit=10", None),
+        "feed:guest_session": lambda: ("GET", f"/api/feed?limit=10&session_id=bench-{rng.randrange(500)}", None),
+        "feed:user": lambda: ("GET", f"/api/feed?limit=10&user_id={rand_user()}", None),
+        "feed:user_session": lambda: ("GET", f"/api/feed?limit=10&user_id={rand_user()}"
+                                             f"&session_id=bench-u-{rng.randrange(500)}", None),
+        "feed:trending": lambda: ("GET", "/api/feed?limit=10&strategy=trending", None),
+        "view": lambda: ("POST", f"/api/view/{rand_video()}", None),
+        "views:batch10": lambda: ("POST", "/api/views", {"video_ids": [rand_video() for _ in range(10)]}),
+        "subscriptions": lambda: ("GET", f"/api/subscriptions?user_id={rand_user()}", None),
+        "explore": lambda: ("GET", f"/api/channels/explore?user_id={rand_user()}&limit=50", None),
+        "search": lambda: ("GET", f"/api/search?q=benchmark+{rng.randrange(scale['videos'])}", None),
+        "subscribe:quick": lambda: ("POST", "/api/subscribe/quick",
+                                    {"user_id": rand_user(), "channel_id": rand_channel()}),
+    }
+
+async def run_scenario(client, make_request, clients, total_requests):
+    latencies = []
+    errors = 0
+    per_client = max(1, total_requests // clients)
+
+    async def one_client():
+        nonlocal errors
+        for _ in range(per_client):
+            method, url, body = make_request()
+            start = time.perf_counter()
+            try:
+                resp = await client.request(method, url, json=body)
+                if resp.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    db.reset_round_trips()
+    start = time.perf_counter()
+    await asyncio.gather(*(one_client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(len(latencies) * q))], 3)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "errors": errors,
+        "round_trips_per_request": round(db.get_round_trips() / len(latencies), 2),
+    }
+
+async def run_all(args, scale):
+    rng = random.Random(args.rng_seed)
+    scenarios = build_scenarios(scale, rng)
+    results = {}
+    # Chạy startup/shutdown của app (view aggregator, sampler, pool cache...) như khi chạy uvicorn
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, make_request in scenarios.items():
+                if args.only and not any(part in name for part in args.only):
+                    continue
+                # Warmup: rebuild feed lần đầu, nạp cache kênh...
+                await run_scenario(client, make_request, min(args.clients, 10), min(args.requests, 50))
+                results[name] = await run_scenario(client, make_request, args.clients, args.requests)
+    return results
+
+def main_():
+    parser = argparse.ArgumentParser()
+    seeding.add_arguments(parser)
+    parser.add_argument("--reuse", action="store_true", help="Dùng dữ liệu đã seed, không seed lại")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--only", nargs="*", help="Chỉ chạy các scenario có tên chứa chuỗi này")
+    args = parser.parse_args()
+
+    scale = seeding.ensure_seeded(args)
+    emit("http", {"scale": scale, "clients": args.clients, "endpoints": asyncio.run(run_all(args, scale))})
+
+if __name__ == "__main__":
+    main_()
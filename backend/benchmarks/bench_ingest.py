@@ -0,0 +1,80 @@
+"""
+Đo tốc độ ghi video (videos/sec) + số round trip:
+- legacy: mỗi video 1 lượt HGET + HSET + 3 ZADD + fan-out (như add_video_to_db cũ)
+- bulk: add_videos_to_db theo lô (2 round trip / lô)
+
+    python -m benchmarks.bench_ingest --videos 5000 --followers 100 --chunk 25 --chunk 100
+"""
+import argparse
+import time
+
+from benchmarks.common import db, reset_db, emit
+
+def legacy_add_video(channel_id, video_id, title, thumbnail):
+    """Logic cũ của add_video_to_db (giữ lại làm mốc so sánh)"""
+    r = db.r
+    video_key = f"video:{video_id}"
+    if r.hget(video_key, "title") is not None:
+        return
+    timestamp = int(time.time())
+    r.hset(video_key, mapping={"id": video_id, "channel_id": channel_id, "title": title,
+                               "thumbnail": thumbnail, "published_at": timestamp})
+    r.zadd(f"channel:{channel_id}:videos", {video_id: timestamp}, nx=True)
+    r.zadd("videos:all", {video_id: timestamp}, nx=True)
+    r.zadd("videos:score", {video_id: 0}, nx=True)
+    followers = r.smembers(f"channel:{channel_id}:followers")
+    if followers:
+        pipe = r.pipeline(transaction=False)
+        for user_id in followers:
+            pipe.zadd(f"user:{user_id}:feed", {video_id: timestamp})
+        pipe.execute()
+
+def make_videos(n, prefix):
+    return [{"id": f"{prefix}{i:08d}", "title": f"Video ngắn số {i}",
+             "thumbnail": f"https://i.ytimg.com/vi/{prefix}{i:08d}/hqdefault.jpg"} for i in range(n)]
+
+def setup(followers):
+    reset_db()
+    if followers:
+        db.r.sadd("channel:UCbench:followers", *[f"u{i}" for i in range(followers)])
+
+def report(n, elapsed):
+    return {"videos_per_sec": round(n / elapsed, 1), "elapsed_s": round(elapsed, 3),
+            "round_trips_per_video": round(db.get_round_trips() / n, 3)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=5000)
+    parser.add_argument("--followers", type=int, default=100)
+    parser.add_argument("--chunk", type=int, action="append")
+    args = parser.parse_args()
+    chunks = args.chunk or [25, 100]
+    results = {}
+
+    setup(args.followers)
+    videos = make_videos(args.videos, "legacy")
+    start = time.perf_counter()
+    for v in videos:
+        legacy_add_video("UCbench", v["id"], v["title"], v["thumbnail"])
+    results["legacy"] = report(args.videos, time.perf_counter() - start)
+
+    for size in chunks:
+        setup(args.followers)
+        videos = make_videos(args.videos, f"bulk{size}_")
+        start = time.perf_counter()
+        inserted = 0
+        for i in range(0, len(videos), size):
+            inserted += db.add_videos_to_db("UCbench", videos[i:i + size])["inserted"]
+        results[f"bulk_{size}"] = {**report(args.videos, time.perf_counter() - start), "inserted": inserted}
+
+        # Crawl lại: toàn bộ video đã có -> chỉ tốn lượt đọc
+        db.reset_round_trips()
+        start = time.perf_counter()
+        for i in range(0, len(videos), size):
+            db.add_videos_to_db("UCbench", videos[i:i + size])
+        results[f"bulk_{size}_recrawl"] = report(args.videos, time.perf_counter() - start)
+
+    emit("ingest", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Đo proxy ảnh (media_cache.py) với nguồn ảnh giả lập local (fake_youtube, có độ trễ mạng):
+- prefetch: tải sẵn N thumbnail lúc ingest (ảnh/giây)
+- serve: GET /media/thumb/{id} đã có trên đĩa (FileResponse), bản gốc vs bản WebP
+- origin: tải thẳng từ nguồn (mốc so sánh, đây là cái trình duyệt phải chờ khi chưa có proxy)
+
+    python -m benchmarks.bench_media --images 500 --latency 0.05 --requests 500
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import emit
+from benchmarks.fake_youtube import start_server
+import media_cache
+import main
+
+def summarize(latencies, sizes):
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        "bytes": int(statistics.mean(sizes)),
+    }
+
+async def bench_serve(ids, requests, accept):
+    latencies, sizes = [], []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(requests):
+            start = time.perf_counter()
+            resp = await client.get(f"/media/thumb/{ids[i % len(ids)]}", headers={"Accept": accept})
+            latencies.append((time.perf_counter() - start) * 1000)
+            sizes.append(len(resp.content))
+    return summarize(latencies, sizes)
+
+def bench_origin(base_url, ids, requests):
+    latencies, sizes = [], []
+    with httpx.Client() as client:
+        for i in range(requests):
+            start = time.perf_counter()
+            resp = client.get(f"{base_url}/vi/{ids[i % len(ids)]}/hqdefault.jpg")
+            latencies.append((time.perf_counter() - start) * 1000)
+            sizes.append(len(resp.content))
+    return summarize(latencies, sizes)
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency)
+    ids = [f"md{i:09d}" for i in range(args.images)]
+    with tempfile.TemporaryDirectory() as root:
+        media_cache.MEDIA_PROXY_URL = "/media"
+        media_cache.cache = media_cache.DiskCache(root=root)
+
+        start = time.perf_counter()
+        cached = media_cache.prefetch([("thumb", vid, f"{base_url}/vi/{vid}/hqdefault.jpg") for vid in ids])
+        elapsed = time.perf_counter() - start
+        results = {
+            "prefetch": {"images": len(ids), "cached": cached, "seconds": round(elapsed, 3),
+                         "images_per_sec": round(len(ids) / elapsed, 1),
+                         "disk_bytes": media_cache.cache.usage()},
+            "serve:original": asyncio.run(bench_serve(ids, args.requests, "image/jpeg")),
+            "serve:webp": asyncio.run(bench_serve(ids, args.requests, "image/webp,image/*")),
+            "origin": bench_origin(base_url, ids, min(args.requests, 100)),
+            "webp_enabled": media_cache.MEDIA_WEBP,
+        }
+    server.shutdown()
+    emit("media", {"latency": args.latency, **results})
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,53 @@
+"""
+Benchmark engine lấy mẫu (không cần Redis): thời gian dựng trọng số + cumsum
+và độ trễ lấy 1 trang (có loại trừ video đã xem) ở 10k / 100k / 1M ứng viên.
+
+    python -m benchmarks.bench_sampler --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from sampler import WeightedSampler, compute_weights
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--page", type=int, default=10)
+    parser.add_argument("--seen", type=int, default=500, help="Số video session đã xem (bị loại)")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    now = time.time()
+    results = []
+    for n in args.sizes:
+        ids = [f"v{i:07d}" for i in range(n)]
+        views = rng.zipf(1.6, n).clip(max=1_000_000)
+        published = now - rng.random(n) * 365 * 86400
+
+        start = time.perf_counter()
+        sampler = WeightedSampler(ids, compute_weights(views, published, now))
+        build_ms = (time.perf_counter() - start) * 1000
+
+        seen = set(sampler.draw(args.seen))
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            page = sampler.draw(args.page, exclude=seen)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert len(page) == args.page and not seen.intersection(page)
+        samples.sort()
+        results.append({
+            "candidates": n,
+            "build_ms": round(build_ms, 2),
+            "page_p50_ms": round(statistics.median(samples), 4),
+            "page_p99_ms": round(samples[int(len(samples) * 0.99) - 1], 4),
+        })
+    print(json.dumps({"benchmark": "sampler", "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
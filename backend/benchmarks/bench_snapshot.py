@@ -0,0 +1,40 @@
+"""
+Đo export / import snapshot (snapshot.py) trên dữ liệu seed: records/s, kích thước file,
+rồi import vào DB trống (như node mới) và kiểm tra số video khớp.
+
+    python -m benchmarks.bench_snapshot --channels 1000 --videos 1000000 --users 100000
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import db, reset_db, emit
+from benchmarks import seed as seeding
+import snapshot
+
+def main():
+    parser = argparse.ArgumentParser()
+    seeding.add_arguments(parser)
+    parser.add_argument("--reuse", action="store_true", help="Dùng dữ liệu đã seed, không seed lại")
+    parser.add_argument("--batch", type=int, default=snapshot.CHUNK_RECORDS)
+    args = parser.parse_args()
+
+    scale = seeding.ensure_seeded(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.snap")
+        exported = snapshot.export_snapshot(path, chunk_records=args.batch)
+        # Incremental: 10% video mới nhất
+        newest = db.r.zrange("videos:all", -max(1, scale["videos"] // 10), -1, withscores=True)
+        since = int(newest[0][1]) if newest else None
+        incremental = snapshot.export_snapshot(os.path.join(tmp, "delta.snap"), since=since,
+                                               chunk_records=args.batch)
+        reset_db()
+        imported = snapshot.import_snapshot(path)
+        restored = db.r.zcard("videos:all")
+    # DB đã bị thay bằng dữ liệu import -> lần chạy sau phải seed lại
+    emit("snapshot", {"scale": scale, "export": exported, "export_since": incremental,
+                      "import": imported, "videos_restored": restored,
+                      "bytes_per_video": round(exported["bytes"] / max(1, exported["videos"]), 1)})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+So sánh feed Sub: đường cũ (ZUNIONSTORE + ZINTERSTORE mỗi request)
+với feed đã materialize (user:{id}:feed) ở 10/100/1000 kênh đã sub.
+
+    python -m benchmarks.bench_sub_feed --videos-per-channel 30
+"""
+import argparse
+import random
+
+from benchmarks.common import db, reset_db, measure, emit
+
+def legacy_subscribed_video_ids(user_id, limit=200, sort_by="score_asc"):
+    """Đường cũ trước khi có user:{id}:feed (giữ lại để làm mốc so sánh)"""
+    r = db.r
+    subs = list(r.smembers(f"user:{user_id}:subs"))
+    if not subs: return []
+    temp_sub_all = f"temp:sub_all:{user_id}"
+    r.zunionstore(temp_sub_all, [f"channel:{cid}:videos" for cid in subs])
+    r.expire(temp_sub_all, 60)
+    temp_final = f"temp:sub_scored:{user_id}"
+    r.zinterstore(temp_final, keys={temp_sub_all: 0, "videos:score": 1})
+    r.expire(temp_final, 60)
+    if sort_by == "score_asc":
+        return r.zrange(temp_final, 0, limit - 1)
+    if sort_by == "score_desc":
+        return r.zrevrange(temp_final, 0, limit - 1)
+    return r.zrevrange(temp_sub_all, 0, limit - 1)
+
+def seed(n_channels, videos_per_channel):
+    pipe = db.r.pipeline(transaction=False)
+    now = 1_700_000_000
+    for c in range(n_channels):
+        cid = f"UCbench{c:05d}"
+        videos = {f"v{c:05d}_{i:04d}": now + c * videos_per_channel + i for i in range(videos_per_channel)}
+        pipe.zadd(f"channel:{cid}:videos", videos)
+        pipe.zadd("videos:all", videos)
+        pipe.zadd("videos:score", {vid: random.randint(0, 1000) for vid in videos})
+        pipe.sadd("user:bench:subs", cid)
+        pipe.sadd(f"channel:{cid}:followers", "bench")
+        if c % 50 == 49:
+            pipe.execute()
+    pipe.execute()
+    db.rebuild_user_feed("bench")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subs", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--videos-per-channel", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = []
+    for n_subs in args.subs:
+        reset_db()
+        seed(n_subs, args.videos_per_channel)
+        for sort_by in ("score_asc", "time"):
+            results.append({
+                "subs": n_subs,
+                "sort_by": sort_by,
+                "legacy": measure(lambda: legacy_subscribed_video_ids("bench", sort_by=sort_by), args.repeat),
+                "materialized": measure(lambda: db.get_subscribed_video_ids("bench", sort_by=sort_by), args.repeat),
+            })
+    emit("sub_feed", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+So sánh bước trích xuất title:
+- walker: find_text_recursive cũ (đệ quy, gom mọi chuỗi rồi max) vs find_best_text (stack, giữ chuỗi dài nhất)
+- oembed: gọi tuần tự từng video vs fetch_titles_fallback (song song + negative cache)
+
+    python -m benchmarks.bench_title_extract --videos 2000 --missing 50 --latency 0.1
+"""
+import argparse
+import time
+
+from benchmarks.common import reset_db, emit
+from benchmarks.fake_youtube import start_server
+import http_client
+import worker
+
+def legacy_find_text_recursive(data, target_keys=('text', 'simpleText', 'label')):
+    """Logic cũ của worker.find_text_recursive (giữ lại làm mốc so sánh)"""
+    results = []
+    if isinstance(data, dict):
+        for k, v in data.items():
+            if k in target_keys and isinstance(v, str):
+                results.append(v)
+            elif isinstance(v, (dict, list)):
+                results.extend(legacy_find_text_recursive(v, target_keys))
+    elif isinstance(data, list):
+        for item in data:
+            results.extend(legacy_find_text_recursive(item, target_keys))
+    return results
+
+def legacy_title(video):
+    candidates = legacy_find_text_recursive(video)
+    valid = [t for t in candidates if len(t) > 5 and not t.replace(':', '').isdigit()]
+    return max(valid, key=len) if valid else None
+
+def fake_video(i):
+    """Renderer giống scrapetube nhưng title không nằm ở vị trí quen thuộc (buộc phải vét cạn)"""
+    return {
+        "videoId": f"vid{i:08d}",
+        "thumbnail": {"sources": [{"url": f"https://i.ytimg.com/vi/vid{i:08d}/{s}.jpg", "width": s} for s in (120, 320, 480)]},
+        "overlayMetadata": {"secondaryText": {"content": f"{i} lượt xem"}},
+        "accessibilityText": {"label": f"Video ngắn số {i} - Tiêu đề khá dài để làm title ứng viên"},
+        "inlinePlayerData": {"onVisible": {"innertubeCommand": {"watchEndpoint": {"videoId": f"vid{i:08d}",
+                             "playerParams": "x" * 40}}}},
+        "menu": {"menuRenderer": {"items": [{"menuServiceItemRenderer": {"text": {"runs": [{"text": label}]}}}
+                                            for label in ("Thêm vào danh sách", "Chia sẻ", "Báo cáo nội dung")]}},
+        "lengthText": {"simpleText": "0:59"},
+    }
+
+def bench_walker(videos):
+    results = {}
+    for label, fn in (("legacy", legacy_title), ("walker", worker.extract_title)):
+        start = time.process_time()
+        titles = [fn(v) for v in videos]
+        cpu = time.process_time() - start
+        results[label] = {"cpu_us_per_video": round(cpu * 1e6 / len(videos), 2), "found": sum(1 for t in titles if t)}
+    return results
+
+def bench_oembed(missing, latency):
+    server, base_url = start_server(latency=latency)
+    worker.YOUTUBE_BASE_URL = base_url
+    http_client.limiter = http_client.HostRateLimiter(rate=0)
+    ids = [f"gone{i:07d}" if i % 5 == 0 else f"vid{i:08d}" for i in range(missing)]
+    results = {}
+
+    start = time.perf_counter()
+    for vid in ids:
+        worker.fetch_video_info_fallback(vid)
+    results["sequential_s"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    worker.fetch_titles_fallback(ids)
+    results["batched_s"] = round(time.perf_counter() - start, 3)
+
+    # Lần 2: video 404 đã nằm trong negative cache -> không gọi lại
+    start = time.perf_counter()
+    worker.fetch_titles_fallback(ids)
+    results["batched_warm_s"] = round(time.perf_counter() - start, 3)
+    results["negative_cached"] = len(worker.get_oembed_failures(ids))
+    server.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=2000)
+    parser.add_argument("--missing", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    reset_db()
+    videos = [fake_video(i) for i in range(args.videos)]
+    emit("title_extract", {
+        "walker": bench_walker(videos),
+        "oembed": bench_oembed(args.missing, args.latency),
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Chi phí ghi view của điểm trending (log-add trong Lua) theo kích thước videos:trending:
+- view:raw       ZINCRBY videos:score (như trước)
+- view:trending  ZINCRBY + log-add vào videos:trending (increase_video_scores)
+- decay:rewrite  cách làm "job hằng đêm": nhân toàn bộ điểm với hệ số decay (ZUNIONSTORE, O(N))
+- renormalize    renormalize_trending() khi chưa cần dời epoch (chỉ dọn video nguội)
+Thời gian 1 view gần như không đổi khi N tăng 1000 lần (O(log N)), còn rewrite tăng tuyến tính.
+
+    python -m benchmarks.bench_trending --sizes 1000 10000 100000 1000000 --batch 50
+"""
+import argparse
+import random
+
+from benchmarks.common import db, reset_db, measure, emit
+
+def fill(n, rng, chunk=10_000):
+    """n video có sẵn điểm view thô + điểm trending ngẫu nhiên"""
+    reset_db()
+    db.increase_video_scores({"warmup": 1})  # tạo epoch
+    for start in range(0, n, chunk):
+        ids = [f"tv{i:09d}" for i in range(start, min(n, start + chunk))]
+        pipe = db.r.pipeline(transaction=False)
+        pipe.zadd("videos:score", {vid: rng.randrange(1000) for vid in ids})
+        pipe.zadd(db.TRENDING_KEY, {vid: rng.uniform(-5, 10) for vid in ids})
+        pipe.execute()
+
+def run_size(n, batch, repeat, rng):
+    fill(n, rng)
+    rand_batch = lambda: {f"tv{rng.randrange(n):09d}": 1 for _ in range(batch)}
+
+    def raw():
+        pipe = db.r.pipeline(transaction=False)
+        for video_id, count in rand_batch().items():
+            pipe.zincrby("videos:score", count, video_id)
+        pipe.execute()
+
+    results = {
+        "view:raw": measure(raw, repeat=repeat),
+        "view:trending": measure(lambda: db.increase_video_scores(rand_batch()), repeat=repeat),
+        "renormalize": measure(db.renormalize_trending, repeat=5, warmup=0),
+        "decay:rewrite": measure(lambda: db.r.zunionstore("bench:decayed", {db.TRENDING_KEY: 0.5}),
+                                 repeat=5, warmup=1),
+    }
+    for name in ("view:raw", "view:trending"):
+        results[name]["us_per_view"] = round(results[name]["p50_ms"] * 1000 / batch, 2)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--batch", type=int, default=50, help="Số view mỗi lần flush (giống view_buffer)")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--rng-seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.rng_seed)
+    results = {str(n): run_size(n, args.batch, args.repeat, rng) for n in args.sizes}
+    emit("trending", {"batch": args.batch, "sizes": results})
+
+if __name__ == "__main__":
+    main()
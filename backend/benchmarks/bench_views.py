@@ -0,0 +1,74 @@
+"""
+Load test đếm view: ghi thẳng (1 ZINCRBY/view) so với ViewAggregator (gom + pipeline).
+Đo số round trip ghi Redis và độ trễ p50/p99 của thao tác ghi nhận 1 view.
+
+    python -m benchmarks.bench_views --views 20000 --videos 500 --threads 16
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from benchmarks.common import db, reset_db, emit
+from view_buffer import ViewAggregator
+
+def run_load(record_view, views, videos, threads):
+    video_ids = [f"v{i:06d}" for i in range(videos)]
+    latencies = []
+    lock = threading.Lock()
+
+    def client(n):
+        local = []
+        for _ in range(n):
+            vid = random.choice(video_ids)
+            start = time.perf_counter()
+            record_view(vid)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    per_thread = views // threads
+    workers = [threading.Thread(target=client, args=(per_thread,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers: t.start()
+    for t in workers: t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "views": per_thread * threads,
+        "views_per_sec": round(per_thread * threads / elapsed),
+        "p50_ms": round(statistics.median(latencies), 4),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--views", type=int, default=20000)
+    parser.add_argument("--videos", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    results = {}
+
+    reset_db()
+    direct = run_load(lambda vid: db.r.zincrby("videos:score", 1, vid), args.views, args.videos, args.threads)
+    direct["redis_writes"] = db.get_round_trips()
+    results["direct"] = direct
+
+    reset_db()
+    agg = ViewAggregator(flush_interval=0.5)
+    agg.start()
+    buffered = run_load(agg.add, args.views, args.videos, args.threads)
+    agg.stop()
+    buffered["redis_writes"] = db.get_round_trips()
+    buffered["flushes"] = agg.stats["flushes"]
+    results["aggregated"] = buffered
+
+    total = sum(score for _, score in db.r.zrange("videos:score", 0, -1, withscores=True))
+    results["aggregated"]["views_persisted"] = int(total)
+    results["write_reduction"] = round(direct["redis_writes"] / max(1, buffered["redis_writes"]), 1)
+    emit("views", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Tiện ích chung cho benchmark.
+Benchmark luôn chạy trên BENCH_REDIS_URL (mặc định DB 15) và sẽ FLUSHDB DB đó,
+không bao giờ dùng REDIS_URL của môi trường thật.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_REDIS_URL = os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15")
+os.environ["REDIS_URL"] = BENCH_REDIS_URL
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import database as db  # noqa: E402  (phải import sau khi set REDIS_URL)
+
+def reset_db():
+    db.r.flushdb()
+    db.reset_round_trips()
+
+def measure(fn, repeat=20, warmup=2):
+    """Chạy fn nhiều lần, trả về thống kê thời gian (ms) + số round trip mỗi lần"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    db.reset_round_trips()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "round_trips": round(db.get_round_trips() / repeat, 2),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def emit(name, results, out=None):
+    """In kết quả dạng JSON (kèm commit hiện tại) để so sánh giữa các commit; out= thì ghi thêm ra file"""
+    report = {"benchmark": name, "commit": git_commit(), "redis": BENCH_REDIS_URL, "results": results}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
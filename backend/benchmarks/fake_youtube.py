@@ -0,0 +1,91 @@
+"""
+Server HTTP giả lập YouTube chạy local cho benchmark (không gọi mạng thật).
+- /channel/{id}: trang kênh HTML (có og:title, og:image, description JSON)
+- /oembed?url=...: JSON title của video (id chứa "gone" -> 404, "busy" -> 429, "down" -> 503)
+- /vi/{id}/hqdefault.jpg, /avatar/{id}.jpg: ảnh JPEG (có Pillow thì là ảnh thật, không thì chỉ có magic bytes)
+Mỗi response bị trễ `latency` giây để mô phỏng độ trễ mạng.
+Trang kênh có ETag, gửi lại If-None-Match khớp thì trả 304.
+"""
+import functools
+import hashlib
+import io
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+def channel_page(channel_id, padding_kb=0):
+    head = (
+        f'<html><head><link rel="canonical" href="https://www.youtube.com/channel/{channel_id}">'
+        f'<meta property="og:title" content="Kênh {channel_id}">'
+        f'<meta property="og:image" content="https://yt3.example/{channel_id}.jpg">'
+        f'<meta property="og:description" content="Mô tả kênh {channel_id}"></head><body>'
+    )
+    data = '<script>var ytInitialData = {"description":{"simpleText":"Mô tả đầy đủ\\nDòng 2"},' \
+           f'"browseId":"{channel_id}"}};</script>'
+    # Giống trang thật: rất nhiều script trước và sau ytInitialData
+    half = padding_kb * 512
+    return (head + "y" * half + data + "x" * half + "</body></html>").encode()
+
+@functools.lru_cache(maxsize=4)
+def fake_jpeg(width, height):
+    try:
+        from PIL import Image
+    except ImportError:
+        return b"\xff\xd8\xff\xe0" + bytes(width * height // 10)
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 60, 60)).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    padding_kb = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        parts = urlsplit(self.path)
+        if parts.path.startswith("/channel/"):
+            body = channel_page(parts.path.split("/")[2], self.padding_kb)
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, "text/html; charset=utf-8", b"", etag)
+            else:
+                self._send(200, "text/html; charset=utf-8", body, etag)
+        elif parts.path == "/oembed":
+            video_url = parse_qs(parts.query).get("url", [""])[0]
+            if "gone" in video_url:
+                # Video private/đã xóa: YouTube trả 404
+                self._send(404, "text/plain", b"Not Found")
+                return
+            if "busy" in video_url or "down" in video_url:
+                # Lỗi tạm thời: bị rate limit / YouTube lỗi server
+                self._send(429 if "busy" in video_url else 503, "text/plain", b"Try again later")
+                return
+            body = json.dumps({"title": f"Video {video_url[-11:]}", "author_name": "Fake"}).encode()
+            self._send(200, "application/json", body)
+        elif parts.path.startswith("/vi/"):
+            self._send(200, "image/jpeg", fake_jpeg(480, 360))
+        elif parts.path.startswith("/avatar/"):
+            self._send(200, "image/jpeg", fake_jpeg(176, 176))
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status, content_type, body, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_server(latency=0.0, padding_kb=0):
+    """Khởi động server ở port ngẫu nhiên, trả về (server, base_url)"""
+    handler = type("Handler", (FakeYouTubeHandler,), {"latency": latency, "padding_kb": padding_kb})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
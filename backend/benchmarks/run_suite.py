@@ -0,0 +1,35 @@
+"""
+Chạy trọn bộ: seed -> micro-benchmark database.py -> load test HTTP, ghi 1 file JSON.
+So sánh 2 commit bằng cách chạy suite ở mỗi commit với cùng tham số rồi diff 2 file.
+
+    python -m benchmarks.run_suite --channels 1000 --videos 1000000 --users 100000 --out bench.json
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import emit
+from benchmarks import seed as seeding
+from benchmarks import bench_database, bench_http
+
+def main():
+    parser = argparse.ArgumentParser()
+    bench_database.add_arguments(parser)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--out", help="Ghi kết quả JSON ra file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scale = seeding.ensure_seeded(args)
+    # Micro-benchmark có ghi dữ liệu (view, sub...) nên HTTP chạy trên dữ liệu đã dùng, không seed lại
+    args.reuse = True
+    results = {"scale": scale, "database": bench_database.run(args)["functions"]}
+    if not args.skip_http:
+        results["http"] = asyncio.run(bench_http.run_all(args, scale))
+    results["total_seconds"] = round(time.perf_counter() - start, 1)
+    emit("suite", results, out=args.out)
+
+if __name__ == "__main__":
+    main()
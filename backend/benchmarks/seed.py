@@ -0,0 +1,127 @@
+"""
+Nạp dữ liệu giả lập ở quy mô tùy chọn vào Redis benchmark (BENCH_REDIS_URL, sẽ FLUSHDB).
+Dữ liệu sinh từ random seed cố định -> chạy lại ra cùng một bộ dữ liệu, so sánh được giữa các commit.
+- Video chia đều cho các kênh, thời gian rải trong 90 ngày, điểm view lệch (đa số ít view)
+- User sub theo độ nổi tiếng của kênh (kênh đầu danh sách được sub nhiều hơn)
+- Feed Sub (user:{id}:feed) KHÔNG build sẵn: đọc lần đầu sẽ tự rebuild, giống dữ liệu cũ
+- Index tìm kiếm được ghi luôn (token "video"/"benchmark" có mặt ở mọi video = trường hợp xấu nhất)
+
+    python -m benchmarks.seed --channels 1000 --videos 1000000 --users 100000 --subs-per-user 20
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import db, reset_db
+import text_index
+
+SEED_KEY = "bench:seed"
+BASE_TS = 1_700_000_000
+SPAN_SECONDS = 90 * 86400
+
+def channel_id(i):
+    return f"UCbench{i:06d}"
+
+def video_id(i):
+    return f"bv{i:09d}"
+
+def user_id(i):
+    return f"bu{i:07d}"
+
+class _Batcher:
+    """Gom lệnh vào pipeline, đủ `size` lệnh thì gửi 1 lần"""
+
+    def __init__(self, size):
+        self.size = size
+        self.pipe = db.r.pipeline(transaction=False)
+
+    def add(self, method, *args, **kwargs):
+        getattr(self.pipe, method)(*args, **kwargs)
+        if len(self.pipe) >= self.size:
+            self.flush()
+
+    def index(self, queue_fn, *args):
+        """Ghi index tìm kiếm qua các hàm queue_* của text_index"""
+        queue_fn(self.pipe, *args)
+        if len(self.pipe) >= self.size:
+            self.flush()
+
+    def flush(self):
+        if len(self.pipe):
+            self.pipe.execute()
+
+def seed(channels=1000, videos=100_000, users=10_000, subs_per_user=20, rng_seed=42, batch=10_000):
+    """Xóa DB benchmark rồi nạp dữ liệu. Trả về thống kê (số lượng + thời gian nạp)"""
+    rng = random.Random(rng_seed)
+    reset_db()
+    start = time.perf_counter()
+    out = _Batcher(batch)
+
+    for c in range(channels):
+        cid = channel_id(c)
+        out.add("hset", f"channel:{cid}:info", mapping={
+            "id": cid, "name": f"Kênh benchmark {c}", "avatar": f"https://yt3.example/{cid}.jpg",
+            "description": "", "last_sync": BASE_TS,
+        })
+        out.add("sadd", db.CHANNEL_REGISTRY_KEY, cid)
+        out.index(text_index.queue_index_channel, cid, f"Kênh benchmark {c}")
+
+    for v in range(videos):
+        vid, cid = video_id(v), channel_id(v % channels)
+        ts = BASE_TS + rng.randrange(SPAN_SECONDS)
+        title = f"Video benchmark {v}"
+        out.add("set", f"video:{vid}", db.pack_video(vid, cid, ts, title))
+        out.index(text_index.queue_index_video, vid, title, ts)
+        out.add("zadd", f"channel:{cid}:videos", {vid: ts})
+        out.add("zadd", "videos:all", {vid: ts})
+        out.add("zadd", "videos:score", {vid: int(rng.expovariate(1 / 20))})
+
+    # Độ nổi tiếng ~ 1/(hạng+1): vài kênh lớn, rất nhiều kênh nhỏ
+    weights = [1 / (c + 1) for c in range(channels)]
+    for u in range(users):
+        uid = user_id(u)
+        subs = {channel_id(c) for c in rng.choices(range(channels), weights, k=subs_per_user)}
+        out.add("sadd", f"user:{uid}:subs", *subs)
+        for cid in subs:
+            out.add("sadd", f"channel:{cid}:followers", uid)
+    out.flush()
+    # Dữ liệu seed đã ở định dạng gọn, không cần đọc fallback hash cũ
+    db.r.set(db.VIDEO_FORMAT_KEY, "packed")
+
+    scale = {"channels": channels, "videos": videos, "users": users,
+             "subs_per_user": subs_per_user, "rng_seed": rng_seed}
+    db.r.hset(SEED_KEY, mapping=scale)
+    return {**scale, "seed_seconds": round(time.perf_counter() - start, 2)}
+
+def load_scale():
+    """Quy mô của lần seed gần nhất (để benchmark chọn ID ngẫu nhiên hợp lệ). None nếu chưa seed."""
+    scale = db.r.hgetall(SEED_KEY)
+    return {k: int(v) for k, v in scale.items()} if scale else None
+
+def add_arguments(parser):
+    parser.add_argument("--channels", type=int, default=1000)
+    parser.add_argument("--videos", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--subs-per-user", type=int, default=20)
+    parser.add_argument("--rng-seed", type=int, default=42)
+
+def seed_from_args(args):
+    return seed(args.channels, args.videos, args.users, args.subs_per_user, args.rng_seed)
+
+def ensure_seeded(args):
+    """Seed lại nếu DB chưa có dữ liệu hoặc khác quy mô yêu cầu; --reuse thì dùng dữ liệu sẵn có"""
+    scale = load_scale()
+    wanted = {"channels": args.channels, "videos": args.videos, "users": args.users,
+              "subs_per_user": args.subs_per_user, "rng_seed": args.rng_seed}
+    if scale and (getattr(args, "reuse", False) or scale == wanted):
+        return {**scale, "seed_seconds": 0}
+    return seed_from_args(args)
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(seed_from_args(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cache trong RAM cho channel:{id}:info khi hydrate feed.
+Một trang feed thường lặp lại vài kênh, tên/avatar kênh rất ít đổi (chỉ đổi khi
+add_channel_to_db sau lần sync) nên không cần đọc Redis mỗi lần.
+- Giới hạn số phần tử (LRU) + TTL
+- Ghi/xóa kênh -> xóa cache local + publish lên Redis để các replica khác cũng xóa
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+CHANNEL_CACHE_SIZE = int(os.getenv("CHANNEL_CACHE_SIZE", "5000"))
+CHANNEL_CACHE_TTL = float(os.getenv("CHANNEL_CACHE_TTL", "300"))
+INVALIDATE_CHANNEL = "channel-cache:invalidate"
+
+class ChannelInfoCache:
+    def __init__(self, max_size=CHANNEL_CACHE_SIZE, ttl=CHANNEL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # channel_id -> (expires_at, info)
+        self._lock = threading.Lock()
+        self._listener = None
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get_many(self, channel_ids):
+        """Trả về (found: {id: info}, missing: [id])"""
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for cid in channel_ids:
+                entry = self._data.get(cid)
+                if entry is None:
+                    self.misses += 1
+                    missing.append(cid)
+                elif entry[0] < now:
+                    del self._data[cid]
+                    self.expirations += 1
+                    self.misses += 1
+                    missing.append(cid)
+                else:
+                    self._data.move_to_end(cid)
+                    self.hits += 1
+                    found[cid] = entry[1]
+        return found, missing
+
+    def put_many(self, infos):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for cid, info in infos.items():
+                self._data[cid] = (expires_at, info)
+                self._data.move_to_end(cid)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, channel_id):
+        with self._lock:
+            if self._data.pop(channel_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data), "max_size": self.max_size, "ttl": self.ttl,
+            "hits": self.hits, "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+            "evictions": self.evictions, "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    # === ĐỒNG BỘ GIỮA CÁC REPLICA QUA REDIS PUB/SUB ===
+    def start_listener(self, redis_client):
+        """Nghe message xóa cache từ các process khác (thread riêng)"""
+        if self._listener: return
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{INVALIDATE_CHANNEL: lambda msg: self.invalidate(msg["data"])})
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True,
+                                              exception_handler=self._on_listener_error)
+
+    def _on_listener_error(self, exc, pubsub, thread):
+        # Mất kết nối thì có thể đã lỡ message -> xóa sạch cache cho chắc
+        logger.warning("⚠️ [ChannelCache] Mất kết nối pub/sub, xóa cache: %s", exc)
+        self.clear()
+        time.sleep(1)
+
+    def stop_listener(self):
+        if self._listener:
+            self._listener.stop()
+            self._listener = None
+
+def publish_invalidation(redis_client, channel_id):
+    redis_client.publish(INVALIDATE_CHANNEL, channel_id)
+
+channel_cache = ChannelInfoCache()
@@ -0,0 +1,176 @@
+"""
+Tải + bóc tách trang kênh YouTube (thường > 1 MB) một cách tiết kiệm:
+- Đọc stream từng khúc, bóc tách ngay trên khúc vừa đọc, đủ field là ngắt kết nối
+- Regex biên dịch sẵn, chỉ tìm các field còn thiếu
+- Cache URL -> channel_id (tránh tải lại trang khi add kênh rồi sync ngay sau đó)
+- Conditional request (ETag / Last-Modified): trang không đổi thì không tải, không parse lại
+"""
+import codecs
+import contextlib
+import re
+import threading
+
+import database as db
+import http_client
+import metrics
+
+CHUNK_SIZE = 16 * 1024
+MAX_PAGE_BYTES = 3 * 1024 * 1024
+OVERLAP = 8 * 1024  # Giữ lại đuôi khúc trước để không lỡ match nằm vắt qua 2 khúc
+URL_CACHE_TTL = 30 * 86400
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)", "Accept-Language": "en-US"}
+
+PATTERNS = {
+    "name": re.compile(r'<meta property="og:title" content="([^"]*)"'),
+    "avatar": re.compile(r'<meta property="og:image" content="([^"]*)"'),
+    "meta_description": re.compile(r'<meta property="og:description" content="([^"]*)"'),
+    "description": re.compile(r'"description":\{"simpleText":"((?:[^"\\]|\\.)*)"\}'),
+    "channel_id": re.compile(
+        r'<link rel="canonical" href="[^"]*/channel/(UC[\w-]+)"'
+        r'|"browseId":"(UC[\w-]+)"'
+        r'|itemprop="identifier" content="(UC[\w-]+)"'
+    ),
+}
+DETAIL_FIELDS = ("name", "avatar", "description")
+# Thẻ Meta đủ thay cho mô tả JSON: trang không có JSON thì không phải đọc tới MAX_PAGE_BYTES
+DETAIL_FALLBACKS = {"description": "meta_description"}
+
+# Bộ đếm để đo hiệu quả (bytes tải về, số lần dừng sớm, số lần 304...)
+stats = {"pages": 0, "bytes": 0, "early_stops": 0, "not_modified": 0, "url_cache_hits": 0}
+_stats_lock = threading.Lock()
+
+def _count(**kwargs):
+    with _stats_lock:
+        for k, v in kwargs.items():
+            stats[k] += v
+    if "bytes" in kwargs:
+        metrics.CRAWL_HTTP_BYTES.inc(kwargs["bytes"])
+
+class StreamingExtractor:
+    """
+    Nhận từng khúc HTML, tìm các field còn thiếu; done() = đã đủ field cần thiết.
+    fallbacks: {field: field thay thế}, tìm thấy field thay thế cũng tính là đủ field đó.
+    """
+
+    def __init__(self, wanted, fallbacks=None):
+        self.wanted = set(wanted)
+        self.fallbacks = fallbacks or {}
+        self.pending = self.wanted | set(self.fallbacks.values())
+        self.found = {}
+        self._tail = ""
+
+    def feed(self, text):
+        window = self._tail + text
+        for field in list(self.pending):
+            match = PATTERNS[field].search(window)
+            if match:
+                self.found[field] = next(g for g in match.groups() if g is not None)
+                self.pending.discard(field)
+        self._tail = window[-OVERLAP:]
+
+    def done(self):
+        return all(field in self.found or self.fallbacks.get(field) in self.found for field in self.wanted)
+
+def _extract_stream(chunks, extractor):
+    """Chạy extractor trên các khúc bytes; trả về số bytes đã đọc"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    read = 0
+    for chunk in chunks:
+        read += len(chunk)
+        extractor.feed(decoder.decode(chunk))
+        if extractor.done() or read >= MAX_PAGE_BYTES:
+            break
+    return read
+
+def _wire_bytes(response, fallback):
+    """Số bytes thật sự đi qua mạng (trước khi giải nén gzip) nếu đo được"""
+    try:
+        return response.raw.tell() or fallback
+    except Exception:
+        return fallback
+
+# === THÔNG TIN KÊNH (TÊN / AVATAR / MÔ TẢ) ===
+def _finalize_details(channel_id, found):
+    channel_name = found.get("name") or f"Channel {channel_id}"
+    avatar_url = found.get("avatar") or "https://via.placeholder.com/150"
+    # Ưu tiên mô tả trong JSON (full text), không có thì dùng thẻ Meta
+    description = found.get("description", "").replace('\\n', '\n') or found.get("meta_description", "")
+    if description:
+        description = description.replace('&quot;', '"').replace('&#39;', "'")
+    return channel_name, avatar_url, description
+
+def fetch_channel_details(url, channel_id):
+    """
+    Trả về (name, avatar, description). Dùng ETag/Last-Modified đã lưu trong
+    channel:{id}:page để hỏi YouTube trang có đổi không; 304 thì dùng lại kết quả cũ.
+    """
+    cache_key = f"channel:{channel_id}:page"
+    cached = db.r.hgetall(cache_key)
+    headers = dict(HEADERS)
+    if cached.get("etag"): headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"): headers["If-Modified-Since"] = cached["last_modified"]
+
+    with contextlib.closing(http_client.get(url, headers=headers, timeout=10, stream=True)) as response:
+        if response.status_code == 304 and cached:
+            _count(pages=1, not_modified=1)
+            return cached["name"], cached["avatar"], cached["description"]
+        response.raise_for_status()
+
+        extractor = StreamingExtractor(DETAIL_FIELDS, fallbacks=DETAIL_FALLBACKS)
+        read = _extract_stream(response.iter_content(CHUNK_SIZE), extractor)
+        _count(pages=1, bytes=_wire_bytes(response, read), early_stops=int(extractor.done()))
+        etag = response.headers.get("ETag", "")
+        last_modified = response.headers.get("Last-Modified", "")
+
+    name, avatar, description = _finalize_details(channel_id, extractor.found)
+    if etag or last_modified:
+        db.r.hset(cache_key, mapping={"etag": etag, "last_modified": last_modified,
+                                      "name": name, "avatar": avatar, "description": description})
+    return name, avatar, description
+
+# === URL -> CHANNEL ID ===
+def _url_cache_key(url):
+    return f"channel_url:{url.strip().rstrip('/')}"
+
+def resolve_channel_id(url):
+    cache_key = _url_cache_key(url)
+    channel_id = db.r.get(cache_key)
+    if channel_id:
+        _count(url_cache_hits=1)
+        return channel_id
+
+    extractor = StreamingExtractor(("channel_id",))
+    with contextlib.closing(http_client.get(url, headers=HEADERS, timeout=10, stream=True)) as response:
+        read = _extract_stream(response.iter_content(CHUNK_SIZE), extractor)
+        _count(pages=1, bytes=_wire_bytes(response, read), early_stops=int(extractor.done()))
+
+    channel_id = extractor.found.get("channel_id")
+    if channel_id:
+        db.r.set(cache_key, channel_id, ex=URL_CACHE_TTL)
+    return channel_id
+
+async def resolve_channel_id_async(url):
+    """Bản async cho API"""
+    import database_async as adb
+
+    cache_key = _url_cache_key(url)
+    channel_id = await adb.ar.get(cache_key)
+    if channel_id:
+        _count(url_cache_hits=1)
+        return channel_id
+
+    extractor = StreamingExtractor(("channel_id",))
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    read = 0
+    async with http_client.astream(url, headers=HEADERS, timeout=10) as response:
+        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+            read += len(chunk)
+            extractor.feed(decoder.decode(chunk))
+            if extractor.done() or read >= MAX_PAGE_BYTES:
+                break
+        _count(pages=1, bytes=response.num_bytes_downloaded or read, early_stops=int(extractor.done()))
+
+    channel_id = extractor.found.get("channel_id")
+    if channel_id:
+        await adb.ar.set(cache_key, channel_id, ex=URL_CACHE_TTL)
+    return channel_id
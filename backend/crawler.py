@@ -0,0 +1,80 @@
+"""
+Crawl nhiều kênh song song với worker pool có giới hạn.
+- concurrency: số kênh quét cùng lúc (ThreadPoolExecutor)
+- deadline: hết giờ thì không nhận kênh mới, trả kết quả những kênh đã xong
+- rate limit theo host nằm ở http_client (dùng chung cho mọi thread)
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metrics
+import worker
+
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))
+CRAWL_DEADLINE_SECONDS = float(os.getenv("CRAWL_DEADLINE_SECONDS", str(3 * 3600)))
+
+def crawl_channels(channel_ids, limit=10, concurrency=CRAWL_CONCURRENCY,
+                   deadline_seconds=CRAWL_DEADLINE_SECONDS, on_progress=None,
+                   sync_fn=None):
+    """
+    Quét danh sách kênh, trả về report:
+    {"results": [{channel_id, status, videos, seconds, error}], "elapsed": ..., "timed_out": bool}
+    status: "ok" | "error" | "skipped" (chưa kịp chạy khi hết deadline) | "timeout" (đang chạy dở khi hết deadline)
+    on_progress(done, total, result) được gọi sau mỗi kênh.
+    """
+    sync_fn = sync_fn or worker.sync_channel_data
+    channel_ids = list(channel_ids)
+    total = len(channel_ids)
+    start = time.monotonic()
+    deadline = start + deadline_seconds
+    results = []
+    results_lock = threading.Lock()
+
+    def run_one(channel_id):
+        if time.monotonic() >= deadline:
+            return {"channel_id": channel_id, "status": "skipped", "videos": 0, "seconds": 0, "error": None}
+        t0 = time.monotonic()
+        try:
+            videos = sync_fn(channel_id, limit=limit)
+            status, error = "ok", None
+        except Exception as e:
+            videos, status, error = 0, "error", str(e)
+        return {"channel_id": channel_id, "status": status, "videos": videos or 0,
+                "seconds": round(time.monotonic() - t0, 3), "error": error}
+
+    def record(result):
+        metrics.CRAWL_CHANNELS.inc(status=result["status"])
+        with results_lock:
+            results.append(result)
+            done = len(results)
+        if on_progress:
+            on_progress(done, total, result)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="crawl")
+    pending = {executor.submit(run_one, cid): cid for cid in channel_ids}
+    timed_out = False
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                record(future.result())
+    finally:
+        # Kênh đang chạy dở vẫn chạy nốt ở background, kênh chưa chạy thì hủy
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for future, channel_id in pending.items():
+        status = "skipped" if future.cancelled() else "timeout"
+        record({"channel_id": channel_id, "status": status, "videos": 0, "seconds": 0, "error": "deadline"})
+
+    return {"results": results, "elapsed": round(time.monotonic() - start, 3), "timed_out": timed_out}
+
+def print_progress(done, total, result):
+    icon = {"ok": "✅", "error": "⚠️", "skipped": "⏭️", "timeout": "⌛"}[result["status"]]
+    print(f"{icon} [Crawl {done}/{total}] {result['channel_id']}: {result['videos']} video ({result['seconds']}s)")
@@ -1,14 +1,68 @@
-from random import random
+import logging
+import math
+import random
 import redis
 import json
 import time
 import os
+import threading
+from channel_cache import channel_cache, publish_invalidation
+import sampler
+import metrics
+import text_index
+from logs import get_logger, sampled
+
+logger = get_logger(__name__)
+
+# === BỘ ĐẾM ROUND TRIP ===
+# Mỗi lệnh đơn = 1 round trip, mỗi pipeline.execute() = 1 round trip.
+# Dùng để kiểm chứng 1 trang feed tốn số round trip cố định (không phụ thuộc page size).
+# Đồng thời báo cho metrics (tổng + theo từng request HTTP).
+_round_trip_lock = threading.Lock()
+_round_trips = 0
+
+def _count_round_trip(commands=1):
+    global _round_trips
+    with _round_trip_lock:
+        _round_trips += 1
+    metrics.record_redis(commands)
+
+def get_round_trips():
+    return _round_trips
+
+def reset_round_trips():
+    global _round_trips
+    with _round_trip_lock:
+        _round_trips = 0
+
+class CountingPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error=True):
+        if self.command_stack:
+            _count_round_trip(len(self.command_stack))
+        return super().execute(raise_on_error)
+
+    def load_scripts(self):
+        _count_round_trip()  # SCRIPT EXISTS trước các EVALSHA trong pipeline
+        return super().load_scripts()
+
+class CountingRedis(redis.Redis):
+    def execute_command(self, *args, **options):
+        _count_round_trip()
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return CountingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
 
 # Kết nối Redis
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
-r = redis.from_url(REDIS_URL, decode_responses=True)
+r = CountingRedis.from_url(REDIS_URL, decode_responses=True)
+# Client trả về bytes, dùng cho dữ liệu nhị phân (snapshot nén...)
+rb = CountingRedis.from_url(REDIS_URL)
 
 # === CÁC HÀM XỬ LÝ CHANNEL ===
+# Registry chứa ID mọi kênh, thay cho KEYS channel:*:info (O(keyspace), chặn Redis)
+CHANNEL_REGISTRY_KEY = "channels:all"
+
 def add_channel_to_db(channel_id, name, avatar_url, description=""):
     """Lưu thông tin kênh vào Hash"""
     key = f"channel:{channel_id}:info"
@@ -19,112 +73,933 @@ def add_channel_to_db(channel_id, name, avatar_url, description=""):
         "description": description, # <-- MỚI: Lưu mô tả
         "last_sync": int(time.time())
     }
-    r.hset(key, mapping=data)
-    print(f"✅ Đã lưu kênh: {name}")
+    old_name = r.hget(key, "name")
+    pipe = r.pipeline()
+    pipe.hset(key, mapping=data)
+    pipe.sadd(CHANNEL_REGISTRY_KEY, channel_id)
+    queue_explore_update(pipe, channel_id)
+    if old_name != name:
+        text_index.queue_index_channel(pipe, channel_id, name, old_name)
+    pipe.execute()
+    invalidate_channel_cache(channel_id)
+    logger.info("✅ Đã lưu kênh: %s", name)
+
+def invalidate_channel_cache(channel_id):
+    """Xóa cache info kênh ở process này và báo các replica khác"""
+    channel_cache.invalidate(channel_id)
+    publish_invalidation(r, channel_id)
 
 def is_channel_exist(channel_id):
     """Kiểm tra kênh đã có trong DB chưa"""
     return r.exists(f"channel:{channel_id}:info")
 
+# === INDEX KHÁM PHÁ (EXPLORE) ===
+# Zset channels:explore: điểm = số follower + EXPLORE_ACTIVITY_WEIGHT x số video mới 30 ngày gần nhất
+# (đếm trên channel:{id}:arrivals, xem add_videos_to_db). Được tính lại (Lua, O(log N)) mỗi khi
+# sub/unsub, ingest video, lưu info kênh.
+EXPLORE_KEY = "channels:explore"
+EXPLORE_ACTIVITY_WINDOW = 30 * 86400
+# Zset video_id -> lúc crawler thấy video lần đầu (không tính lần quét đầu tiên của kênh).
+# published_at chỉ là giờ crawl nên không dùng được để đo tần suất đăng video.
+ARRIVALS_WINDOW = EXPLORE_ACTIVITY_WINDOW
+
+def _arrivals_key(channel_id):
+    return f"channel:{channel_id}:arrivals"
+EXPLORE_ACTIVITY_WEIGHT = float(os.getenv("EXPLORE_ACTIVITY_WEIGHT", "0.1"))
+
+# KEYS: followers, arrivals, explore, registry | ARGV: channel_id, now, window, weight
+_explore_score_script = r.register_script("""
+if redis.call('SISMEMBER', KEYS[4], ARGV[1]) == 0 then
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    return 0
+end
+local followers = redis.call('SCARD', KEYS[1])
+local recent = redis.call('ZCOUNT', KEYS[2], tonumber(ARGV[2]) - tonumber(ARGV[3]), '+inf')
+local score = followers + tonumber(ARGV[4]) * recent
+redis.call('ZADD', KEYS[3], score, ARGV[1])
+return tostring(score)
+""")
+
+# Lấy 1 trang kênh theo hạng, bỏ kênh user đã sub ngay trong Redis.
+# KEYS: explore, user subs | ARGV: cursor (hạng bắt đầu), limit
+# Trả về {next_cursor, {id...}}; next_cursor = 0 nghĩa là hết. Số kênh bị bỏ qua <= số kênh đã sub.
+_explore_page_script = r.register_script("""
+local cursor = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local total = redis.call('ZCARD', KEYS[1])
+local result = {}
+while #result < limit and cursor < total do
+    local ids = redis.call('ZREVRANGE', KEYS[1], cursor, cursor + limit - 1)
+    if #ids == 0 then break end
+    for _, id in ipairs(ids) do
+        cursor = cursor + 1
+        if redis.call('SISMEMBER', KEYS[2], id) == 0 then
+            result[#result + 1] = id
+            if #result >= limit then break end
+        end
+    end
+end
+if cursor >= total then cursor = 0 end
+return {cursor, result}
+""")
+
+def queue_script(pipe, script, keys, args):
+    """
+    Xếp 1 script đã register_script vào pipeline (EVALSHA, không gửi lại thân script).
+    Dùng được cho cả pipeline sync lẫn redis.asyncio: pipeline tự SCRIPT LOAD lúc execute nếu server chưa có.
+    """
+    pipe.scripts.add(script)
+    pipe.evalsha(script.sha, len(keys), *keys, *args)
+
+def explore_score_args(channel_id, now=None):
+    """(keys, args) cho _explore_score_script, dùng được với queue_script trong pipeline có sẵn"""
+    keys = [f"channel:{channel_id}:followers", _arrivals_key(channel_id), EXPLORE_KEY, CHANNEL_REGISTRY_KEY]
+    args = [channel_id, int(now or time.time()), EXPLORE_ACTIVITY_WINDOW, EXPLORE_ACTIVITY_WEIGHT]
+    return keys, args
+
+def queue_explore_update(pipe, channel_id):
+    keys, args = explore_score_args(channel_id)
+    queue_script(pipe, _explore_score_script, keys, args)
+
+def update_explore_score(channel_id):
+    keys, args = explore_score_args(channel_id)
+    return _explore_score_script(keys=keys, args=args)
+
+def rebuild_explore_index(batch_size=500):
+    """Tính lại điểm mọi kênh trong registry (SSCAN + pipeline). Trả về số kênh."""
+    total = 0
+    pipe = r.pipeline(transaction=False)
+    for channel_id in r.sscan_iter(CHANNEL_REGISTRY_KEY, count=batch_size):
+        queue_explore_update(pipe, channel_id)
+        total += 1
+        if len(pipe) >= batch_size:
+            pipe.execute()
+    pipe.execute()
+    return total
+
+def get_explore_page(user_id, cursor=0, limit=50):
+    """
+    Trang kênh khám phá (xếp theo điểm, bỏ kênh đã sub), O(page + log N).
+    Trả về (channels, next_cursor); next_cursor = 0 nghĩa là hết.
+    """
+    next_cursor, channel_ids = _explore_page_script(
+        keys=[EXPLORE_KEY, f"user:{user_id}:subs"], args=[cursor, limit])
+    # Index chưa từng được build (dữ liệu cũ) -> build 1 lần rồi đọc lại
+    if not channel_ids and not cursor and not r.exists(EXPLORE_KEY) and rebuild_explore_index():
+        next_cursor, channel_ids = _explore_page_script(
+            keys=[EXPLORE_KEY, f"user:{user_id}:subs"], args=[cursor, limit])
+    return get_channels_info(channel_ids), int(next_cursor)
+
+# === TÌM KIẾM THEO TITLE VIDEO / TÊN KÊNH ===
+# Index token (xem text_index.py) được ghi cùng pipeline với add_videos_to_db / add_channel_to_db.
+# Token cuối của câu tìm được hiểu là tiền tố ("son tu" -> "son tung", "son tu...").
+# Tìm video không ZUNIONSTORE/ZINTERSTORE cả posting list (hàng triệu phần tử ở token phổ biến):
+# - Chỉ có tiền tố: lấy top-K mới nhất của từng từ mở rộng rồi trộn trên RAM (K = cursor + limit + 1)
+# - Có token đầy đủ: duyệt posting list nhỏ nhất (mới -> cũ) trong Lua, lọc theo các token còn lại
+#   + tiền tố, dừng khi đủ trang hoặc đã duyệt SEARCH_SCAN_BUDGET video. Nếu các từ mở rộng ít video
+#   hơn thì hợp chúng lại (tối đa SEARCH_UNION_MAX) làm tập duyệt, cache theo tiền tố.
+# Tìm kênh (index nhỏ): ZINTERSTORE vào search:q:... và giữ SEARCH_CACHE_TTL giây.
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "60"))
+# Token cuối được mở rộng thành tối đa SEARCH_PREFIX_EXPANSIONS từ khớp tiền tố, chọn từ
+# SEARCH_PREFIX_CANDIDATES từ đầu tiên (thứ tự từ điển) theo số tài liệu chứa từ (ZCARD, phổ biến trước).
+# Tiền tố quá ngắn có thể khớp hơn SEARCH_PREFIX_CANDIDATES từ -> các từ xếp sau bị bỏ qua.
+SEARCH_PREFIX_EXPANSIONS = int(os.getenv("SEARCH_PREFIX_EXPANSIONS", "50"))
+SEARCH_PREFIX_CANDIDATES = int(os.getenv("SEARCH_PREFIX_CANDIDATES", "500"))
+SEARCH_SCAN_BUDGET = int(os.getenv("SEARCH_SCAN_BUDGET", "2000"))
+SEARCH_UNION_MAX = int(os.getenv("SEARCH_UNION_MAX", "20000"))
+SEARCH_MAX_LIMIT = 50
+
+# Duyệt KEYS[1] theo hạng từ cursor (mới -> cũ), giữ ID có trong mọi KEYS[2..n_all+1]
+# và (nếu còn key) có trong ít nhất 1 key phía sau. ARGV: cursor, limit, số video tối đa duyệt, n_all
+# Trả về {next_cursor, {id...}}; next_cursor = 0 nghĩa là hết.
+_search_filter_script = r.register_script("""
+local cursor = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local n_all = tonumber(ARGV[4])
+local total = redis.call('ZCARD', KEYS[1])
+local stop = math.min(total, cursor + tonumber(ARGV[3]))
+local result = {}
+while #result < limit and cursor < stop do
+    local ids = redis.call('ZREVRANGE', KEYS[1], cursor, math.min(cursor + 199, stop - 1))
+    for _, id in ipairs(ids) do
+        cursor = cursor + 1
+        local ok = true
+        for i = 2, n_all + 1 do
+            if not redis.call('ZSCORE', KEYS[i], id) then
+                ok = false
+                break
+            end
+        end
+        if ok and #KEYS > n_all + 1 then
+            ok = false
+            for i = n_all + 2, #KEYS do
+                if redis.call('ZSCORE', KEYS[i], id) then
+                    ok = true
+                    break
+                end
+            end
+        end
+        if ok then
+            result[#result + 1] = id
+            if #result >= limit then break end
+        end
+    end
+end
+if cursor >= total then cursor = 0 end
+return {cursor, result}
+""")
+
+def _prefix_expansions(token_key, prefix):
+    """[(từ, số tài liệu)] khớp tiền tố, phổ biến nhất trước (1 ZRANGEBYLEX + 1 pipeline ZCARD)"""
+    candidates = r.zrangebylex(text_index.VOCAB_KEY, f"[{prefix}", f"[{prefix}\xff",
+                               start=0, num=SEARCH_PREFIX_CANDIDATES)
+    if not candidates: return []
+    pipe = r.pipeline(transaction=False)
+    for token in candidates:
+        pipe.zcard(token_key(token))
+    ranked = sorted(zip(candidates, pipe.execute()), key=lambda item: -item[1])
+    return [(token, count) for token, count in ranked[:SEARCH_PREFIX_EXPANSIONS] if count]
+
+def _merge_newest(keys, cursor, limit):
+    """
+    Trang [cursor, cursor + limit) của hợp các posting list (mới trước): mỗi list chỉ lấy top-K
+    (video nằm trong top-K của hợp thì chắc chắn nằm trong top-K của list chứa nó).
+    """
+    k = cursor + limit + 1
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.zrevrange(key, 0, k - 1, withscores=True)
+    newest = {}
+    for entries in pipe.execute():
+        for video_id, ts in entries:
+            newest[video_id] = ts
+    # Cùng thứ tự với ZREVRANGE (điểm giảm dần, trùng điểm thì ID giảm dần)
+    ranked = sorted(newest.items(), key=lambda item: (item[1], item[0]), reverse=True)
+    ids = [video_id for video_id, _ in ranked[cursor:cursor + limit]]
+    return ids, (cursor + limit if len(ranked) > cursor + limit else 0)
+
+def _search_videos(query_tokens, cursor, limit):
+    *exact, last = query_tokens
+    expansions = _prefix_expansions(text_index.video_token_key, last)
+    if not expansions: return [], 0
+    prefix_keys = [text_index.video_token_key(token) for token, _ in expansions]
+    if not exact:
+        return _merge_newest(prefix_keys, cursor, limit)
+
+    pipe = r.pipeline(transaction=False)
+    for token in exact:
+        pipe.zcard(text_index.video_token_key(token))
+    sized = sorted(zip(pipe.execute(), [text_index.video_token_key(t) for t in exact]))
+    if sized[0][0] == 0: return [], 0
+    exact_keys = [key for _, key in sized]
+
+    prefix_total = sum(count for _, count in expansions)
+    if prefix_total < sized[0][0] and prefix_total <= SEARCH_UNION_MAX:
+        # Từ mở rộng ít video hơn: hợp chúng (nhỏ, cache theo tiền tố) làm tập duyệt
+        driver = prefix_keys[0]
+        if len(prefix_keys) > 1:
+            driver = f"search:q:prefix:{last}"
+            if not r.exists(driver):
+                pipe = r.pipeline(transaction=True)
+                pipe.zunionstore(driver, prefix_keys, aggregate="MAX")
+                pipe.expire(driver, SEARCH_CACHE_TTL)
+                pipe.execute()
+        keys, n_all = [driver, *exact_keys], len(exact_keys)
+    else:
+        keys, n_all = [*exact_keys, *prefix_keys], len(exact_keys) - 1
+    next_cursor, ids = _search_filter_script(keys=keys, args=[cursor, limit, SEARCH_SCAN_BUDGET, n_all])
+    return ids, int(next_cursor)
+
+def _search_channels_key(query_tokens):
+    """Zset kết quả tìm kênh, xếp theo điểm khám phá (None nếu chắc chắn không có kết quả)"""
+    token_key = text_index.channel_token_key
+    *exact, last = query_tokens
+    expansions = [token for token, _ in _prefix_expansions(token_key, last)]
+    if not expansions: return None
+
+    result_key = f"search:q:channels:{' '.join(query_tokens)}"
+    if r.exists(result_key):
+        return result_key
+    pipe = r.pipeline(transaction=True)
+    prefix_key = token_key(expansions[0])
+    if len(expansions) > 1:
+        prefix_key = f"{result_key}:prefix"
+        pipe.zunionstore(prefix_key, [token_key(t) for t in expansions], aggregate="MAX")
+    sources = [token_key(t) for t in exact] + [prefix_key]
+    pipe.zinterstore(result_key, {**{key: 0 for key in sources}, EXPLORE_KEY: 1})
+    pipe.expire(result_key, SEARCH_CACHE_TTL)
+    if len(expansions) > 1:
+        pipe.delete(prefix_key)
+    pipe.execute()
+    return result_key
+
+def search(query, kind="videos", cursor=0, limit=20):
+    """
+    Tìm video (kind="videos") hoặc kênh (kind="channels") theo từ khóa, không phân biệt dấu.
+    Trả về (ids, next_cursor); next_cursor = 0 nghĩa là hết.
+    Tìm video có thể trả về ít hơn limit (kể cả 0) mà next_cursor vẫn khác 0 khi đã duyệt hết
+    SEARCH_SCAN_BUDGET video của trang -> gọi tiếp với next_cursor.
+    """
+    query_tokens = text_index.tokenize(query)
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    if not query_tokens: return [], 0
+    if kind == "videos":
+        return _search_videos(query_tokens, cursor, limit)
+    result_key = _search_channels_key(query_tokens)
+    if result_key is None: return [], 0
+    pipe = r.pipeline(transaction=False)
+    pipe.zrevrange(result_key, cursor, cursor + limit - 1)
+    pipe.zcard(result_key)
+    ids, total = pipe.execute()
+    next_cursor = cursor + len(ids)
+    return ids, (next_cursor if next_cursor < total else 0)
+
+def rebuild_search_index(batch_size=1000, reset=False):
+    """
+    Index lại title mọi video + tên mọi kênh (dữ liệu có từ trước khi có tìm kiếm).
+    reset=True: xóa index cũ trước (dọn token của title đã đổi / video đã mất).
+    Trả về {"channels": n, "videos": n}.
+    """
+    if reset:
+        batch = []
+        for key in r.scan_iter(match="search:*", count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                r.unlink(*batch)
+                batch = []
+        if batch:
+            r.unlink(*batch)
+
+    # Kết quả tìm kênh xếp theo channels:explore -> index này cũng phải có
+    if not r.exists(EXPLORE_KEY):
+        rebuild_explore_index()
+    counts = {"channels": 0, "videos": 0}
+    channel_ids = get_all_channel_ids()
+    for i in range(0, len(channel_ids), batch_size):
+        pipe = r.pipeline(transaction=False)
+        for info in get_channels_info(channel_ids[i:i + batch_size]):
+            text_index.queue_index_channel(pipe, info["id"], info.get("name", ""))
+            counts["channels"] += 1
+        pipe.execute()
+
+    batch = []
+    for video_id, _ in r.zscan_iter("videos:all", count=batch_size):
+        batch.append(video_id)
+        if len(batch) >= batch_size:
+            counts["videos"] += _index_video_batch(batch)
+            batch = []
+    if batch:
+        counts["videos"] += _index_video_batch(batch)
+    return counts
+
+def _index_video_batch(video_ids):
+    pipe = r.pipeline(transaction=False)
+    count = 0
+    for video in load_videos(video_ids):
+        if video:
+            text_index.queue_index_video(pipe, video["id"], video["title"], video["published_at"])
+            count += 1
+    pipe.execute()
+    return count
+
 # === CÁC HÀM XỬ LÝ VIDEO ===
-def add_video_to_db(channel_id, video_id, title, thumbnail):
-    timestamp = int(time.time())
-    
-    # 1. Lưu metadata
-    video_key = f"video:{video_id}"
-    video_data = {
+# === ĐỊNH DẠNG GỌN CHO video:{id} ===
+# video:{id} là 1 STRING "channel_id␟published_at␟thumbnail␟title" thay cho hash 5 field:
+# - id lấy từ key, embed_url dựng từ id
+# - thumbnail để trống khi là ảnh chuẩn hqdefault (dựng lại từ id)
+# Hash kiểu cũ vẫn đọc được (fallback) cho tới khi chạy: python manage.py compact-videos
+VIDEO_SEP = "\x1f"
+# Có giá trị "packed" khi migration đã xong -> bỏ qua bước đọc fallback hash cũ
+VIDEO_FORMAT_KEY = "schema:video_format"
+
+def _video_key(video_id):
+    return f"video:{video_id}"
+
+def thumbnail_url(video_id):
+    return f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+
+def embed_url(video_id):
+    return f"https://www.youtube.com/embed/{video_id}?autoplay=0"
+
+def pack_video(video_id, channel_id, published_at, title, thumbnail=""):
+    if thumbnail == thumbnail_url(video_id):
+        thumbnail = ""
+    # title để cuối: có lỡ chứa ký tự phân cách thì split(maxsplit) vẫn đúng
+    return VIDEO_SEP.join((channel_id, str(int(published_at)), thumbnail or "", title))
+
+def unpack_video(video_id, raw):
+    channel_id, published_at, thumbnail, title = raw.split(VIDEO_SEP, 3)
+    return {
         "id": video_id, "channel_id": channel_id, "title": title,
-        "thumbnail": thumbnail, "published_at": timestamp
+        "thumbnail": thumbnail or thumbnail_url(video_id), "published_at": int(published_at),
     }
-    r.hset(video_key, mapping=video_data)
-    
-    # 2. Lưu vào list kênh & list global
-    r.zadd(f"channel:{channel_id}:videos", {video_id: timestamp})
-    r.zadd("videos:all", {video_id: timestamp})
-    
-    # 3. [QUAN TRỌNG] Khởi tạo điểm = 0 cho video mới
-    r.zadd("videos:score", {video_id: 0}, nx=True)
+
+def _from_legacy_hash(video_id, info):
+    return {
+        "id": video_id, "channel_id": info.get("channel_id", ""), "title": info.get("title", ""),
+        "thumbnail": info.get("thumbnail") or thumbnail_url(video_id),
+        "published_at": int(info.get("published_at") or 0),
+    }
+
+# Cờ migration được đọc lại mỗi VIDEO_FORMAT_RECHECK giây (không tốn thêm lệnh mỗi request)
+VIDEO_FORMAT_RECHECK = 60
+_video_format = {"packed": False, "checked_at": 0.0}
+
+def legacy_check_due():
+    return not _video_format["packed"] and time.monotonic() - _video_format["checked_at"] > VIDEO_FORMAT_RECHECK
+
+def set_video_format(value):
+    _video_format.update(packed=(value == "packed"), checked_at=time.monotonic())
+
+def legacy_fallback_enabled():
+    if legacy_check_due():
+        set_video_format(r.get(VIDEO_FORMAT_KEY))
+    return not _video_format["packed"]
+
+def unpack_videos(video_ids, raws):
+    """Giải mã kết quả MGET -> (videos, vị trí các ID chưa đọc được)"""
+    videos = [unpack_video(vid, raw) if raw is not None else None for vid, raw in zip(video_ids, raws)]
+    return videos, [i for i, v in enumerate(videos) if v is None]
+
+def merge_legacy_videos(videos, video_ids, missing, infos):
+    """Điền video đọc từ hash cũ (infos theo thứ tự missing) vào chỗ trống"""
+    for i, info in zip(missing, infos):
+        if info:
+            videos[i] = _from_legacy_hash(video_ids[i], info)
+    return videos
+
+def load_videos(video_ids):
+    """
+    Đọc video theo lô, trả về list cùng thứ tự video_ids (None nếu không có).
+    1 lệnh MGET; chỉ khi có ID không đọc được (và chưa migrate xong) mới thử thêm HGETALL.
+    """
+    if not video_ids: return []
+    videos, missing = unpack_videos(video_ids, r.mget([_video_key(vid) for vid in video_ids]))
+    if missing and legacy_fallback_enabled():
+        infos = _hgetall_many([_video_key(video_ids[i]) for i in missing])
+        merge_legacy_videos(videos, video_ids, missing, infos)
+    return videos
+
+def add_video_to_db(channel_id, video_id, title, thumbnail):
+    """
+    Lưu 1 video. Trả về "inserted" | "updated" | "unchanged".
+    Crawl nhiều video thì dùng add_videos_to_db để ghi cả lô trong 1 pipeline.
+    """
+    result = add_videos_to_db(channel_id, [{"id": video_id, "title": title, "thumbnail": thumbnail}])
+    for status in ("inserted", "updated"):
+        if result[status]: return status
+    return "unchanged"
+
+def add_videos_to_db(channel_id, videos, track_arrivals=False):
+    """
+    Lưu cả lô video của 1 kênh: videos = [{"id", "title", "thumbnail"?, "published_at"?}, ...].
+    track_arrivals=True: ghi video mới vào channel:{id}:arrivals (tần suất đăng thật, dùng cho
+    lịch crawl và điểm khám phá). Lần quét đầu (backfill) của kênh thì không ghi.
+    Tốn 2 round trip dù lô có bao nhiêu video (thêm 1 lượt đọc hash cũ nếu chưa migrate):
+      1. MGET bản ghi hiện có + danh sách follower (pipeline)
+      2. Ghi bản ghi gọn, videos:all, videos:score, fan-out, index tìm kiếm (MULTI/EXEC)
+    Video đã có thì GIỮ NGUYÊN published_at (không đẩy video cũ lên đầu videos:all),
+    chỉ ghi lại nếu title thay đổi (hash cũ được chuyển luôn sang định dạng gọn).
+    Trả về {"inserted": n, "updated": n, "unchanged": n, "new_ids": [...]}.
+    """
+    result = {"inserted": 0, "updated": 0, "unchanged": 0, "new_ids": []}
+    if not videos: return result
+
+    video_ids = [video["id"] for video in videos]
+    pipe = r.pipeline(transaction=False)
+    pipe.mget([_video_key(vid) for vid in video_ids])
+    pipe.smembers(f"channel:{channel_id}:followers")
+    pipe.get(VIDEO_FORMAT_KEY)
+    raws, followers, video_format = pipe.execute()
+    existing = [unpack_video(vid, raw) if raw is not None else None for vid, raw in zip(video_ids, raws)]
+    if video_format != "packed":
+        missing = [i for i, v in enumerate(existing) if v is None]
+        for i, info in zip(missing, _hgetall_many([_video_key(video_ids[i]) for i in missing])):
+            if info:
+                existing[i] = _from_legacy_hash(video_ids[i], info)
+
+    now = int(time.time())
+    new_videos = {}
+    pipe = r.pipeline(transaction=True)
+    for video, old in zip(videos, existing):
+        video_id, title = video["id"], video["title"]
+        if old is not None:
+            if old["title"] == title:
+                result["unchanged"] += 1
+            else:
+                pipe.set(_video_key(video_id), pack_video(
+                    video_id, old["channel_id"], old["published_at"], title, old["thumbnail"]))
+                text_index.queue_index_video(pipe, video_id, title, old["published_at"], old["title"])
+                result["updated"] += 1
+            continue
+        if video_id in new_videos:
+            continue
+
+        timestamp = int(video.get("published_at") or now)
+        # 1. Lưu metadata (1 chuỗi gọn)
+        pipe.set(_video_key(video_id), pack_video(
+            video_id, channel_id, timestamp, title, video.get("thumbnail", "")))
+        text_index.queue_index_video(pipe, video_id, title, timestamp)
+        new_videos[video_id] = timestamp
+
+    if new_videos:
+        # 2. Lưu vào list kênh & list global (NX: không ghi đè thời gian đã có)
+        pipe.zadd(f"channel:{channel_id}:videos", new_videos, nx=True)
+        pipe.zadd("videos:all", new_videos, nx=True)
+        # 3. [QUAN TRỌNG] Khởi tạo điểm = 0 cho video mới
+        pipe.zadd("videos:score", {vid: 0 for vid in new_videos}, nx=True)
+        # 4. Fan-out vào feed đã materialize của các follower
+        if followers:
+            args = [x for vid, ts in new_videos.items() for x in (ts, vid)]
+            queue_script(pipe, _feed_append_script, [_user_feed_key(uid) for uid in followers], args)
+        if track_arrivals:
+            arrivals_key = _arrivals_key(channel_id)
+            pipe.zadd(arrivals_key, {vid: now for vid in new_videos}, nx=True)
+            pipe.zremrangebyscore(arrivals_key, "-inf", now - ARRIVALS_WINDOW)
+        # 5. Kênh có video mới -> điểm khám phá tăng
+        queue_explore_update(pipe, channel_id)
+
+    if len(pipe):
+        pipe.execute()
+    result["inserted"] = len(new_videos)
+    result["new_ids"] = list(new_videos)
+    return result
+
+def compact_legacy_videos(batch_size=1000):
+    """
+    Chuyển mọi hash video:{id} kiểu cũ sang định dạng gọn (SCAN theo TYPE hash, không chặn Redis).
+    Chạy lại bao nhiêu lần cũng được; lượt quét không còn hash nào thì đánh dấu VIDEO_FORMAT_KEY.
+    Trả về {"converted": n, "bytes_before": tổng, "bytes_after": tổng} (đo bằng MEMORY USAGE).
+    """
+    stats = {"converted": 0, "bytes_before": 0, "bytes_after": 0}
+    batch = []
+    for key in r.scan_iter(match="video:*", count=batch_size, _type="hash"):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            _compact_batch(batch, stats)
+            batch = []
+    if batch:
+        _compact_batch(batch, stats)
+
+    if not next(r.scan_iter(match="video:*", count=batch_size, _type="hash"), None):
+        r.set(VIDEO_FORMAT_KEY, "packed")
+        set_video_format("packed")
+    return stats
+
+def _compact_batch(keys, stats):
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.hgetall(key)
+        pipe.memory_usage(key)
+    values = pipe.execute()
+
+    pipe = r.pipeline(transaction=True)
+    converted = []
+    for i, key in enumerate(keys):
+        info, size = values[2 * i], values[2 * i + 1]
+        if not info: continue
+        video_id = key.split(":", 1)[1]
+        video = _from_legacy_hash(video_id, info)
+        # SET ghi đè luôn key kiểu hash
+        pipe.set(key, pack_video(video_id, video["channel_id"], video["published_at"],
+                                 video["title"], video["thumbnail"]))
+        stats["bytes_before"] += size or 0
+        converted.append(key)
+    if not converted: return
+    pipe.execute()
+
+    pipe = r.pipeline(transaction=False)
+    for key in converted:
+        pipe.memory_usage(key)
+    stats["bytes_after"] += sum(size or 0 for size in pipe.execute())
+    stats["converted"] += len(converted)
+
+# === HIGH-WATER MARK CHO CRAWL INCREMENTAL ===
+# Lưu ID video mới nhất đã thấy của kênh trong channel:{id}:info (field last_video_id)
+def get_channel_hwm(channel_id):
+    return r.hget(f"channel:{channel_id}:info", "last_video_id")
+
+def set_channel_hwm(channel_id, video_id):
+    r.hset(f"channel:{channel_id}:info", "last_video_id", video_id)
+
+# === FEED SUB ĐÃ MATERIALIZE (user:{id}:feed) ===
+# Mỗi user có 1 zset chứa video của tất cả kênh đã sub (score = timestamp).
+# Được cập nhật dần khi sub/unsub/thêm video => đọc feed chỉ là 1 lệnh range.
+# Feed CHƯA có (user cũ, chưa build lần nào) thì sub / fan-out không tạo mới: feed dở dang (chỉ có kênh vừa sub)
+# sẽ chặn mất lần build lười ở lần đọc đầu -> để nguyên, lần đọc đầu build đủ từ mọi sub.
+def _user_feed_key(user_id):
+    return f"user:{user_id}:feed"
+
+# Gộp video của 1 kênh vào feed nếu feed đã có. KEYS: feed user, channel videos
+_feed_merge_script = r.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+return redis.call('ZUNIONSTORE', KEYS[1], 2, KEYS[1], KEYS[2], 'AGGREGATE', 'MAX')
+""")
+
+# Thêm video vào các feed đã có. KEYS: feed user... | ARGV: timestamp, video_id, timestamp, video_id...
+_feed_append_script = r.register_script("""
+local updated = 0
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        for i = 1, #ARGV, 1000 do
+            redis.call('ZADD', key, unpack(ARGV, i, math.min(i + 999, #ARGV)))
+        end
+        updated = updated + 1
+    end
+end
+return updated
+""")
+
+def rebuild_user_feed(user_id):
+    """Build lại feed của 1 user từ danh sách sub (dùng để sửa dữ liệu lệch)"""
+    feed_key = _user_feed_key(user_id)
+    subs = r.smembers(f"user:{user_id}:subs")
+    if not subs:
+        r.delete(feed_key)
+        return 0
+    # Build vào key tạm rồi RENAME để reader không bao giờ thấy feed dở dang
+    temp_key = f"temp:rebuild:{feed_key}"
+    keys_to_union = [f"channel:{cid}:videos" for cid in subs]
+    count = r.zunionstore(temp_key, keys_to_union, aggregate="MAX")
+    if count:
+        r.rename(temp_key, feed_key)
+    else:
+        r.delete(feed_key)
+    return count
+
+def rebuild_all_user_feeds():
+    """Quét mọi user:*:subs bằng SCAN (không chặn Redis) và build lại feed"""
+    total = 0
+    for key in r.scan_iter(match="user:*:subs", count=500):
+        rebuild_user_feed(key.split(":")[1])
+        total += 1
+    logger.info("🔧 Đã build lại feed cho %d user", total)
+    return total
+
+# === NEGATIVE CACHE CHO OEMBED ===
+# Video YouTube đã từ chối (private/xóa...) -> không gọi lại oEmbed trong OEMBED_FAILURE_TTL giây
+OEMBED_FAILED_KEY = "oembed:failed"
+OEMBED_FAILURE_TTL = 7 * 86400
+
+def get_oembed_failures(video_ids):
+    """Trả về set các video_id đã thất bại gần đây (1 round trip)"""
+    if not video_ids: return set()
+    since = time.time() - OEMBED_FAILURE_TTL
+    scores = r.zmscore(OEMBED_FAILED_KEY, video_ids)
+    return {vid for vid, ts in zip(video_ids, scores) if ts is not None and ts >= since}
+
+def mark_oembed_failures(video_ids):
+    if not video_ids: return
+    now = time.time()
+    pipe = r.pipeline(transaction=False)
+    pipe.zadd(OEMBED_FAILED_KEY, {vid: now for vid in video_ids})
+    # Dọn các mục đã hết hạn để key không phình mãi
+    pipe.zremrangebyscore(OEMBED_FAILED_KEY, "-inf", now - OEMBED_FAILURE_TTL)
+    pipe.execute()
+
+# === ĐIỂM TRENDING (VIEW PHÂN RÃ THEO THỜI GIAN) ===
+# videos:trending = log( tổng e^(λ(t_view - epoch)) ) của mọi view: view càng cũ càng nhẹ
+# (giảm 1 nửa sau mỗi TRENDING_HALF_LIFE), nhưng KHÔNG cần job viết lại điểm định kỳ:
+# mỗi view chỉ cộng thêm 1 số hạng (log-add, Lua, O(log N)), thứ tự zset tự phản ánh độ "nóng".
+# Điểm tăng tuyến tính theo thời gian -> renormalize_trending() thỉnh thoảng dời epoch về hiện tại.
+TRENDING_KEY = "videos:trending"
+TRENDING_EPOCH_KEY = "videos:trending:epoch"
+TRENDING_HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24")) * 3600
+TRENDING_DECAY = math.log(2) / TRENDING_HALF_LIFE  # λ
+TRENDING_DROP = 20 * math.log(2)  # Yếu hơn 1 view mới quá 20 chu kỳ bán rã (~1e-6) thì bỏ khỏi zset
+TRENDING_MAX_SHIFT = 64           # Chỉ dời epoch khi λ(now - epoch) vượt ngưỡng này
+
+TRENDING_NEXT_KEY = "videos:trending:next"      # Bản đang dời điểm sang epoch mới (chỉ có khi đang renormalize)
+TRENDING_RENORM_KEY = "videos:trending:renorm"  # Epoch mới của lần renormalize đang chạy
+TRENDING_RENORM_BATCH = 1000
+
+# KEYS: trending, epoch, next, renorm | ARGV: now, λ, video_id, số view, video_id, số view...
+# Đang renormalize thì view được cộng vào cả next (theo epoch mới) để không mất view lúc dời điểm.
+_trending_view_script = r.register_script("""
+local now = tonumber(ARGV[1])
+local epoch = tonumber(redis.call('GET', KEYS[2]))
+if not epoch then
+    epoch = now
+    redis.call('SET', KEYS[2], ARGV[1])
+end
+local targets = {{KEYS[1], (now - epoch) * tonumber(ARGV[2])}}
+local next_epoch = tonumber(redis.call('GET', KEYS[4]))
+if next_epoch then
+    targets[2] = {KEYS[3], (now - next_epoch) * tonumber(ARGV[2])}
+end
+for _, target in ipairs(targets) do
+    for i = 3, #ARGV, 2 do
+        local x = target[2] + math.log(tonumber(ARGV[i + 1]))
+        local s = tonumber(redis.call('ZSCORE', target[1], ARGV[i]))
+        if s then
+            local m = math.max(s, x)
+            x = m + math.log(math.exp(s - m) + math.exp(x - m))
+        end
+        redis.call('ZADD', target[1], string.format('%.17g', x), ARGV[i])
+    end
+end
+return (#ARGV - 2) / 2
+""")
+
+# Dời điểm 1 lô video (đọc điểm hiện tại ngay trong Redis nên không đè view mới).
+# KEYS: trending, next | ARGV: shift, video_id... Trả về số video đã dời.
+_trending_shift_script = r.register_script("""
+local shift = tonumber(ARGV[1])
+local moved = 0
+for i = 2, #ARGV do
+    local s = tonumber(redis.call('ZSCORE', KEYS[1], ARGV[i]))
+    if s then
+        redis.call('ZADD', KEYS[2], string.format('%.17g', s - shift), ARGV[i])
+        moved = moved + 1
+    end
+end
+return moved
+""")
+
+# Chốt lần renormalize: next thay trending, epoch = epoch mới. KEYS: trending, epoch, next, renorm
+_trending_swap_script = r.register_script("""
+local next_epoch = redis.call('GET', KEYS[4])
+if not next_epoch then return 0 end
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    redis.call('RENAME', KEYS[3], KEYS[1])
+else
+    redis.call('DEL', KEYS[1])
+end
+redis.call('SET', KEYS[2], next_epoch)
+redis.call('DEL', KEYS[4])
+return 1
+""")
+
+def queue_trending_views(pipe, counts, now=None):
+    """Đưa lệnh cộng view vào điểm trending vào pipeline có sẵn ({video_id: số view})"""
+    args = [now or time.time(), TRENDING_DECAY]
+    for video_id, n in counts.items():
+        if n > 0:
+            args += [video_id, n]
+    if len(args) > 2:
+        queue_script(pipe, _trending_view_script,
+                     [TRENDING_KEY, TRENDING_EPOCH_KEY, TRENDING_NEXT_KEY, TRENDING_RENORM_KEY], args)
+
+def renormalize_trending(now=None, batch_size=TRENDING_RENORM_BATCH):
+    """
+    Bỏ video đã "nguội" hẳn (ZREMRANGEBYSCORE, O(log N + số bị bỏ)); khi điểm đã trôi quá
+    TRENDING_MAX_SHIFT thì dời điểm các video còn lại sang epoch mới (vài tháng 1 lần).
+    Việc dời điểm chạy theo lô ZSCAN sang videos:trending:next (mỗi lô 1 script ngắn, không chặn Redis),
+    cuối cùng RENAME thay zset cũ. Bị ngắt giữa chừng thì lần gọi sau làm tiếp với cùng epoch mới.
+    Trả về (số video bị bỏ, số video được dời điểm).
+    """
+    now = now or time.time()
+    epoch, next_epoch = r.mget(TRENDING_EPOCH_KEY, TRENDING_RENORM_KEY)
+    if epoch is None: return 0, 0
+    epoch = float(epoch)
+    floor = (now - epoch) * TRENDING_DECAY - TRENDING_DROP
+    removed = r.zremrangebyscore(TRENDING_KEY, "-inf", f"({floor!r}")
+    if next_epoch is None:
+        if (now - epoch) * TRENDING_DECAY < TRENDING_MAX_SHIFT: return removed, 0
+        r.delete(TRENDING_NEXT_KEY)
+        r.set(TRENDING_RENORM_KEY, repr(now))
+        next_epoch = now
+    shift = (float(next_epoch) - epoch) * TRENDING_DECAY
+
+    shifted = 0
+    batch = []
+    for video_id, _ in r.zscan_iter(TRENDING_KEY, count=batch_size):
+        batch.append(video_id)
+        if len(batch) >= batch_size:
+            shifted += _trending_shift_script(keys=[TRENDING_KEY, TRENDING_NEXT_KEY], args=[shift, *batch])
+            batch = []
+    if batch:
+        shifted += _trending_shift_script(keys=[TRENDING_KEY, TRENDING_NEXT_KEY], args=[shift, *batch])
+    _trending_swap_script(keys=[TRENDING_KEY, TRENDING_EPOCH_KEY, TRENDING_NEXT_KEY, TRENDING_RENORM_KEY])
+    return removed, shifted
 
 # === HÀM CỘNG ĐIỂM (TÍNH VIEW) ===
 def increase_video_score(video_id):
-    # Cộng 1 điểm. Zincrby trả về điểm mới
-    new_score = r.zincrby("videos:score", 1, video_id)
-    print(f"📈 Video {video_id} +1 view -> Score: {new_score}")
+    # Cộng 1 điểm (view thô + trending). Zincrby trả về điểm mới
+    pipe = r.pipeline(transaction=False)
+    pipe.zincrby("videos:score", 1, video_id)
+    queue_trending_views(pipe, {video_id: 1})
+    new_score = pipe.execute()[0]
+    sampled(logger, logging.DEBUG, "📈 Video %s +1 view -> Score: %s", video_id, new_score)
     return new_score
 
+def increase_video_scores(counts):
+    """Cộng nhiều view cùng lúc {video_id: số view} trong 1 round trip"""
+    if not counts: return
+    pipe = r.pipeline(transaction=False)
+    for video_id, n in counts.items():
+        pipe.zincrby("videos:score", n, video_id)
+    queue_trending_views(pipe, counts)
+    pipe.execute()
+
 # === LOGIC FEED THÔNG MINH (CHO CẢ GLOBAL & SUB) ===
-def init_feed_session(session_id, user_id=None):
-    POOL_SIZE = 500
-    video_ids = []
+# Mỗi session (do Frontend tạo) có 1 list ID đã shuffle sẵn trong Redis.
+# Pool chỉ build 1 lần, mỗi lần cuộn chỉ LPOP + hydrate => O(page).
+SESSION_POOL_SIZE = 500
+SESSION_TTL = 1800            # Session tự hủy sau 30 phút không cuộn
+SESSION_REFILL_THRESHOLD = 20 # Còn ít hơn số này thì nạp thêm pool (chạy ngầm)
+
+def _session_keys(session_id):
+    return f"session:{session_id}", f"session:{session_id}:seen"
+
+SUB_SAMPLE_CAP = 20000  # Số video mới nhất của feed Sub đem vào lấy mẫu
+SUB_SCORE_WINDOW = int(os.getenv("SUB_SCORE_WINDOW", "5000"))  # Số video mới nhất của feed Sub đem xếp theo điểm
 
-    # --- TRƯỜNG HỢP 1: USER ĐÃ LOGIN & CÓ SUB (OPTION 2 PHỨC TẠP) ---
+# Các hàm queue_* bên dưới chỉ xếp lệnh vào pipeline, không tự chạy I/O
+# -> dùng chung cho pipeline sync (r) và async (database_async.ar).
+def pool_sources(user_id, sort_by):
+    """
+    Thứ tự nguồn ứng viên cho pool session (Sub trước, fallback Global), lấy nguồn đầu tiên có dữ liệu.
+    score_asc: lấy mẫu có trọng số trên toàn bộ tập ứng viên (xem sampler.py), bỏ qua exclude.
+    Feed Sub có video nhưng đã xem hết thì dừng ở Sub (xem pool_source_done), không rơi sang Global.
+    """
+    sources = []
     if user_id:
-        subs = list(r.smembers(f"user:{user_id}:subs"))
-        if subs:
-            # B1: Tạo key tạm chứa TẤT CẢ video của các kênh đã sub
-            # (Key này dùng timestamp làm score)
-            temp_all_subs = f"temp:calc:{session_id}:step1"
-            keys_to_union = [f"channel:{cid}:videos" for cid in subs]
-            
-            if keys_to_union:
-                r.zunionstore(temp_all_subs, keys_to_union)
-                r.expire(temp_all_subs, 60) # Tự hủy sau 60s
-                
-                # B2: [MAGIC STEP] Giao (Intersect) với bảng điểm Global
-                # Mục đích: Lọc ra các video Sub NHƯNG sắp xếp theo Score (Điểm thấp lên đầu)
-                # weights=[0, 1]: Nghĩa là bỏ qua score timestamp (x0), lấy score view (x1)
-                temp_scored_subs = f"temp:calc:{session_id}:step2"
-                r.zinterstore(
-                    temp_scored_subs, 
-                    keys=[temp_all_subs, "videos:score"], 
-                    weights=[0, 1] 
-                )
-                r.expire(temp_scored_subs, 60)
-
-                # B3: Lấy 500 video điểm thấp nhất từ tập hợp đã giao
-                video_ids = r.zrange(temp_scored_subs, 0, POOL_SIZE - 1)
-
-    # --- TRƯỜNG HỢP 2: KHÁCH LẠ HOẶC KHÔNG SUB AI (GLOBAL FEED) ---
-    if not video_ids:
-        # Lấy 500 video điểm thấp nhất toàn hệ thống
-        video_ids = r.zrange("videos:score", 0, POOL_SIZE - 1)
-        
-        # Fallback: Nếu hệ thống mới tinh chưa có score, lấy theo thời gian
-        if not video_ids:
-            video_ids = r.zrevrange("videos:all", 0, POOL_SIZE - 1)
-
-    if not video_ids:
-        return False
+        sources.append("sub_sample" if sort_by == "score_asc" else "sub_range")
+    if sort_by == "score_asc":
+        sources.append("global_sample")
+    sources.append("global")
+    # Fallback: Nếu hệ thống mới tinh chưa có score, lấy theo thời gian
+    if sort_by != "time":
+        sources.append("global_time")
+    return sources
+
+def pool_source_done(source, video_ids):
+    """
+    Dừng ở nguồn này chưa? sub_sample trả None = user không có video Sub nào (thử nguồn sau),
+    [] = có nhưng đều nằm trong exclude -> dừng để init_feed_session reset seen và bắt đầu vòng mới.
+    """
+    return bool(video_ids) or (source == "sub_sample" and video_ids is not None)
+
+def _build_pool_ids(user_id=None, sort_by="score_asc", size=SESSION_POOL_SIZE, exclude=()):
+    """Lấy danh sách ID ứng viên theo pool_sources"""
+    fetchers = {
+        "sub_sample": lambda: get_subscribed_sampled_ids(user_id, size, exclude),
+        "sub_range": lambda: get_subscribed_video_ids(user_id, limit=size, sort_by=sort_by),
+        "global_sample": lambda: sampler.global_sampler.draw(size, exclude),
+        "global": lambda: get_global_video_ids(limit=size, sort_by=sort_by),
+        "global_time": lambda: get_global_video_ids(limit=size, sort_by="time"),
+    }
+    for source in pool_sources(user_id, sort_by):
+        video_ids = fetchers[source]()
+        if pool_source_done(source, video_ids):
+            return video_ids
+    return []
+
+def fresh_pool_ids(video_ids, skip):
+    return [vid for vid in video_ids if vid not in skip]
+
+def queue_session_push(pipe, session_key, video_ids):
+    pipe.rpush(session_key, *video_ids)
+    pipe.expire(session_key, SESSION_TTL)
+
+def queue_session_pop(pipe, session_key, limit):
+    """LPOP 1 trang + LLEN + gia hạn TTL (idle timeout)"""
+    pipe.lpop(session_key, limit)
+    pipe.llen(session_key)
+    pipe.expire(session_key, SESSION_TTL)
+
+def queue_mark_seen(pipe, seen_key, video_ids):
+    pipe.sadd(seen_key, *video_ids)
+    pipe.expire(seen_key, SESSION_TTL)
+
+def init_feed_session(session_id, user_id=None, sort_by="score_asc"):
+    """
+    Build (hoặc nạp thêm) pool cho session.
+    Bỏ qua các video session đã xem hoặc đang nằm trong list để không trùng giữa các trang.
+    """
+    session_key, seen_key = _session_keys(session_id)
+    pipe = r.pipeline(transaction=False)
+    pipe.smembers(seen_key)
+    pipe.lrange(session_key, 0, -1)
+    seen, queued = pipe.execute()
+    skip = seen | set(queued)
+
+    fresh_ids = fresh_pool_ids(_build_pool_ids(user_id, sort_by, exclude=skip), skip)
+    if not fresh_ids and not queued:
+        # Đã xem hết pool -> bắt đầu vòng mới
+        r.delete(seen_key)
+        fresh_ids = _build_pool_ids(user_id, sort_by)
+    if not fresh_ids:
+        return bool(queued)
 
     # --- BƯỚC CUỐI: SHUFFLE (BẮT BUỘC) ---
-    random.shuffle(video_ids)
+    random.shuffle(fresh_ids)
 
-    # Lưu vào Session
-    session_key = f"session:{session_id}"
-    r.delete(session_key)
-    r.rpush(session_key, *video_ids)
-    r.expire(session_key, 7200)
-    
-    print(f"🎲 Session {session_id} initialized with {len(video_ids)} videos (Fairness Mode)")
+    pipe = r.pipeline()
+    queue_session_push(pipe, session_key, fresh_ids)
+    pipe.execute()
+
+    sampled(logger, logging.INFO, "🎲 Session %s nạp thêm %d videos (Fairness Mode)", session_id, len(fresh_ids))
     return True
 
-# ... (GIỮ NGUYÊN CÁC HÀM GET SESSION, GET VIDEO, USER...) ...
+def refill_feed_session(session_id, user_id=None, sort_by="score_asc"):
+    """Nạp thêm pool chạy ngầm. Có khóa để nhiều request cùng lúc không refill trùng."""
+    lock_key = f"session:{session_id}:refilling"
+    if not r.set(lock_key, 1, nx=True, ex=30):
+        return False
+    try:
+        return init_feed_session(session_id, user_id, sort_by)
+    finally:
+        r.delete(lock_key)
+
+def pop_session_video_ids(session_id, limit=5):
+    """
+    LPOP 1 trang ID + gia hạn TTL (idle timeout) trong 1 round trip.
+    Trả về (video_ids, số ID còn lại trong list)
+    """
+    session_key, seen_key = _session_keys(session_id)
+    pipe = r.pipeline()
+    queue_session_pop(pipe, session_key, limit)
+    video_ids, remaining, _ = pipe.execute()
+    video_ids = video_ids or []
+
+    if video_ids:
+        pipe = r.pipeline()
+        queue_mark_seen(pipe, seen_key, video_ids)
+        pipe.execute()
+    return video_ids, remaining
+
 def get_videos_from_session(session_id, limit=5):
-    session_key = f"session:{session_id}"
-    video_ids = r.lpop(session_key, limit)
+    video_ids, _ = pop_session_video_ids(session_id, limit)
     if not video_ids: return []
     return get_videos_from_ids(video_ids)
 
+def _hgetall_many(keys):
+    """HGETALL nhiều key trong 1 round trip (pipeline không transaction)"""
+    if not keys: return []
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.hgetall(key)
+    return pipe.execute()
+
 def get_videos_from_ids(video_ids):
-    results = []
-    for vid in video_ids:
-        info = r.hgetall(f"video:{vid}")
-        if info:
-            channel_info = r.hgetall(f"channel:{info['channel_id']}:info")
-            info['channel_name'] = channel_info.get("name", "Unknown")
-            info['channel_avatar'] = channel_info.get("avatar", "")
-            results.append(info)
-    return results
+    """
+    Hydrate danh sách video theo lô: tối đa 2 round trip cho cả trang.
+    B1: MGET tất cả video:{id} (định dạng gọn, xem load_videos)
+    B2: Gom channel_id (bỏ trùng) -> lấy từ cache, kênh chưa có mới pipeline HGETALL channel:{id}:info
+    B3: Ghép dữ liệu trên RAM (giữ đúng thứ tự video_ids)
+    """
+    videos = [video for video in load_videos(video_ids) if video]
+    if not videos: return []
+
+    channels, missing = channel_cache.get_many(unique_channel_ids(videos))
+    if missing:
+        fetched = dict(zip(missing, _hgetall_many([f"channel:{cid}:info" for cid in missing])))
+        channel_cache.put_many(fetched)
+        channels.update(fetched)
+    return attach_channel_info(videos, channels)
+
+def unique_channel_ids(videos):
+    return list(dict.fromkeys(v['channel_id'] for v in videos))
+
+def attach_channel_info(videos, channels):
+    """Ghép tên/avatar kênh vào từng video (channels: {channel_id: info})"""
+    for info in videos:
+        channel_info = channels.get(info['channel_id']) or {}
+        info['channel_name'] = channel_info.get("name", "Unknown")
+        info['channel_avatar'] = channel_info.get("avatar", "")
+    return videos
 
 def get_global_videos(limit=10, offset=0):
     """Lấy video cho khách (Lấy từ videos:all)"""
@@ -132,33 +1007,9 @@ def get_global_videos(limit=10, offset=0):
     return get_videos_from_ids(video_ids)
 
 def get_subscribed_videos(user_id, limit=10, offset=0):
-    """
-    Lấy video CHỈ từ các kênh đã Sub.
-    Sử dụng kỹ thuật ZUNIONSTORE của Redis để gộp các Key con thành Key tạm.
-    """
-    # 1. Lấy danh sách channel_id user đang sub
-    subs = list(r.smembers(f"user:{user_id}:subs"))
-    if not subs:
-        return []
-
-    # 2. Tạo key tạm để gộp video
-    temp_key = f"temp:feed:{user_id}"
-    
-    # Danh sách các key cần gộp: channel:{id}:videos
-    keys_to_union = [f"channel:{cid}:videos" for cid in subs]
-    
-    if keys_to_union:
-        # Gộp tất cả video lại, giữ nguyên timestamp (MAX/SUM đều được vì score giống nhau)
-        r.zunionstore(temp_key, keys_to_union)
-        
-        # Set thời gian sống cho key tạm (60s) để Redis tự dọn rác
-        r.expire(temp_key, 60)
-        
-        # 3. Lấy dữ liệu phân trang từ key tạm
-        video_ids = r.zrevrange(temp_key, offset, offset + limit - 1)
-        return get_videos_from_ids(video_ids)
-    
-    return []
+    """Lấy video CHỈ từ các kênh đã Sub (mới nhất trước), đọc từ feed đã materialize"""
+    video_ids = get_subscribed_video_ids(user_id, limit=limit, offset=offset, sort_by="time")
+    return get_videos_from_ids(video_ids)
 
 def get_videos_from_channel(channel_id, limit=10, offset=0):
     """Lấy danh sách video của 1 kênh cụ thể"""
@@ -180,58 +1031,179 @@ def create_or_update_user(user_info):
     r.hset(key, mapping=data)
     return data
 
+def queue_subscribe(pipe, user_id, channel_id):
+    pipe.sadd(f"user:{user_id}:subs", channel_id)
+    pipe.sadd(f"channel:{channel_id}:followers", user_id)
+    # Gộp video của kênh vào feed của user (feed chưa có thì lần đọc đầu build đủ từ mọi sub)
+    queue_script(pipe, _feed_merge_script, [_user_feed_key(user_id), f"channel:{channel_id}:videos"], [])
+    queue_explore_update(pipe, channel_id)
+
 def subscribe_channel(user_id, channel_id):
-    r.sadd(f"user:{user_id}:subs", channel_id)
-    r.sadd(f"channel:{channel_id}:followers", user_id)
-    print(f"✅ User {user_id} sub {channel_id}")
+    pipe = r.pipeline()
+    queue_subscribe(pipe, user_id, channel_id)
+    pipe.execute()
+    sampled(logger, logging.INFO, "✅ User %s sub %s", user_id, channel_id)
+
+# Gỡ video của 1 kênh khỏi feed user ngay trong Redis (từng lô 500 để unpack không vượt giới hạn Lua).
+# KEYS: feed user, channel videos | Trả về số video đã gỡ.
+_unfeed_channel_script = r.register_script("""
+local removed = 0
+local start = 0
+while true do
+    local ids = redis.call('ZRANGE', KEYS[2], start, start + 499)
+    if #ids == 0 then break end
+    removed = removed + redis.call('ZREM', KEYS[1], unpack(ids))
+    start = start + #ids
+end
+return removed
+""")
+
+def queue_unfeed_channel(pipe, user_id, channel_id):
+    """Xếp lệnh gỡ video của kênh khỏi feed user vào pipeline (không kéo zset của kênh về Python)"""
+    queue_script(pipe, _unfeed_channel_script, [_user_feed_key(user_id), f"channel:{channel_id}:videos"], [])
 
 def unsubscribe_channel(user_id, channel_id):
-    print(f"🚫 User {user_id} un-sub {channel_id}...")
-    r.srem(f"user:{user_id}:subs", channel_id)
-    
+    sampled(logger, logging.INFO, "🚫 User %s un-sub %s...", user_id, channel_id)
     follower_key = f"channel:{channel_id}:followers"
-    r.srem(follower_key, user_id)
+    pipe = r.pipeline()
+    pipe.srem(f"user:{user_id}:subs", channel_id)
+    pipe.srem(follower_key, user_id)
+    queue_unfeed_channel(pipe, user_id, channel_id)
+    pipe.scard(follower_key)
+    followers = pipe.execute()[-1]
     
     # Nếu không còn ai follow thì xóa kênh
-    if r.scard(follower_key) == 0:
-        print(f"♻️ Kênh {channel_id} trống -> Xóa sổ.")
+    if followers == 0:
+        logger.info("♻️ Kênh %s trống -> Xóa sổ.", channel_id)
         delete_entire_channel(channel_id)
         return True
+    update_explore_score(channel_id)
     return False
 
-def delete_entire_channel(channel_id):
+# === XÓA KÊNH THEO LÔ (CÓ THỂ CHẠY TIẾP NẾU BỊ NGẮT) ===
+DELETE_CHUNK_SIZE = 500
+DELETING_CHANNELS_KEY = "channels:deleting"
+
+def delete_entire_channel(channel_id, chunk_size=DELETE_CHUNK_SIZE):
+    """
+    Xóa kênh theo từng lô video (mỗi lô 1 pipeline), không kéo cả zset về Python.
+    Mỗi lô gỡ video khỏi: video:{id}, videos:all, videos:score, videos:trending, feed của follower, index tìm kiếm
+    rồi mới gỡ khỏi channel:{id}:videos => bị ngắt giữa chừng thì gọi lại sẽ làm tiếp.
+    """
+    r.sadd(DELETING_CHANNELS_KEY, channel_id)
     video_list_key = f"channel:{channel_id}:videos"
-    video_ids = r.zrange(video_list_key, 0, -1)
-    
-    if video_ids:
-        # Xóa các video khỏi Hash chi tiết
-        r.delete(*[f"video:{vid}" for vid in video_ids])
-        # Xóa các video khỏi Global Feed (QUAN TRỌNG)
-        r.zrem("videos:all", *video_ids)
-    
-    r.delete(video_list_key)
-    r.delete(f"channel:{channel_id}:info")
-    r.delete(f"channel:{channel_id}:followers")
-    print(f"🗑️ Đã xóa kênh {channel_id}")
+    followers = r.smembers(f"channel:{channel_id}:followers")
+    total = 0
+
+    while True:
+        video_ids = r.zrange(video_list_key, 0, chunk_size - 1)
+        if not video_ids: break
+        # Cần title để biết video nằm trong những token nào của index tìm kiếm
+        videos = load_videos(video_ids)
+        pipe = r.pipeline(transaction=False)
+        for video in videos:
+            if video:
+                text_index.queue_unindex_video(pipe, video["id"], video["title"])
+        pipe.delete(*[_video_key(vid) for vid in video_ids])
+        pipe.zrem("videos:all", *video_ids)
+        pipe.zrem("videos:score", *video_ids)
+        pipe.zrem(TRENDING_KEY, *video_ids)
+        pipe.zrem(TRENDING_NEXT_KEY, *video_ids)
+        for user_id in followers:
+            pipe.zrem(_user_feed_key(user_id), *video_ids)
+        pipe.zrem(video_list_key, *video_ids)
+        pipe.execute()
+        total += len(video_ids)
+
+    name = r.hget(f"channel:{channel_id}:info", "name")
+    pipe = r.pipeline(transaction=False)
+    for user_id in followers:
+        pipe.srem(f"user:{user_id}:subs", channel_id)
+    if name:
+        text_index.queue_unindex_channel(pipe, channel_id, name)
+    pipe.delete(video_list_key, f"channel:{channel_id}:info", f"channel:{channel_id}:followers",
+                f"channel:{channel_id}:page", _arrivals_key(channel_id))
+    pipe.srem(CHANNEL_REGISTRY_KEY, channel_id)
+    pipe.zrem(EXPLORE_KEY, channel_id)
+    pipe.srem(DELETING_CHANNELS_KEY, channel_id)
+    pipe.execute()
+    invalidate_channel_cache(channel_id)
+    logger.info("🗑️ Đã xóa kênh %s (%d video)", channel_id, total)
+    return total
+
+def resume_channel_deletions():
+    """Chạy tiếp các lần xóa kênh bị ngắt giữa chừng"""
+    channel_ids = r.smembers(DELETING_CHANNELS_KEY)
+    for channel_id in channel_ids:
+        delete_entire_channel(channel_id)
+    return len(channel_ids)
+
+def gc_orphan_videos(batch_size=1000):
+    """
+    Dọn ID "mồ côi" trong videos:score / videos:all / videos:trending (video:{id} không còn tồn tại),
+    sinh ra từ các lần xóa kênh cũ. Quét bằng ZSCAN nên không chặn Redis.
+    """
+    removed = {}
+    for index_key in ("videos:score", "videos:all", TRENDING_KEY):
+        removed[index_key] = 0
+        batch = []
+        for video_id, _ in r.zscan_iter(index_key, count=batch_size):
+            batch.append(video_id)
+            if len(batch) >= batch_size:
+                removed[index_key] += _purge_orphans(index_key, batch)
+                batch = []
+        if batch:
+            removed[index_key] += _purge_orphans(index_key, batch)
+    logger.info("🧹 GC: đã xóa %d ID mồ côi %s", sum(removed.values()), removed)
+    return removed
+
+def _purge_orphans(index_key, video_ids):
+    pipe = r.pipeline(transaction=False)
+    for video_id in video_ids:
+        pipe.exists(_video_key(video_id))
+    orphans = [vid for vid, exists in zip(video_ids, pipe.execute()) if not exists]
+    if orphans:
+        r.zrem(index_key, *orphans)
+    return len(orphans)
 
 def get_channels_info(channel_ids):
-    channels = []
-    for cid in channel_ids:
-        info = r.hgetall(f"channel:{cid}:info")
-        if info: channels.append(info)
-    return channels
+    """Lấy info nhiều kênh trong 1 round trip"""
+    infos = _hgetall_many([f"channel:{cid}:info" for cid in channel_ids])
+    return [info for info in infos if info]
+
+def get_all_channel_ids():
+    return list(r.smembers(CHANNEL_REGISTRY_KEY))
+
+def get_channels_page(cursor=0, limit=50):
+    """
+    Phân trang danh sách kênh bằng SSCAN trên registry + hydrate theo lô.
+    Trả về (channels, next_cursor); next_cursor = 0 nghĩa là hết.
+    """
+    next_cursor, channel_ids = r.sscan(CHANNEL_REGISTRY_KEY, cursor=cursor, count=limit)
+    return get_channels_info(channel_ids), int(next_cursor)
 
 def get_all_channels():
     """Lấy danh sách thông tin tất cả các kênh trong hệ thống"""
-    # Lấy tất cả key có dạng channel:*:info
-    keys = r.keys("channel:*:info")
-    channels = []
-    for key in keys:
-        info = r.hgetall(key)
-        if info:
-            channels.append(info)
+    channels, cursor = get_channels_page(0)
+    while cursor:
+        page, cursor = get_channels_page(cursor)
+        channels.extend(page)
     return channels
 
+def backfill_channel_registry():
+    """Migration: đưa các kênh cũ (chưa có trong registry) vào channels:all bằng SCAN"""
+    total = 0
+    batch = []
+    for key in r.scan_iter(match="channel:*:info", count=1000):
+        batch.append(key.split(":")[1])
+        if len(batch) >= 1000:
+            total += r.sadd(CHANNEL_REGISTRY_KEY, *batch)
+            batch = []
+    if batch:
+        total += r.sadd(CHANNEL_REGISTRY_KEY, *batch)
+    logger.info("🔧 Đã thêm %d kênh vào registry", total)
+    return total
+
 def get_user_subscriptions(user_id):
     key = f"user:{user_id}:subs"
     return list(r.smembers(key))
@@ -241,52 +1213,79 @@ def get_global_video_ids(limit=200, offset=0, sort_by="score_asc"):
     Lấy ID video toàn cầu.
     - sort_by="time": Mới nhất (videos:all)
     - sort_by="score_asc": Ít view nhất (videos:score) -> Logic cũ (Fairness)
-    - sort_by="score_desc": Nhiều view nhất (videos:score) -> Trending
+    - sort_by="score_desc": Nhiều view nhất (videos:score), tính cả view từ rất lâu
+    - sort_by="trending": Đang hot (videos:trending, view gần đây nặng hơn view cũ)
     """
+    return range_global(r, sort_by, offset, limit)
+
+def range_global(client, sort_by, offset, limit):
+    """Lệnh range tương ứng sort_by trên client bất kỳ (r, pipeline, hay ar -> trả về awaitable)"""
     if sort_by == "time":
         # Lấy theo thời gian (Mới nhất)
-        return r.zrevrange("videos:all", offset, offset + limit - 1)
+        return client.zrevrange("videos:all", offset, offset + limit - 1)
     
     elif sort_by == "score_asc":
         # Lấy theo điểm thấp nhất (Ưu tiên video ít người xem)
-        return r.zrange("videos:score", offset, offset + limit - 1)
+        return client.zrange("videos:score", offset, offset + limit - 1)
+
+    elif sort_by == "trending":
+        return client.zrevrange(TRENDING_KEY, offset, offset + limit - 1)
     
     else: # score_desc
         # Lấy theo điểm cao nhất (Trending)
-        return r.zrevrange("videos:score", offset, offset + limit - 1)
+        return client.zrevrange("videos:score", offset, offset + limit - 1)
 
 def get_subscribed_video_ids(user_id, limit=200, offset=0, sort_by="score_asc"):
     """
     Lấy ID từ các kênh đã Sub, CÓ kết hợp tính điểm.
+    Đọc từ user:{id}:feed (đã materialize) thay vì ZUNIONSTORE mọi kênh mỗi request.
     """
-    subs = list(r.smembers(f"user:{user_id}:subs"))
-    if not subs: return []
+    feed_key = _user_feed_key(user_id)
+    video_ids = _range_user_feed(feed_key, user_id, limit, offset, sort_by)
 
-    # 1. Gom tất cả video của các kênh đã sub
-    keys_to_union = [f"channel:{cid}:videos" for cid in subs]
-    
-    if not keys_to_union: return []
+    # Feed chưa từng được build (dữ liệu cũ) -> build 1 lần rồi đọc lại
+    if not video_ids and offset == 0 and not r.exists(feed_key):
+        if rebuild_user_feed(user_id):
+            video_ids = _range_user_feed(feed_key, user_id, limit, offset, sort_by)
+    return video_ids
 
-    # Key tạm 1: Chứa tất cả video của sub (Score là Timestamp)
-    temp_sub_all = f"temp:sub_all:{user_id}"
-    r.zunionstore(temp_sub_all, keys_to_union)
-    r.expire(temp_sub_all, 60) # Tự hủy sau 60s
+def get_subscribed_sampled_ids(user_id, size, exclude=()):
+    """
+    Lấy mẫu có trọng số (ít view + mới) trên feed Sub của user.
+    Trả về None nếu feed Sub trống, [] nếu mọi video đều nằm trong exclude.
+    """
+    feed_key = _user_feed_key(user_id)
+    entries = r.zrevrange(feed_key, 0, SUB_SAMPLE_CAP - 1, withscores=True)
+    if not entries and rebuild_user_feed(user_id):
+        entries = r.zrevrange(feed_key, 0, SUB_SAMPLE_CAP - 1, withscores=True)
+    if not entries: return None
+    ids = [vid for vid, _ in entries]
+    views = [score or 0 for score in r.zmscore("videos:score", ids)]
+    return sampler.weighted_sample(ids, views, [ts for _, ts in entries], size, exclude)
 
-    # 2. [QUAN TRỌNG] Giao với bảng điểm (videos:score) để lấy View
-    # Logic: Chỉ lấy những video nằm trong temp_sub_all, nhưng dùng Score của videos:score
-    temp_final = f"temp:sub_scored:{user_id}"
-    
-    # === 👇 DÒNG ĐÃ SỬA Ở ĐÂY 👇 ===
-    # Thay vì weights=[0, 1], ta truyền dictionary
-    r.zinterstore(temp_final, keys={temp_sub_all: 0, "videos:score": 1})
-    
-    r.expire(temp_final, 60)
+def score_key(sort_by):
+    """Zset điểm dùng cho chiến thuật sort_by (không dùng cho "time")"""
+    return TRENDING_KEY if sort_by == "trending" else "videos:score"
+
+def queue_feed_range(pipe, feed_key, user_id, limit, offset, sort_by):
+    """Xếp lệnh đọc 1 trang feed Sub vào pipeline; kết quả là phần tử cuối của execute()"""
+    if sort_by == "time":
+        # Mới nhất: chỉ 1 lệnh range
+        pipe.zrevrange(feed_key, offset, offset + limit - 1)
+        return
 
-    # 3. Lấy ID ra theo thứ tự mong muốn
+    # Theo điểm: cắt SUB_SCORE_WINDOW video mới nhất của feed, giao với bảng điểm (feed x0, điểm x1) rồi range.
+    # Chi phí mỗi trang bị chặn theo cửa sổ chứ không theo cả feed; gói trong 1 round trip
+    temp_final = f"temp:sub_scored:{user_id}"
+    pipe.zrangestore(temp_final, feed_key, 0, SUB_SCORE_WINDOW - 1, desc=True)
+    pipe.zinterstore(temp_final, keys={temp_final: 0, score_key(sort_by): 1})
+    pipe.expire(temp_final, 60)
     if sort_by == "score_asc":
-        return r.zrange(temp_final, offset, offset + limit - 1) # Ít view nhất
-    elif sort_by == "score_desc":
-        return r.zrevrange(temp_final, offset, offset + limit - 1) # Nhiều view nhất
+        pipe.zrange(temp_final, offset, offset + limit - 1) # Ít view nhất
     else:
-        # Nếu muốn sort theo time thì lấy từ temp_sub_all gốc (Mới nhất)
-        return r.zrevrange(temp_sub_all, offset, offset + limit - 1)
+        pipe.zrevrange(temp_final, offset, offset + limit - 1) # Nhiều view nhất
+
+def _range_user_feed(feed_key, user_id, limit, offset, sort_by):
+    pipe = r.pipeline()
+    queue_feed_range(pipe, feed_key, user_id, limit, offset, sort_by)
+    return pipe.execute()[-1]
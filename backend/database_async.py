@@ -0,0 +1,202 @@
+"""
+Lớp truy cập Redis bất đồng bộ (redis.asyncio) cho các API nóng:
+feed, view, subscription. Chỉ có phần I/O ở đây: tên key, chọn nguồn pool, xếp lệnh
+vào pipeline (queue_*, range_global...) dùng chung với database.py nên 2 bản không lệch nhau.
+Các thao tác nặng/hiếm (xóa kênh, rebuild feed) vẫn dùng bản sync nhưng chạy trong thread riêng.
+"""
+import asyncio
+import os
+import random
+
+import redis.asyncio as aioredis
+
+import database as db
+import sampler
+
+# Pool dùng chung cho cả process. BlockingConnectionPool: khi hết connection thì
+# request chờ (tối đa REDIS_POOL_TIMEOUT giây) thay vì lỗi ngay lúc tải cao.
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "200"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+
+class CountingAsyncPipeline(aioredis.client.Pipeline):
+    async def execute(self, raise_on_error=True):
+        if self.command_stack:
+            db._count_round_trip(len(self.command_stack))
+        return await super().execute(raise_on_error)
+
+class CountingAsyncRedis(aioredis.Redis):
+    async def execute_command(self, *args, **options):
+        db._count_round_trip()
+        return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return CountingAsyncPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+pool = aioredis.BlockingConnectionPool.from_url(
+    db.REDIS_URL,
+    decode_responses=True,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_keepalive=True,
+    health_check_interval=30,
+)
+ar = CountingAsyncRedis(connection_pool=pool)
+
+async def close():
+    await pool.disconnect()
+
+# === HYDRATE VIDEO / KÊNH ===
+async def _hgetall_many(keys):
+    if not keys: return []
+    pipe = ar.pipeline(transaction=False)
+    for key in keys:
+        pipe.hgetall(key)
+    return await pipe.execute()
+
+async def load_videos(video_ids):
+    """Giống db.load_videos: 1 MGET, chỉ đọc thêm hash cũ cho ID chưa migrate"""
+    if not video_ids: return []
+    videos, missing = db.unpack_videos(video_ids, await ar.mget([db._video_key(vid) for vid in video_ids]))
+    if missing and db.legacy_check_due():
+        db.set_video_format(await ar.get(db.VIDEO_FORMAT_KEY))
+    if missing and not db._video_format["packed"]:
+        infos = await _hgetall_many([db._video_key(video_ids[i]) for i in missing])
+        db.merge_legacy_videos(videos, video_ids, missing, infos)
+    return videos
+
+async def get_videos_from_ids(video_ids):
+    """Giống db.get_videos_from_ids: tối đa 2 round trip cho cả trang"""
+    videos = [video for video in await load_videos(video_ids) if video]
+    if not videos: return []
+
+    channels, missing = db.channel_cache.get_many(db.unique_channel_ids(videos))
+    if missing:
+        fetched = dict(zip(missing, await _hgetall_many([f"channel:{cid}:info" for cid in missing])))
+        db.channel_cache.put_many(fetched)
+        channels.update(fetched)
+    return db.attach_channel_info(videos, channels)
+
+async def get_channels_info(channel_ids):
+    infos = await _hgetall_many([f"channel:{cid}:info" for cid in channel_ids])
+    return [info for info in infos if info]
+
+async def is_channel_exist(channel_id):
+    return await ar.exists(f"channel:{channel_id}:info")
+
+# === LẤY ID VIDEO ===
+async def get_global_video_ids(limit=200, offset=0, sort_by="score_asc"):
+    return await db.range_global(ar, sort_by, offset, limit)
+
+async def get_subscribed_video_ids(user_id, limit=200, offset=0, sort_by="score_asc"):
+    feed_key = db._user_feed_key(user_id)
+    video_ids = await _range_user_feed(feed_key, user_id, limit, offset, sort_by)
+
+    # Feed chưa từng được build (dữ liệu cũ) -> build 1 lần rồi đọc lại
+    if not video_ids and offset == 0 and not await ar.exists(feed_key):
+        if await asyncio.to_thread(db.rebuild_user_feed, user_id):
+            video_ids = await _range_user_feed(feed_key, user_id, limit, offset, sort_by)
+    return video_ids
+
+async def get_subscribed_sampled_ids(user_id, size, exclude=()):
+    feed_key = db._user_feed_key(user_id)
+    entries = await ar.zrevrange(feed_key, 0, db.SUB_SAMPLE_CAP - 1, withscores=True)
+    if not entries and await asyncio.to_thread(db.rebuild_user_feed, user_id):
+        entries = await ar.zrevrange(feed_key, 0, db.SUB_SAMPLE_CAP - 1, withscores=True)
+    if not entries: return None
+    ids = [vid for vid, _ in entries]
+    views = [score or 0 for score in await ar.zmscore("videos:score", ids)]
+    return sampler.weighted_sample(ids, views, [ts for _, ts in entries], size, exclude)
+
+async def _range_user_feed(feed_key, user_id, limit, offset, sort_by):
+    pipe = ar.pipeline()
+    db.queue_feed_range(pipe, feed_key, user_id, limit, offset, sort_by)
+    return (await pipe.execute())[-1]
+
+# === FEED THEO SESSION ===
+async def _build_pool_ids(user_id=None, sort_by="score_asc", size=db.SESSION_POOL_SIZE, exclude=()):
+    for source in db.pool_sources(user_id, sort_by):
+        if source == "sub_sample":
+            video_ids = await get_subscribed_sampled_ids(user_id, size, exclude)
+        elif source == "sub_range":
+            video_ids = await get_subscribed_video_ids(user_id, limit=size, sort_by=sort_by)
+        elif source == "global_sample":
+            video_ids = sampler.global_sampler.draw(size, exclude)  # RAM, không I/O
+        else:
+            video_ids = await get_global_video_ids(limit=size, sort_by="time" if source == "global_time" else sort_by)
+        if db.pool_source_done(source, video_ids):
+            return video_ids
+    return []
+
+async def init_feed_session(session_id, user_id=None, sort_by="score_asc"):
+    session_key, seen_key = db._session_keys(session_id)
+    pipe = ar.pipeline(transaction=False)
+    pipe.smembers(seen_key)
+    pipe.lrange(session_key, 0, -1)
+    seen, queued = await pipe.execute()
+    skip = seen | set(queued)
+
+    fresh_ids = db.fresh_pool_ids(await _build_pool_ids(user_id, sort_by, exclude=skip), skip)
+    if not fresh_ids and not queued:
+        await ar.delete(seen_key)
+        fresh_ids = await _build_pool_ids(user_id, sort_by)
+    if not fresh_ids:
+        return bool(queued)
+
+    random.shuffle(fresh_ids)
+    pipe = ar.pipeline()
+    db.queue_session_push(pipe, session_key, fresh_ids)
+    await pipe.execute()
+    return True
+
+async def pop_session_video_ids(session_id, limit=5):
+    session_key, seen_key = db._session_keys(session_id)
+    pipe = ar.pipeline()
+    db.queue_session_pop(pipe, session_key, limit)
+    video_ids, remaining, _ = await pipe.execute()
+    video_ids = video_ids or []
+
+    if video_ids:
+        pipe = ar.pipeline()
+        db.queue_mark_seen(pipe, seen_key, video_ids)
+        await pipe.execute()
+    return video_ids, remaining
+
+async def get_seen_ids(session_id):
+    """Các video session đã xem (khách đọc từ snapshot pool dùng để không trùng giữa các trang)"""
+    _, seen_key = db._session_keys(session_id)
+    return await ar.smembers(seen_key)
+
+async def mark_seen(session_id, video_ids, reset=False):
+    """Ghi nhận video đã xem; reset=True: đã xem hết snapshot -> xóa seen, bắt đầu vòng mới"""
+    if not video_ids: return
+    _, seen_key = db._session_keys(session_id)
+    pipe = ar.pipeline()
+    if reset:
+        pipe.delete(seen_key)
+    db.queue_mark_seen(pipe, seen_key, video_ids)
+    await pipe.execute()
+
+# === SUBSCRIPTION ===
+async def get_user_subscriptions(user_id):
+    return list(await ar.smembers(f"user:{user_id}:subs"))
+
+async def subscribe_channel(user_id, channel_id):
+    pipe = ar.pipeline()
+    db.queue_subscribe(pipe, user_id, channel_id)
+    await pipe.execute()
+
+async def unsubscribe_channel(user_id, channel_id):
+    follower_key = f"channel:{channel_id}:followers"
+    pipe = ar.pipeline()
+    pipe.srem(f"user:{user_id}:subs", channel_id)
+    pipe.srem(follower_key, user_id)
+    db.queue_unfeed_channel(pipe, user_id, channel_id)
+    pipe.scard(follower_key)
+    db.queue_explore_update(pipe, channel_id)
+    _, _, _, followers, _ = await pipe.execute()
+
+    # Nếu không còn ai follow thì xóa kênh (việc nặng -> chạy trong thread)
+    if followers == 0:
+        await asyncio.to_thread(db.delete_entire_channel, channel_id)
+        return True
+    return False
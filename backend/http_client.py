@@ -0,0 +1,98 @@
+"""
+HTTP client dùng chung cho worker: giới hạn tốc độ theo từng host
+để crawl song song nhiều kênh mà không dội request vào YouTube.
+"""
+import asyncio
+import contextlib
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# Số request/giây tối đa cho mỗi host (burst = số request được phép dồn 1 lúc)
+HOST_RATE_LIMIT = float(os.getenv("CRAWL_HOST_RPS", "5"))
+HOST_BURST = int(os.getenv("CRAWL_HOST_BURST", "5"))
+
+class HostRateLimiter:
+    """Token bucket riêng cho từng host, an toàn khi gọi từ nhiều thread"""
+
+    def __init__(self, rate=HOST_RATE_LIMIT, burst=HOST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # host -> [tokens, last_refill]
+        self._lock = threading.Lock()
+
+    def reserve(self, host):
+        """Giữ chỗ 1 token, trả về số giây phải chờ trước khi được gửi request"""
+        if self.rate <= 0: return 0
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate) - 1
+            # tokens âm = đang nợ, các request sau phải chờ lâu hơn
+            self._buckets[host] = (tokens, now)
+            return 0 if tokens >= 0 else -tokens / self.rate
+
+    def acquire(self, host):
+        wait = self.reserve(host)
+        if wait: time.sleep(wait)
+
+    async def acquire_async(self, host):
+        wait = self.reserve(host)
+        if wait: await asyncio.sleep(wait)
+
+limiter = HostRateLimiter()
+session = requests.Session()
+
+class RateLimitedAdapter(HTTPAdapter):
+    """Transport adapter đi qua limiter (đọc limiter lúc gửi, nên đổi limiter lúc chạy vẫn có tác dụng)"""
+
+    def send(self, request, **kwargs):
+        limiter.acquire(urlsplit(request.url).netloc)
+        return super().send(request, **kwargs)
+
+def rate_limited(sess):
+    """Gắn rate limit theo host vào 1 requests.Session có sẵn (VD: session thư viện khác tự tạo)"""
+    adapter = RateLimitedAdapter()
+    sess.mount("https://", adapter)
+    sess.mount("http://", adapter)
+    return sess
+
+def get(url, **kwargs):
+    """requests.get có rate limit theo host"""
+    limiter.acquire(urlsplit(url).netloc)
+    return session.get(url, **kwargs)
+
+# Client async cho API (không chặn event loop), tạo lười lần đầu dùng
+_async_client = None
+
+def _get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _async_client
+
+async def aget(url, **kwargs):
+    """Bản async của get()"""
+    await limiter.acquire_async(urlsplit(url).netloc)
+    return await _get_async_client().get(url, **kwargs)
+
+@contextlib.asynccontextmanager
+async def astream(url, **kwargs):
+    """GET dạng stream (async): đọc từng khúc, có thể ngắt sớm"""
+    await limiter.acquire_async(urlsplit(url).netloc)
+    async with _get_async_client().stream("GET", url, **kwargs) as response:
+        yield response
+
+async def aclose():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
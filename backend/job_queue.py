@@ -0,0 +1,168 @@
+"""
+Hàng đợi job bền vững trên Redis (thay cho FastAPI BackgroundTasks).
+- API chỉ enqueue, process worker (python worker.py) lấy job ra chạy
+- Dedup theo key (VD: channel_id): job trùng khi job cũ chưa xong sẽ được gộp
+- Visibility timeout: worker chết giữa chừng thì job tự quay lại hàng đợi (tính 1 lần thử,
+  nên job làm chết worker cũng vào dead-letter); job chạy lâu gọi extend() để gia hạn
+- Retry với backoff lũy thừa, quá số lần thì vào dead-letter
+"""
+import os
+import time
+import uuid
+
+from database import r
+
+QUEUE_KEY = "jobs:queue"            # list: job_id sẵn sàng chạy
+PROCESSING_KEY = "jobs:processing"  # zset: job_id -> hạn chót (visibility timeout)
+DELAYED_KEY = "jobs:delayed"        # zset: job_id -> thời điểm được retry
+DEAD_KEY = "jobs:dead"              # list: job hỏng quá số lần retry
+STATS_KEY = "jobs:stats"            # hash: bộ đếm enqueued/coalesced/done/retried/timed_out/dead
+
+VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "1800"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = int(os.getenv("JOB_BACKOFF_BASE", "30"))
+BACKOFF_MAX = int(os.getenv("JOB_BACKOFF_MAX", "3600"))
+DEDUP_TTL = 6 * 3600
+
+def _job_key(job_id):
+    return f"job:{job_id}"
+
+def _dedup_key(kind, dedup):
+    return f"jobs:dedup:{kind}:{dedup}"
+
+# Lấy 1 job: RPOP + đánh dấu đang xử lý, atomic để không mất job
+_reserve_script = r.register_script("""
+local job_id = redis.call('RPOP', KEYS[1])
+if not job_id then return false end
+redis.call('ZADD', KEYS[2], ARGV[1], job_id)
+return job_id
+""")
+
+# Job quá visibility timeout (worker chết / treo): tính là 1 lần thử như fail(),
+# quá MAX_ATTEMPTS thì vào dead-letter thay vì quay vòng mãi.
+# Tên key job:{id} / jobs:dedup:{kind}:{dedup} phải khớp _job_key / _dedup_key.
+_requeue_expired_script = r.register_script("""
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job_id in ipairs(due) do
+    redis.call('ZREM', KEYS[1], job_id)
+    local job_key = 'job:' .. job_id
+    if redis.call('EXISTS', job_key) == 1 then
+        local attempts = redis.call('HINCRBY', job_key, 'attempts', 1)
+        redis.call('HSET', job_key, 'last_error', 'visibility timeout')
+        if attempts >= tonumber(ARGV[3]) then
+            redis.call('HSET', job_key, 'status', 'dead')
+            redis.call('LPUSH', KEYS[3], job_id)
+            local job = redis.call('HMGET', job_key, 'kind', 'dedup')
+            if job[1] and job[2] and job[2] ~= '' then
+                redis.call('DEL', 'jobs:dedup:' .. job[1] .. ':' .. job[2])
+            end
+            redis.call('HINCRBY', KEYS[4], 'dead', 1)
+        else
+            redis.call('HSET', job_key, 'status', 'queued')
+            redis.call('RPUSH', KEYS[2], job_id)
+            redis.call('HINCRBY', KEYS[4], 'timed_out', 1)
+        end
+    end
+end
+return #due
+""")
+
+# Chuyển các job delayed đến hạn về lại hàng đợi
+_move_due_script = r.register_script("""
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job_id in ipairs(due) do
+    redis.call('ZREM', KEYS[1], job_id)
+    redis.call('RPUSH', KEYS[2], job_id)
+end
+return #due
+""")
+
+def enqueue(kind, dedup=None, **payload):
+    """
+    Thêm job. Nếu đã có job cùng (kind, dedup) chưa xong thì trả về job cũ (coalesce).
+    Trả về (job_id, created)
+    """
+    job_id = uuid.uuid4().hex
+    if dedup is not None:
+        dedup_key = _dedup_key(kind, dedup)
+        if not r.set(dedup_key, job_id, nx=True, ex=DEDUP_TTL):
+            r.hincrby(STATS_KEY, "coalesced", 1)
+            return r.get(dedup_key), False
+
+    job = {"id": job_id, "kind": kind, "dedup": dedup or "", "attempts": 0,
+           "status": "queued", "created_at": int(time.time()), **payload}
+    pipe = r.pipeline()
+    pipe.hset(_job_key(job_id), mapping=job)
+    pipe.lpush(QUEUE_KEY, job_id)
+    pipe.hincrby(STATS_KEY, "enqueued", 1)
+    pipe.execute()
+    return job_id, True
+
+def reserve():
+    """Lấy 1 job ra chạy (không block). Trả về dict job hoặc None."""
+    now = time.time()
+    _requeue_expired_script(keys=[PROCESSING_KEY, QUEUE_KEY, DEAD_KEY, STATS_KEY], args=[now, 100, MAX_ATTEMPTS])
+    _move_due_script(keys=[DELAYED_KEY, QUEUE_KEY], args=[now, 100])
+
+    job_id = _reserve_script(keys=[QUEUE_KEY, PROCESSING_KEY], args=[now + VISIBILITY_TIMEOUT])
+    if not job_id: return None
+    job = r.hgetall(_job_key(job_id))
+    if not job:
+        # Hash job đã mất (bị xóa tay) -> bỏ qua
+        r.zrem(PROCESSING_KEY, job_id)
+        return None
+    r.hset(_job_key(job_id), "status", "running")
+    return job
+
+def extend(job, timeout=VISIBILITY_TIMEOUT):
+    """
+    Heartbeat: gia hạn visibility timeout cho job đang chạy (gọi định kỳ trong job dài).
+    Trả về False nếu job không còn thuộc worker này (đã quá hạn và bị trả lại hàng đợi).
+    """
+    # XX: chỉ cập nhật khi job vẫn đang trong processing, không tự thêm lại job đã bị requeue
+    return r.zadd(PROCESSING_KEY, {job["id"]: time.time() + timeout}, xx=True, ch=True) == 1
+
+def ack(job):
+    """Job chạy xong"""
+    pipe = r.pipeline()
+    pipe.zrem(PROCESSING_KEY, job["id"])
+    if job.get("dedup"):
+        pipe.delete(_dedup_key(job["kind"], job["dedup"]))
+    pipe.hset(_job_key(job["id"]), "status", "done")
+    pipe.expire(_job_key(job["id"]), 86400)
+    pipe.hincrby(STATS_KEY, "done", 1)
+    pipe.execute()
+
+def fail(job, error):
+    """Job lỗi: retry với backoff, quá MAX_ATTEMPTS thì đưa vào dead-letter"""
+    attempts = int(job.get("attempts", 0)) + 1
+    job_key = _job_key(job["id"])
+    pipe = r.pipeline()
+    pipe.zrem(PROCESSING_KEY, job["id"])
+    pipe.hset(job_key, mapping={"attempts": attempts, "last_error": str(error)[:500]})
+    if attempts >= MAX_ATTEMPTS:
+        pipe.hset(job_key, "status", "dead")
+        pipe.lpush(DEAD_KEY, job["id"])
+        if job.get("dedup"):
+            pipe.delete(_dedup_key(job["kind"], job["dedup"]))
+        pipe.hincrby(STATS_KEY, "dead", 1)
+    else:
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+        pipe.hset(job_key, "status", "retrying")
+        pipe.zadd(DELAYED_KEY, {job["id"]: time.time() + delay})
+        pipe.hincrby(STATS_KEY, "retried", 1)
+    pipe.execute()
+
+def queue_stats():
+    """Độ sâu hàng đợi + bộ đếm (dùng cho monitoring)"""
+    pipe = r.pipeline(transaction=False)
+    pipe.llen(QUEUE_KEY)
+    pipe.zcard(PROCESSING_KEY)
+    pipe.zcard(DELAYED_KEY)
+    pipe.llen(DEAD_KEY)
+    pipe.hgetall(STATS_KEY)
+    queued, processing, delayed, dead, counters = pipe.execute()
+    return {
+        "queued": queued, "processing": processing, "delayed": delayed, "dead": dead,
+        **{k: int(v) for k, v in counters.items()},
+    }
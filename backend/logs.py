@@ -0,0 +1,43 @@
+"""
+Logging có cấp độ (LOG_LEVEL) thay cho print ở hot path.
+- Ghi log qua QueueHandler: thread xử lý request chỉ đẩy vào queue,
+  việc ghi ra stdout do 1 thread nền làm -> stdout chậm không kéo theo API.
+- sampled(): với log rất dày (mỗi view, mỗi lần sub...) chỉ ghi 1 phần LOG_SAMPLE_RATE.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+_listener = None
+
+def setup():
+    """Cấu hình root logger 1 lần cho cả process (gọi lại không sao)"""
+    global _listener
+    if _listener is not None: return
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    # Ghi nốt log còn trong queue trước khi process thoát
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+def get_logger(name):
+    setup()
+    return logging.getLogger(name)
+
+def sampled(logger, level, msg, *args, rate=None):
+    """Ghi log với xác suất rate. Kiểm tra level trước để không tốn công format chuỗi."""
+    if logger.isEnabledFor(level) and random.random() < (LOG_SAMPLE_RATE if rate is None else rate):
+        logger.log(level, msg, *args)
@@ -1,20 +1,33 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Header, Query
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, RedirectResponse
+from google.auth import jwt as google_jwt
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
 import database as db
+import database_async as adb
+import http_client
 import worker
+import job_queue
+import responses
+import media_cache
+import scheduler
+import metrics
+from logs import get_logger
+from view_buffer import aggregator as view_aggregator
+import pool_builder
+from pool_builder import pool_cache
+from sampler import global_sampler
 import random
 import os
 from dotenv import load_dotenv
-import schedule
-import threading
 import time
 
 load_dotenv()
 
+logger = get_logger("main")
+
 app = FastAPI()
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
@@ -30,8 +43,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Đo độ trễ + số lệnh/round trip Redis của từng request, gom theo route (không theo URL thật)"""
+    _, token = metrics.begin_request()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.end_request(token, request.method, route.path if route else "unmatched",
+                            status, time.perf_counter() - start)
+
 # --- MODELS ---
 class VideoResponse(BaseModel):
     id: str
@@ -58,71 +87,91 @@ class SimpleSubRequest(BaseModel):
     user_id: str
     channel_id: str
 
-# === CHỨC NĂNG TỰ ĐỘNG CRAWL (AUTO-SCHEDULER) ===
-def job_daily_crawl():
-    print("⏰ [Auto-Scan] Bắt đầu quét định kỳ lúc 03:00 AM...")
-    try:
-        # Lấy tất cả key thông tin kênh từ Redis
-        # Pattern: channel:CHANNEL_ID:info
-        keys = db.r.keys("channel:*:info")
-        
-        count = 0
-        for key in keys:
-            # Tách chuỗi để lấy Channel ID
-            # key ví dụ: "channel:UC123abc:info" -> lấy phần tử số 1 là UC123abc
-            channel_id = key.split(":")[1]
-            
-            # Gọi worker với limit=10
-            worker.sync_channel_data(channel_id, limit=10)
-            count += 1
-            
-        print(f"✅ [Auto-Scan] Đã quét xong {count} kênh.")
-        
-    except Exception as e:
-        print(f"⚠️ [Auto-Scan] Lỗi: {e}")
-
-def run_scheduler_thread():
-    """Hàm chạy vòng lặp kiểm tra giờ trong luồng riêng"""
-    while True:
-        schedule.run_pending()
-        time.sleep(60) # Kiểm tra mỗi phút 1 lần
-
-# Thiết lập lịch chạy vào 03:00 sáng mỗi ngày
-schedule.every().day.at("03:00").do(job_daily_crawl)
+class ViewBatchRequest(BaseModel):
+    video_ids: List[str]
 
-# Khởi động Scheduler trong luồng riêng (Daemon Thread)
-# Để nó chạy song song với FastAPI mà không chặn server
-threading.Thread(target=run_scheduler_thread, daemon=True).start()
+# Crawl định kỳ chạy ở process riêng: python scheduler.py (xem scheduler.py)
 
 #============================================================
 # === API ENDPOINTS ===
 
 # --- API CHÍNH: GET FEED (ĐÃ SỬA LOGIC) ---
+
+# CHIẾN THUẬT SORT MẶC ĐỊNH (mỗi request có thể chọn khác qua ?strategy=):
+# "time": Mới nhất
+# "score_asc": Ít view nhất (Giống logic cũ của bạn)
+# "score_desc": Nhiều view nhất (tính cả view từ rất lâu)
+# "trending": Đang hot (view gần đây nặng hơn, xem db.TRENDING_HALF_LIFE)
+STRATEGY = os.getenv("FEED_STRATEGY", "score_asc")
+STRATEGIES = ("score_asc", "score_desc", "time", "trending")
+
+def to_video_response(v):
+    """Map dữ liệu trả về cho đúng format Frontend"""
+    return responses.video_payload(v)
+
+async def get_session_feed(session_id, user_id, limit, background_tasks, strategy=STRATEGY):
+    """
+    Feed theo session: pool chỉ build 1 lần, mỗi trang chỉ LPOP + hydrate.
+    Khi list sắp cạn thì nạp thêm pool ở background.
+    """
+    video_ids, remaining = await adb.pop_session_video_ids(session_id, limit)
+    if not video_ids:
+        # Session mới (hoặc đã hết hạn / cạn) -> build pool ngay
+        await adb.init_feed_session(session_id, user_id, strategy)
+        video_ids, remaining = await adb.pop_session_video_ids(session_id, limit)
+
+    if remaining < db.SESSION_REFILL_THRESHOLD:
+        background_tasks.add_task(db.refill_feed_session, session_id, user_id, strategy)
+
+    return await adb.get_videos_from_ids(video_ids)
+
 @app.get("/api/feed", response_model=List[VideoResponse])
-def get_feed(user_id: Optional[str] = None, page: int = 1, limit: int = 10):
+async def get_feed(background_tasks: BackgroundTasks, user_id: Optional[str] = None, session_id: Optional[str] = None, page: int = 1, limit: int = 10, strategy: Optional[str] = None):
+    """
+    strategy: score_asc | score_desc | time | trending (mặc định STRATEGY).
+    Feed theo session giữ chiến thuật lúc tạo session cho tới khi pool cạn.
+    """
+    if strategy is None:
+        strategy = STRATEGY
+    elif strategy not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"strategy phải là một trong {', '.join(STRATEGIES)}")
+    subs = await adb.get_user_subscriptions(user_id) if user_id else []
+
+    # Khách: lấy mẫu từ snapshot pool dựng sẵn trong RAM (không hydrate, không ZRANGE)
+    snapshot = None if subs else pool_cache.get(strategy)
+    if snapshot:
+        if session_id:
+            seen = await adb.get_seen_ids(session_id)
+            videos, reset = pool_builder.session_page(snapshot, session_id, seen, limit)
+            await adb.mark_seen(session_id, [v["id"] for v in videos], reset)
+        else:
+            videos = pool_builder.sample(snapshot, limit)
+        return responses.feed_response(videos)
+
+    # Có session: pool của session đã lấy mẫu với exclude = video đã xem, và tự reset khi xem hết
+    if session_id:
+        return responses.feed_response(await get_session_feed(session_id, user_id, limit, background_tasks, strategy))
+
+    # Fairness cho khách / user chưa sub: lấy mẫu có trọng số trên TOÀN BỘ video
+    if not subs and strategy == "score_asc" and global_sampler.ready():
+        return responses.feed_response(await adb.get_videos_from_ids(global_sampler.draw(limit)))
+
     POOL_SIZE = 200  # Lấy pool lớn ID để random
     video_ids = []
-    
-    # CHỌN CHIẾN THUẬT SORT Ở ĐÂY:
-    # "time": Mới nhất
-    # "score_asc": Ít view nhất (Giống logic cũ của bạn)
-    # "score_desc": Nhiều view nhất (Trending)
-    STRATEGY = "score_asc"
 
     # 1. CHỈ LẤY DANH SÁCH ID (Rất nhanh, chưa lấy thông tin chi tiết)
     if user_id:
-        subs = db.get_user_subscriptions(user_id)
         if subs:
             # Lấy video sub theo điểm
-            video_ids = db.get_subscribed_video_ids(user_id, limit=POOL_SIZE, sort_by=STRATEGY)
+            video_ids = await adb.get_subscribed_video_ids(user_id, limit=POOL_SIZE, sort_by=strategy)
             
             if not video_ids:
                 # Fallback sang global nếu sub chưa có gì
-                video_ids = db.get_global_video_ids(limit=POOL_SIZE, sort_by=STRATEGY)
+                video_ids = await adb.get_global_video_ids(limit=POOL_SIZE, sort_by=strategy)
         else:
-            video_ids = db.get_global_video_ids(limit=POOL_SIZE, sort_by=STRATEGY)
+            video_ids = await adb.get_global_video_ids(limit=POOL_SIZE, sort_by=strategy)
     else:
-        video_ids = db.get_global_video_ids(limit=POOL_SIZE, sort_by=STRATEGY)
+        video_ids = await adb.get_global_video_ids(limit=POOL_SIZE, sort_by=strategy)
 
     # 2. TRỘN ID VÀ CẮT (Thao tác trên RAM, cực nhanh)
     if video_ids:
@@ -133,55 +182,91 @@ def get_feed(user_id: Optional[str] = None, page: int = 1, limit: int = 10):
 
     # 3. BÂY GIỜ MỚI GỌI REDIS ĐỂ LẤY DATA (Chỉ tốn query cho 5 video thay vì 200)
     # Hàm này trong database.py đã tự lấy luôn thông tin Channel rồi
-    final_videos = db.get_videos_from_ids(selected_ids)
-    
-    # 4. Map dữ liệu trả về cho đúng format Frontend
-    clean_videos = []
-    for v in final_videos:
-        clean_videos.append({
-            "id": v['id'],
-            "channel_id": v['channel_id'],
-            "channel_name": v.get('channel_name', "Unknown"),
-            "channel_avatar": v.get('channel_avatar', "https://via.placeholder.com/150"),
-            "title": v['title'],
-            "thumbnail": v['thumbnail'],
-            "published_at": int(v['published_at']),
-            "embed_url": f"https://www.youtube.com/embed/{v['id']}?autoplay=0"
-        })
+    final_videos = await adb.get_videos_from_ids(selected_ids)
     
-    return clean_videos
+    # 4. Map dữ liệu trả về cho đúng format Frontend (JSON dựng sẵn, không qua Pydantic)
+    return responses.feed_response(final_videos)
 
 @app.post("/api/view/{video_id}")
-def count_view(video_id: str):
+async def count_view(video_id: str):
     """
     Frontend gọi API này khi người dùng xem >= 15s hoặc hết video.
     """
-    db.increase_video_score(video_id)
+    view_aggregator.add(video_id)
     return {"status": "ok", "message": "View counted"}
 
+@app.post("/api/views")
+async def count_views(req: ViewBatchRequest):
+    """Báo nhiều view trong 1 request (Frontend gom lại rồi gửi)"""
+    for video_id in req.video_ids[:100]:
+        view_aggregator.add(video_id)
+    return {"status": "ok", "counted": min(len(req.video_ids), 100)}
+
+# Thread flush view chạy cùng app, flush nốt khi tắt server
+@app.on_event("startup")
+def start_view_aggregator():
+    view_aggregator.start()
+
+@app.on_event("shutdown")
+def stop_view_aggregator():
+    view_aggregator.stop()
+
+# Thread dựng/tải snapshot pool cho feed khách
+@app.on_event("startup")
+def start_pool_cache():
+    pool_cache.start()
+
+@app.on_event("shutdown")
+def stop_pool_cache():
+    pool_cache.stop()
+
+# Thread làm mới snapshot điểm cho engine lấy mẫu
+@app.on_event("startup")
+def start_global_sampler():
+    global_sampler.start()
+
+@app.on_event("shutdown")
+def stop_global_sampler():
+    global_sampler.stop()
+
+# Nghe pub/sub để xóa cache info kênh khi worker/replica khác cập nhật kênh
+@app.on_event("startup")
+def start_channel_cache_listener():
+    db.channel_cache.start_listener(db.r)
+
+@app.on_event("shutdown")
+def stop_channel_cache_listener():
+    db.channel_cache.stop_listener()
+
+@app.on_event("shutdown")
+async def close_connections():
+    await adb.close()
+    await http_client.aclose()
+
 # --- CÁC API KHÁC (GIỮ NGUYÊN) ---
 
 @app.post("/api/channels")
-def add_channel(request: ChannelRequest, background_tasks: BackgroundTasks):
+async def add_channel(request: ChannelRequest):
     if "youtube.com" not in request.url and "youtu.be" not in request.url:
         raise HTTPException(status_code=400, detail="Link YouTube không hợp lệ")
 
-    channel_id = worker.get_channel_id_from_url(request.url)
+    channel_id = await worker.get_channel_id_from_url_async(request.url)
     if not channel_id:
         raise HTTPException(status_code=400, detail="Không tìm thấy ID kênh.")
 
     # Sub ngay lập tức
-    db.subscribe_channel(request.user_id, channel_id)
+    await adb.subscribe_channel(request.user_id, channel_id)
     
-    if not db.is_channel_exist(channel_id):
-        db.add_channel_to_db(channel_id, "New Channel", "https://via.placeholder.com/150")
+    if not await adb.is_channel_exist(channel_id):
+        await run_in_threadpool(db.add_channel_to_db, channel_id, "New Channel", "https://via.placeholder.com/150")
 
-    background_tasks.add_task(worker.sync_full_channel, request.url)
+    # Đẩy vào hàng đợi (worker process sẽ quét). Kênh đang chờ quét thì gộp chung job.
+    job_id, _ = await run_in_threadpool(job_queue.enqueue, "sync_channel", dedup=channel_id, channel_id=channel_id, limit=100)
     
-    return {"status": "success", "channel_id": channel_id, "message": "Đã thêm kênh! Đang tải video..."}
+    return {"status": "success", "channel_id": channel_id, "job_id": job_id, "message": "Đã thêm kênh! Đang tải video..."}
 
 @app.post("/api/channels/{channel_id}/sync")
-def sync_specific_channel(channel_id: str, background_tasks: BackgroundTasks):
+def sync_specific_channel(channel_id: str):
     """
     API để user chủ động làm mới 1 kênh.
     Có cơ chế chống Spam: Chỉ cho phép cập nhật 1 lần mỗi 10 phút.
@@ -204,20 +289,51 @@ def sync_specific_channel(channel_id: str, background_tasks: BackgroundTasks):
          }
     # -------------------------------------------
 
-    # Đẩy vào worker chạy ngầm
-    background_tasks.add_task(worker.sync_channel_by_id, channel_id)
+    # Đẩy vào hàng đợi cho worker process
+    job_id, created = job_queue.enqueue("sync_channel", dedup=channel_id, channel_id=channel_id, limit=100)
+    if not created:
+        return {"status": "ignored", "job_id": job_id, "message": "Kênh này đang được cập nhật, vui lòng đợi!"}
     
-    return {"status": "ok", "message": f"Đang cập nhật kênh {channel_id}..."}
+    return {"status": "ok", "job_id": job_id, "message": f"Đang cập nhật kênh {channel_id}..."}
+
+@app.get("/api/jobs/stats")
+def get_job_stats():
+    """Độ sâu hàng đợi crawl (queued/processing/delayed/dead) + bộ đếm"""
+    return job_queue.queue_stats()
+
+@app.get("/api/scheduler/plan")
+def get_scheduler_plan(limit: int = 50):
+    """Kế hoạch crawl sắp tới (kênh sắp đến hạn, số kênh theo từng giờ, leader hiện tại)"""
+    return scheduler.get_plan(limit=min(limit, 500))
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    """Hit/miss/eviction của cache info kênh (để chọn CHANNEL_CACHE_SIZE / TTL) + cache mảnh JSON video"""
+    return {**db.channel_cache.stats(), "fragments": responses.fragments.stats(), "media": media_cache.cache.stats()}
+
+@app.get("/metrics")
+def get_metrics():
+    """Metrics dạng Prometheus (độ trễ theo route, lệnh Redis, crawler, hàng đợi)"""
+    try:
+        stats = job_queue.queue_stats()
+        for state in ("queued", "processing", "delayed", "dead"):
+            metrics.JOB_QUEUE_DEPTH.set(stats[state], state=state)
+    except Exception as e:
+        logger.warning("⚠️ [Metrics] Không đọc được hàng đợi: %s", e)
+    for stat, value in db.channel_cache.stats().items():
+        metrics.CHANNEL_CACHE.set(value, stat=stat)
+    media_cache.MEDIA_BYTES.set(media_cache.cache.usage())
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/api/subscriptions")
-def get_subscriptions(user_id: str):
-    sub_ids = db.get_user_subscriptions(user_id)
+async def get_subscriptions(user_id: str):
+    sub_ids = await adb.get_user_subscriptions(user_id)
     if not sub_ids: return []
-    return db.get_channels_info(sub_ids)
+    return media_cache.with_avatar_links(await adb.get_channels_info(sub_ids))
 
 @app.post("/api/unsubscribe")
-def unsubscribe(req: UnsubRequest):
-    is_deleted = db.unsubscribe_channel(req.user_id, req.channel_id)
+async def unsubscribe(req: UnsubRequest):
+    is_deleted = await adb.unsubscribe_channel(req.user_id, req.channel_id)
     msg = "Đã bỏ theo dõi."
     if is_deleted: msg += " Kênh này đã bị xóa vì không còn ai follow."
     return {"status": "ok", "message": msg}
@@ -225,33 +341,123 @@ def unsubscribe(req: UnsubRequest):
 # --- API TÍNH NĂNG KHÁM PHÁ (EXPLORE) ---
 
 @app.get("/api/channels/explore")
-def get_explore_channels(user_id: str):
-    # 1. Lấy tất cả kênh
-    all_channels = db.get_all_channels()
-    
-    # 2. Lấy danh sách ID các kênh user đã sub
-    sub_ids = db.get_user_subscriptions(user_id)
-    
-    # 3. Lọc: Chỉ lấy kênh KHÔNG nằm trong danh sách sub
-    # (Nếu sub_ids rỗng thì lấy hết)
-    explore_list = [c for c in all_channels if c['id'] not in sub_ids]
-    
-    return explore_list
+def get_explore_channels(user_id: str, response: Response, cursor: int = 0, limit: int = 50):
+    """
+    Kênh khám phá xếp theo follower + hoạt động gần đây, đã bỏ kênh user đang sub (lọc trong Redis).
+    Phân trang theo cursor: cursor của trang tiếp nằm ở header X-Next-Cursor (0 = hết).
+    """
+    channels, next_cursor = db.get_explore_page(user_id, cursor, min(limit, 100))
+    response.headers["X-Next-Cursor"] = str(next_cursor)
+    return media_cache.with_avatar_links(channels)
+
+# --- API TÌM KIẾM ---
+
+@app.get("/api/search")
+def search(q: str, response: Response, type: str = "videos", cursor: int = 0, limit: int = 20):
+    """
+    Tìm video theo title (mới trước) hoặc kênh theo tên (type=channels, nổi bật trước).
+    Không phân biệt hoa thường / dấu tiếng Việt; từ cuối khớp theo tiền tố (gõ tới đâu tìm tới đó).
+    Phân trang theo cursor như explore: header X-Next-Cursor (0 = hết).
+    """
+    if type not in ("videos", "channels"):
+        raise HTTPException(status_code=400, detail="type phải là videos hoặc channels")
+    ids, next_cursor = db.search(q, type, max(0, cursor), max(1, min(limit, db.SEARCH_MAX_LIMIT)))
+    if type == "channels":
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+        return media_cache.with_avatar_links(db.get_channels_info(ids))
+    result = responses.feed_response(db.get_videos_from_ids(ids))
+    result.headers["X-Next-Cursor"] = str(next_cursor)
+    return result
+
+# --- PROXY ẢNH (THUMBNAIL / AVATAR), XEM media_cache.py ---
+
+def _media_file(kind, key, request):
+    """FileResponse nếu ảnh đã có trên đĩa (ưu tiên bản WebP khi trình duyệt nhận), không thì None"""
+    found = media_cache.cache.lookup(kind, key, accept_webp="image/webp" in request.headers.get("accept", ""))
+    if found is None: return None
+    media_cache.MEDIA_REQUESTS.inc(kind=kind, result="hit")
+    path, media_type = found
+    return FileResponse(path, media_type=media_type,
+                        headers={"Cache-Control": media_cache.CACHE_CONTROL, "Vary": "Accept"})
+
+@app.get("/media/thumb/{video_id}")
+def get_thumbnail(video_id: str, request: Request):
+    """Thumbnail video qua cache đĩa; chưa có thì tải ngay, tải lỗi thì chuyển hướng về ảnh gốc"""
+    if not media_cache.valid_key(video_id):
+        raise HTTPException(status_code=404, detail="Không tìm thấy ảnh")
+    cached = _media_file("thumb", video_id, request)
+    if cached: return cached
+    video = db.load_videos([video_id])[0]
+    origin = (video and video["thumbnail"]) or db.thumbnail_url(video_id)
+    if media_cache.fetch("thumb", video_id, origin):
+        cached = _media_file("thumb", video_id, request)
+        if cached: return cached
+    media_cache.MEDIA_REQUESTS.inc(kind="thumb", result="fallback")
+    return RedirectResponse(origin, status_code=302)
+
+@app.get("/media/avatar/{channel_id}")
+def get_avatar(channel_id: str, request: Request):
+    """
+    Avatar kênh qua cache đĩa. Link có ?v=<phiên bản avatar> nên cache được vĩnh viễn;
+    kênh chưa có avatar thì trả ảnh placeholder dựng sẵn (không phụ thuộc via.placeholder.com).
+    """
+    if not media_cache.valid_key(channel_id):
+        raise HTTPException(status_code=404, detail="Không tìm thấy ảnh")
+    info = db.get_channels_info([channel_id])
+    avatar = info[0].get("avatar") if info else None
+    if media_cache.is_placeholder(avatar):
+        media_cache.MEDIA_REQUESTS.inc(kind="avatar", result="placeholder")
+        return Response(content=media_cache.PLACEHOLDER_SVG, media_type="image/svg+xml",
+                        headers={"Cache-Control": "public, max-age=86400"})
+    key = media_cache.avatar_key(channel_id, avatar)
+    cached = _media_file("avatar", key, request)
+    if cached: return cached
+    if media_cache.fetch("avatar", key, avatar):
+        cached = _media_file("avatar", key, request)
+        if cached: return cached
+    media_cache.MEDIA_REQUESTS.inc(kind="avatar", result="fallback")
+    return RedirectResponse(avatar, status_code=302)
 
 @app.post("/api/subscribe/quick")
-def quick_subscribe(req: SimpleSubRequest):
+async def quick_subscribe(req: SimpleSubRequest):
     """API theo dõi nhanh, không cần URL, chỉ cần ID"""
-    if not db.is_channel_exist(req.channel_id):
+    if not await adb.is_channel_exist(req.channel_id):
         raise HTTPException(status_code=404, detail="Kênh không tồn tại")
         
-    db.subscribe_channel(req.user_id, req.channel_id)
+    await adb.subscribe_channel(req.user_id, req.channel_id)
     return {"status": "ok", "message": f"Đã theo dõi kênh {req.channel_id}"}
 
+# Public key của Google để verify ID token, tải async và cache theo Cache-Control
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+_google_certs = {"certs": None, "expires_at": 0}
+
+async def get_google_certs():
+    if _google_certs["certs"] and time.time() < _google_certs["expires_at"]:
+        return _google_certs["certs"]
+    response = await http_client.aget(GOOGLE_CERTS_URL, timeout=10)
+    response.raise_for_status()
+    max_age = 3600
+    for part in response.headers.get("cache-control", "").split(","):
+        part = part.strip()
+        if part.startswith("max-age="):
+            max_age = int(part[len("max-age="):])
+    _google_certs.update(certs=response.json(), expires_at=time.time() + max_age)
+    return _google_certs["certs"]
+
+async def verify_google_token(token):
+    """Giống id_token.verify_oauth2_token nhưng tải cert không chặn event loop"""
+    certs = await get_google_certs()
+    idinfo = google_jwt.decode(token, certs=certs, audience=GOOGLE_CLIENT_ID)
+    if idinfo.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError("Sai issuer")
+    return idinfo
+
 @app.post("/api/auth/google")
-def login_google(request: LoginRequest):
+async def login_google(request: LoginRequest):
     try:
-        idinfo = id_token.verify_oauth2_token(request.token, google_requests.Request(), GOOGLE_CLIENT_ID)
-        user = db.create_or_update_user(idinfo)
+        idinfo = await verify_google_token(request.token)
+        user = await run_in_threadpool(db.create_or_update_user, idinfo)
         return user
     except ValueError:
         raise HTTPException(status_code=401, detail="Token không hợp lệ")
@@ -0,0 +1,125 @@
+"""
+Các lệnh quản trị dữ liệu (chạy tay khi cần sửa/migrate).
+Cách dùng: python manage.py <lệnh> [tham số]
+"""
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import database as db
+
+def cmd_rebuild_feeds(args):
+    if args.user:
+        count = db.rebuild_user_feed(args.user)
+        print(f"🔧 Feed của user {args.user}: {count} video")
+    else:
+        db.rebuild_all_user_feeds()
+
+def cmd_backfill_channels(args):
+    db.backfill_channel_registry()
+
+def cmd_rebuild_explore(args):
+    total = db.rebuild_explore_index()
+    print(f"🔧 Đã tính lại điểm khám phá cho {total} kênh")
+
+def cmd_rebuild_search(args):
+    counts = db.rebuild_search_index(batch_size=args.batch, reset=args.reset)
+    print(f"🔎 Đã index {counts['videos']} video, {counts['channels']} kênh cho tìm kiếm")
+
+def cmd_export_snapshot(args):
+    import snapshot
+    stats = snapshot.export_snapshot(args.path, since=args.since, chunk_records=args.batch)
+    print(f"📦 Đã export {args.path}: {stats}")
+
+def cmd_import_snapshot(args):
+    import snapshot
+    def progress(counts):
+        print(f"\r📥 {counts}", end="", flush=True)
+    stats = snapshot.import_snapshot(args.path, on_progress=progress)
+    print(f"\n✅ Đã import {args.path}: {stats}")
+
+def cmd_renorm_trending(args):
+    removed, shifted = db.renormalize_trending()
+    print(f"📉 Trending: bỏ {removed} video đã nguội, dời điểm {shifted} video")
+
+def cmd_gc(args):
+    resumed = db.resume_channel_deletions()
+    if resumed:
+        print(f"🗑️ Đã xóa tiếp {resumed} kênh bị ngắt giữa chừng")
+    db.gc_orphan_videos()
+
+def cmd_compact_videos(args):
+    stats = db.compact_legacy_videos(batch_size=args.batch)
+    if stats["converted"]:
+        before = stats["bytes_before"] / stats["converted"]
+        after = stats["bytes_after"] / stats["converted"]
+        print(f"🗜️ Đã chuyển {stats['converted']} video sang định dạng gọn: "
+              f"{before:.0f} -> {after:.0f} bytes/video")
+    else:
+        print("🗜️ Không còn video nào ở định dạng hash cũ")
+
+def cmd_crawl_all(args):
+    """Quét toàn bộ kênh ngay (bình thường scheduler.py đã rải đều việc này trong ngày)"""
+    import crawler
+    channel_ids = db.get_all_channel_ids()
+    report = crawler.crawl_channels(channel_ids, limit=args.limit, on_progress=crawler.print_progress)
+    ok = sum(1 for res in report["results"] if res["status"] == "ok")
+    print(f"✅ Đã quét xong {ok}/{len(channel_ids)} kênh trong {report['elapsed']}s"
+          + (" (hết giờ)" if report["timed_out"] else ""))
+
+def cmd_delete_channel(args):
+    db.delete_entire_channel(args.channel_id)
+
+def main():
+    parser = argparse.ArgumentParser(description="Công cụ quản trị YT-TikTok backend")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild-feeds", help="Build lại user:{id}:feed từ danh sách sub")
+    p.add_argument("--user", help="Chỉ build lại cho 1 user")
+    p.set_defaults(func=cmd_rebuild_feeds)
+
+    p = sub.add_parser("backfill-channels", help="Đưa kênh cũ vào registry channels:all (dùng SCAN)")
+    p.set_defaults(func=cmd_backfill_channels)
+
+    p = sub.add_parser("rebuild-explore", help="Tính lại index khám phá channels:explore cho mọi kênh")
+    p.set_defaults(func=cmd_rebuild_explore)
+
+    p = sub.add_parser("rebuild-search", help="Index lại title video + tên kênh cho /api/search")
+    p.add_argument("--batch", type=int, default=1000)
+    p.add_argument("--reset", action="store_true", help="Xóa index cũ trước (dọn token không còn dùng)")
+    p.set_defaults(func=cmd_rebuild_search)
+
+    p = sub.add_parser("renorm-trending", help="Dọn video đã nguội khỏi videos:trending, dời epoch nếu cần")
+    p.set_defaults(func=cmd_renorm_trending)
+
+    p = sub.add_parser("gc", help="Xóa tiếp kênh đang xóa dở + dọn ID mồ côi trong videos:score/videos:all/videos:trending")
+    p.set_defaults(func=cmd_gc)
+
+    p = sub.add_parser("compact-videos", help="Chuyển hash video:{id} cũ sang định dạng gọn (chạy lại được)")
+    p.add_argument("--batch", type=int, default=1000)
+    p.set_defaults(func=cmd_compact_videos)
+
+    p = sub.add_parser("crawl-all", help="Quét toàn bộ kênh ngay trong process này")
+    p.add_argument("--limit", type=int, default=10)
+    p.set_defaults(func=cmd_crawl_all)
+
+    p = sub.add_parser("export-snapshot", help="Ghi toàn bộ dữ liệu ra file snapshot (SCAN theo lô)")
+    p.add_argument("path")
+    p.add_argument("--since", type=int, help="Chỉ export video đăng từ timestamp này (incremental)")
+    p.add_argument("--batch", type=int, default=5000, help="Số bản ghi mỗi khối")
+    p.set_defaults(func=cmd_export_snapshot)
+
+    p = sub.add_parser("import-snapshot", help="Nạp file snapshot vào Redis (dựng node mới không cần crawl)")
+    p.add_argument("path")
+    p.set_defaults(func=cmd_import_snapshot)
+
+    p = sub.add_parser("delete-channel", help="Xóa hẳn 1 kênh (kể cả khi còn follower)")
+    p.add_argument("channel_id")
+    p.set_defaults(func=cmd_delete_channel)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Proxy ảnh thumbnail video / avatar kênh, cache trên đĩa (LRU, giới hạn dung lượng).
+- Bật bằng MEDIA_PROXY_URL (VD http://localhost:8000/media): API trả link ảnh qua proxy thay vì
+  i.ytimg.com / yt3.ggpht.com / via.placeholder.com. Để trống = giữ link gốc như cũ.
+- Worker tải sẵn ảnh lúc ingest (prefetch) -> lần đầu hiển thị đã có trên đĩa.
+  Worker và API phải cùng thấy MEDIA_CACHE_DIR (cùng máy hoặc chung volume).
+- Có Pillow thì lưu thêm bản WebP thu nhỏ, trình duyệt nhận WebP (Accept) sẽ được trả bản này.
+- LRU theo mtime của file: mỗi lần phục vụ thì "chạm" file (tối đa 1 lần / TOUCH_INTERVAL),
+  vượt MEDIA_CACHE_MAX_MB thì xóa file lâu không dùng nhất tới còn EVICT_TARGET dung lượng.
+"""
+import contextlib
+import io
+import os
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+import metrics
+from logs import get_logger
+
+try:
+    from PIL import Image
+except ImportError:  # Không có Pillow: chỉ cache ảnh gốc
+    Image = None
+
+logger = get_logger("media_cache")
+
+MEDIA_PROXY_URL = os.getenv("MEDIA_PROXY_URL", "").rstrip("/")
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "media_cache"))
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_MB", "2048")) * 1024 * 1024
+MEDIA_WEBP = os.getenv("MEDIA_WEBP", "1") == "1" and Image is not None
+MEDIA_PREFETCH_CONCURRENCY = int(os.getenv("MEDIA_PREFETCH_CONCURRENCY", "8"))
+WEBP_QUALITY = 75
+WEBP_MAX_SIZE = {"thumb": 480, "avatar": 176}  # Cạnh dài nhất của bản WebP (px)
+MAX_IMAGE_BYTES = 2 * 1024 * 1024
+EVICT_TARGET = 0.9
+TOUCH_INTERVAL = 3600
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+KINDS = ("thumb", "avatar")
+_KEY_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Magic bytes -> (content type, đuôi file). Không khớp thì không phải ảnh (VD trang lỗi HTML) -> không cache
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"\x89PNG", "image/png", "png"),
+    (b"GIF8", "image/gif", "gif"),
+)
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+
+MEDIA_REQUESTS = metrics.Counter("media_requests_total", "Request ảnh qua proxy", ("kind", "result"))
+MEDIA_FETCHES = metrics.Counter("media_fetches_total", "Lượt tải ảnh từ nguồn", ("kind", "result"))
+MEDIA_EVICTED = metrics.Counter("media_evicted_total", "Số file ảnh bị xóa khỏi cache đĩa")
+MEDIA_BYTES = metrics.Gauge("media_cache_bytes", "Dung lượng cache ảnh trên đĩa (ước lượng của process này)")
+
+PLACEHOLDER_SVG = (b'<svg xmlns="http://www.w3.org/2000/svg" width="150" height="150" viewBox="0 0 150 150">'
+                   b'<rect width="150" height="150" fill="#3a3a3a"/>'
+                   b'<circle cx="75" cy="58" r="26" fill="#777"/>'
+                   b'<ellipse cx="75" cy="128" rx="46" ry="32" fill="#777"/></svg>')
+
+def enabled():
+    return bool(MEDIA_PROXY_URL)
+
+def valid_key(key):
+    return bool(key) and _KEY_RE.match(key) is not None
+
+def sniff(data):
+    """(content type, đuôi file) theo magic bytes, None nếu không phải ảnh"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    for magic, media_type, ext in _SIGNATURES:
+        if data.startswith(magic):
+            return media_type, ext
+    return None
+
+def avatar_version(avatar_url):
+    """Avatar đổi -> URL proxy đổi theo, nên vẫn cache immutable được"""
+    return format(zlib.crc32((avatar_url or "").encode()), "08x")
+
+def is_placeholder(avatar_url):
+    return not avatar_url or "placeholder.com" in avatar_url
+
+# === LINK TRẢ VỀ CHO FRONTEND ===
+def thumbnail_link(video_id, origin_url):
+    return f"{MEDIA_PROXY_URL}/thumb/{video_id}" if enabled() else origin_url
+
+def avatar_link(channel_id, origin_url):
+    if not enabled(): return origin_url
+    if is_placeholder(origin_url):
+        return f"{MEDIA_PROXY_URL}/avatar/{channel_id}"
+    return f"{MEDIA_PROXY_URL}/avatar/{channel_id}?v={avatar_version(origin_url)}"
+
+def with_avatar_links(channels):
+    """Đổi field avatar của list info kênh sang link proxy (trả về bản sao, không sửa cache)"""
+    if not enabled(): return channels
+    return [{**info, "avatar": avatar_link(info.get("id", ""), info.get("avatar"))} for info in channels]
+
+# === CACHE TRÊN ĐĨA ===
+class DiskCache:
+    """
+    File ảnh lưu ở {root}/{kind}/{2 ký tự cuối của key}/{key}.{đuôi}; bản WebP thu nhỏ là {key}.small.webp.
+    Dung lượng được ước lượng trong RAM, định kỳ quét lại đĩa khi dọn (các process khác cũng ghi vào).
+    """
+
+    def __init__(self, root=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._usage = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evicted = 0
+
+    def _dir(self, kind, key):
+        return os.path.join(self.root, kind, key[-2:])
+
+    def lookup(self, kind, key, accept_webp=False):
+        """(đường dẫn, content type) của bản tốt nhất đang có, None nếu chưa cache"""
+        folder = self._dir(kind, key)
+        names = ([f"{key}.small.webp"] if accept_webp else []) + [f"{key}.{ext}" for ext in MEDIA_TYPES]
+        for name in names:
+            path = os.path.join(folder, name)
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            if time.time() - mtime > TOUCH_INTERVAL:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+            with self._lock:
+                self.hits += 1
+            return path, MEDIA_TYPES[name.rsplit(".", 1)[1]]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, kind, key, data, ext):
+        """Ghi ảnh gốc (+ bản WebP nếu bật và nhỏ hơn). Trả về số byte đã ghi."""
+        folder = self._dir(kind, key)
+        os.makedirs(folder, exist_ok=True)
+        written = self._write(os.path.join(folder, f"{key}.{ext}"), data)
+        small = encode_webp(data, WEBP_MAX_SIZE[kind]) if MEDIA_WEBP else None
+        if small and len(small) < len(data):
+            written += self._write(os.path.join(folder, f"{key}.small.webp"), small)
+        with self._lock:
+            if self._usage is None:
+                self._usage = self._scan_usage()
+            else:
+                self._usage += written
+            over = self._usage > self.max_bytes
+        if over:
+            self.evict()
+        return written
+
+    def _write(self, path, data):
+        # Ghi ra file tạm rồi rename: request đọc song song không bao giờ thấy file dở dang
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    def _files(self):
+        for kind in KINDS:
+            base = os.path.join(self.root, kind)
+            if not os.path.isdir(base): continue
+            for bucket in os.scandir(base):
+                if not bucket.is_dir(): continue
+                for entry in os.scandir(bucket.path):
+                    if entry.name.endswith(".tmp"): continue
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield st.st_mtime, st.st_size, entry.path
+
+    def _scan_usage(self):
+        return sum(size for _, size, _ in self._files())
+
+    def evict(self):
+        """Xóa file lâu không dùng nhất tới khi còn EVICT_TARGET x giới hạn. Trả về số file đã xóa."""
+        with self._lock:
+            files = sorted(self._files())
+            usage = sum(size for _, size, _ in files)
+            target = self.max_bytes * EVICT_TARGET
+            removed = 0
+            for _, size, path in files:
+                if usage <= target: break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                usage -= size
+                removed += 1
+            self._usage = usage
+            self.evicted += removed
+        if removed:
+            MEDIA_EVICTED.inc(removed)
+            logger.info("🧹 Media cache: Đã xóa %d ảnh cũ, còn %.1f MB", removed, usage / 1024 / 1024)
+        return removed
+
+    def usage(self):
+        with self._lock:
+            if self._usage is None:
+                self._usage = self._scan_usage()
+            return self._usage
+
+    def stats(self):
+        return {"bytes": self.usage(), "max_bytes": self.max_bytes, "hits": self.hits,
+                "misses": self.misses, "evicted": self.evicted, "webp": MEDIA_WEBP}
+
+cache = DiskCache()
+
+def encode_webp(data, max_size):
+    """Bản WebP thu nhỏ (giữ tỉ lệ), None nếu Pillow không đọc được ảnh"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.thumbnail((max_size, max_size))
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            out = io.BytesIO()
+            img.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+            return out.getvalue()
+    except Exception:
+        return None
+
+# === TẢI TỪ NGUỒN ===
+FETCH_CHUNK_SIZE = 64 * 1024
+
+def _read_capped(resp, max_bytes):
+    """Đọc body dạng stream, vượt max_bytes thì dừng ngay và trả về None (không giữ cả body trong RAM)"""
+    if int(resp.headers.get("Content-Length") or 0) > max_bytes:
+        return None
+    chunks, size = [], 0
+    for chunk in resp.iter_content(FETCH_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def fetch(kind, key, origin_url):
+    """
+    Tải ảnh về cache nếu chưa có. Trả về True nếu ảnh đã nằm trong cache.
+    Không đi qua rate limit của crawler: CDN ảnh không phải trang YouTube.
+    """
+    if not valid_key(key) or not origin_url: return False
+    if cache.lookup(kind, key) is not None: return True
+    try:
+        with contextlib.closing(http_client.session.get(origin_url, timeout=10, stream=True)) as resp:
+            data = _read_capped(resp, MAX_IMAGE_BYTES) if resp.status_code == 200 else b""
+    except Exception as e:
+        MEDIA_FETCHES.inc(kind=kind, result="error")
+        logger.debug("⚠️ Media: Lỗi tải %s: %s", origin_url, e)
+        return False
+    detected = sniff(data) if data is not None else None
+    if detected is None:
+        MEDIA_FETCHES.inc(kind=kind, result="rejected")
+        return False
+    try:
+        cache.store(kind, key, data, detected[1])
+    except OSError as e:
+        MEDIA_FETCHES.inc(kind=kind, result="error")
+        logger.warning("⚠️ Media: Không ghi được cache ảnh: %s", e)
+        return False
+    MEDIA_FETCHES.inc(kind=kind, result="ok")
+    metrics.CRAWL_HTTP_BYTES.inc(len(data))
+    return True
+
+def avatar_key(channel_id, avatar_url):
+    return f"{channel_id}-{avatar_version(avatar_url)}"
+
+def prefetch(items):
+    """Tải song song [(kind, key, origin_url), ...] (bỏ qua ảnh đã có). Trả về số ảnh đang có trong cache."""
+    if not enabled() or not items: return 0
+    workers = max(1, min(MEDIA_PREFETCH_CONCURRENCY, len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(lambda item: fetch(*item), items))
+
+def prefetch_thumbnails(videos):
+    """videos: [{"id", "thumbnail"}, ...]"""
+    return prefetch([("thumb", v["id"], v.get("thumbnail") or f"https://i.ytimg.com/vi/{v['id']}/hqdefault.jpg")
+                     for v in videos])
+
+def prefetch_avatar(channel_id, avatar_url):
+    if is_placeholder(avatar_url): return 0
+    return prefetch([("avatar", avatar_key(channel_id, avatar_url), avatar_url)])
@@ -0,0 +1,189 @@
+"""
+Metrics trong process, xuất ra định dạng text của Prometheus (không cần thư viện ngoài).
+- HTTP: histogram độ trễ theo route, số request theo status (middleware trong main.py)
+- Redis: số lệnh + round trip, tổng và theo từng request (contextvars)
+- Crawler: video đã quét, oEmbed fallback, bytes tải về, lỗi theo giai đoạn
+
+API đọc ở GET /metrics; worker (process riêng) tự mở cổng METRICS_PORT qua serve().
+"""
+import bisect
+import contextvars
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{_escape(v)}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [đếm theo từng bucket (không cộng dồn), tổng, số lần]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                le = bound if bound == "+Inf" else _format_value(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(float(total))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+def render():
+    """Toàn bộ metrics dạng text Prometheus"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# === HTTP ===
+HTTP_REQUESTS = Counter("http_requests_total", "Số request HTTP", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Độ trễ xử lý request", ("method", "route"))
+HTTP_REDIS_COMMANDS = Histogram("http_request_redis_commands", "Số lệnh Redis mỗi request",
+                                ("route",), buckets=COUNT_BUCKETS)
+HTTP_REDIS_ROUND_TRIPS = Histogram("http_request_redis_round_trips", "Số round trip Redis mỗi request",
+                                   ("route",), buckets=COUNT_BUCKETS)
+
+# === REDIS ===
+REDIS_COMMANDS = Counter("redis_commands_total", "Tổng số lệnh Redis đã gửi")
+REDIS_ROUND_TRIPS = Counter("redis_round_trips_total", "Tổng số round trip Redis (pipeline = 1)")
+
+# === CRAWLER ===
+CRAWL_CHANNELS = Counter("crawler_channels_total", "Số kênh đã quét theo kết quả", ("status",))
+CRAWL_VIDEOS_SCRAPED = Counter("crawler_videos_scraped_total", "Số video đọc được từ scrapetube")
+CRAWL_VIDEOS_STORED = Counter("crawler_videos_stored_total", "Số video đã ghi theo kết quả", ("result",))
+CRAWL_OEMBED_FALLBACKS = Counter("crawler_oembed_fallbacks_total", "Số lần gọi oEmbed để lấy title")
+CRAWL_OEMBED_SKIPPED = Counter("crawler_oembed_skipped_total", "Số video bỏ qua oEmbed nhờ negative cache")
+CRAWL_HTTP_BYTES = Counter("crawler_http_bytes_total", "Số bytes HTTP tải về (trang kênh, oEmbed)")
+CRAWL_ERRORS = Counter("crawler_errors_total", "Số lỗi khi crawl theo giai đoạn", ("stage",))
+
+# === HÀNG ĐỢI JOB / CACHE (gauge được cập nhật lúc đọc /metrics) ===
+JOBS_PROCESSED = Counter("jobs_processed_total", "Số job worker đã xử lý", ("kind", "status"))
+JOB_QUEUE_DEPTH = Gauge("job_queue_depth", "Số job trong hàng đợi theo trạng thái", ("state",))
+CHANNEL_CACHE = Gauge("channel_cache", "Thống kê cache info kênh trong process", ("stat",))
+
+# === ĐẾM REDIS THEO REQUEST ===
+class RequestStats:
+    __slots__ = ("commands", "round_trips")
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+
+_current_request = contextvars.ContextVar("metrics_request", default=None)
+
+def record_redis(commands=1):
+    """Gọi mỗi khi gửi 1 lệnh (commands=1) hoặc 1 pipeline (commands=số lệnh trong pipeline)"""
+    REDIS_COMMANDS.inc(commands)
+    REDIS_ROUND_TRIPS.inc()
+    stats = _current_request.get()
+    if stats is not None:
+        stats.commands += commands
+        stats.round_trips += 1
+
+def begin_request():
+    """Bắt đầu đếm cho request hiện tại. Trả về (stats, token) để end_request()"""
+    stats = RequestStats()
+    return stats, _current_request.set(stats)
+
+def end_request(token, method, route, status, seconds):
+    stats = _current_request.get()
+    _current_request.reset(token)
+    HTTP_REQUESTS.inc(method=method, route=route, status=status)
+    HTTP_LATENCY.observe(seconds, method=method, route=route)
+    if stats is not None:
+        HTTP_REDIS_COMMANDS.observe(stats.commands, route=route)
+        HTTP_REDIS_ROUND_TRIPS.observe(stats.round_trips, route=route)
+
+# === SERVER RIÊNG CHO PROCESS KHÔNG CÓ FASTAPI (worker) ===
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(port=METRICS_PORT):
+    """Mở /metrics ở port riêng (thread nền). port=0 thì không mở."""
+    if not port: return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
@@ -0,0 +1,117 @@
+"""
+Pool video dựng sẵn cho khách (không login).
+Định kỳ POOL_REFRESH_SECONDS giây, 1 process (giữ khóa Redis) lấy top ID theo từng
+chiến thuật (score_asc / score_desc / time / trending; riêng score_asc lấy mẫu có trọng số
+bằng sampler.py), hydrate luôn video + kênh, nén lại và lưu vào Redis. Mọi process API
+tải snapshot về RAM, feed khách chỉ việc lấy mẫu trong RAM => tải Redis không còn tăng theo lượng khách.
+"""
+import json
+import os
+import random
+import threading
+import time
+import zlib
+
+import database as db
+import sampler
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+POOL_STRATEGIES = ("score_asc", "score_desc", "time", "trending")
+POOL_SNAPSHOT_SIZE = int(os.getenv("POOL_SNAPSHOT_SIZE", "500"))
+POOL_REFRESH_SECONDS = int(os.getenv("POOL_REFRESH_SECONDS", "60"))
+BUILD_LOCK_KEY = "pool:builder:lock"
+
+# Chỉ giữ các field Frontend cần (thumbnail / embed_url dựng lại từ id được)
+SNAPSHOT_FIELDS = ("id", "channel_id", "channel_name", "channel_avatar", "title", "thumbnail", "published_at")
+
+def _snapshot_key(strategy):
+    return f"pool:snapshot:{strategy}"
+
+def build_snapshot(strategy, size=POOL_SNAPSHOT_SIZE):
+    """Lấy top ID + hydrate + nén, lưu vào Redis. Trả về số video trong snapshot."""
+    video_ids = []
+    if strategy == "score_asc":
+        # Fairness: lấy mẫu có trọng số trên toàn bộ video thay vì top điểm thấp nhất
+        video_ids = sampler.global_sampler.draw(size)
+    if not video_ids:
+        video_ids = db.get_global_video_ids(limit=size, sort_by=strategy)
+    if not video_ids:
+        video_ids = db.get_global_video_ids(limit=size, sort_by="time")
+    videos = [{k: v.get(k) for k in SNAPSHOT_FIELDS} for v in db.get_videos_from_ids(video_ids)]
+    payload = json.dumps({"built_at": time.time(), "videos": videos}, separators=(",", ":"))
+    db.rb.set(_snapshot_key(strategy), zlib.compress(payload.encode()))
+    return len(videos)
+
+def build_all_snapshots():
+    for strategy in POOL_STRATEGIES:
+        build_snapshot(strategy)
+
+class PoolCache:
+    """Bản sao snapshot trong RAM của từng process"""
+
+    def __init__(self):
+        self.snapshots = {}  # strategy -> {"built_at": ..., "videos": [...]}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def get(self, strategy):
+        snapshot = self.snapshots.get(strategy)
+        return snapshot if snapshot and snapshot["videos"] else None
+
+    def refresh(self):
+        """Tải snapshot mới nhất từ Redis (1 round trip cho mọi chiến thuật)"""
+        pipe = db.rb.pipeline(transaction=False)
+        for strategy in POOL_STRATEGIES:
+            pipe.get(_snapshot_key(strategy))
+        for strategy, raw in zip(POOL_STRATEGIES, pipe.execute()):
+            if raw:
+                self.snapshots[strategy] = json.loads(zlib.decompress(raw))
+
+    def _run(self):
+        while True:
+            try:
+                # Chỉ 1 process build mỗi chu kỳ, các process khác chỉ tải về
+                if db.r.set(BUILD_LOCK_KEY, 1, nx=True, ex=max(1, POOL_REFRESH_SECONDS - 1)):
+                    build_all_snapshots()
+                self.refresh()
+            except Exception as e:
+                logger.warning("⚠️ [Pool] Lỗi cập nhật snapshot: %s", e)
+            if self._stop.wait(POOL_REFRESH_SECONDS):
+                return
+
+    def start(self):
+        if self._thread: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pool-builder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+def sample(snapshot, limit):
+    """Lấy ngẫu nhiên `limit` video (không cần session)"""
+    videos = snapshot["videos"]
+    return random.sample(videos, min(limit, len(videos)))
+
+def session_page(snapshot, session_id, seen, limit):
+    """
+    Lấy `limit` video chưa có trong seen, theo 1 hoán vị cố định theo session_id.
+    Snapshot được build lại giữa các trang cũng không trùng vì lọc theo ID đã xem (seen), không theo vị trí.
+    Trả về (videos, reset): reset=True nghĩa là đã xem hết snapshot, trang này mở vòng mới
+    -> người gọi phải xóa seen trước khi ghi nhận trang này.
+    """
+    videos = snapshot["videos"]
+    order = list(range(len(videos)))
+    random.Random(session_id).shuffle(order)
+    limit = min(limit, len(order))
+    picked = [i for i in order if videos[i]["id"] not in seen][:limit]
+    reset = len(picked) < limit
+    if reset:
+        taken = set(picked)
+        picked += [i for i in order if i not in taken][:limit - len(picked)]
+    return [videos[i] for i in picked], reset
+
+pool_cache = PoolCache()
@@ -0,0 +1,73 @@
+"""
+Serialize feed nhanh: bỏ qua Pydantic, ghép sẵn JSON bằng orjson.
+Mỗi video được serialize 1 lần thành mảnh JSON (bytes) và cache trong RAM theo id;
+trang feed chỉ còn là b"[" + b",".join(mảnh) + b"]".
+Mảnh cũ tự bị bỏ khi title / tên / avatar kênh thay đổi (so chữ ký trước khi dùng lại).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import orjson
+from fastapi import Response
+
+import database as db
+import media_cache
+
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "20000"))
+DEFAULT_AVATAR = "https://via.placeholder.com/150"
+
+def video_payload(v):
+    """Dict đúng format Frontend (giống VideoResponse)"""
+    return {
+        "id": v['id'],
+        "channel_id": v['channel_id'],
+        "channel_name": v.get('channel_name', "Unknown"),
+        "channel_avatar": media_cache.avatar_link(v['channel_id'], v.get('channel_avatar', DEFAULT_AVATAR)),
+        "title": v['title'],
+        "thumbnail": media_cache.thumbnail_link(v['id'], v.get('thumbnail') or db.thumbnail_url(v['id'])),
+        "published_at": int(v['published_at']),
+        "embed_url": db.embed_url(v['id']),
+    }
+
+class FragmentCache:
+    """LRU: video_id -> (chữ ký, bytes JSON)"""
+
+    def __init__(self, max_size=FRAGMENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def fragment(self, v):
+        signature = (v['title'], v.get('channel_name'), v.get('channel_avatar'), v.get('thumbnail'),
+                     v['published_at'])
+        video_id = v['id']
+        with self._lock:
+            entry = self._data.get(video_id)
+            if entry is not None and entry[0] == signature:
+                self._data.move_to_end(video_id)
+                self.hits += 1
+                return entry[1]
+        data = orjson.dumps(video_payload(v))
+        with self._lock:
+            self.misses += 1
+            self._data[video_id] = (signature, data)
+            self._data.move_to_end(video_id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        return data
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self._data), "max_size": self.max_size, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0}
+
+fragments = FragmentCache()
+
+def feed_json(videos):
+    return b"[" + b",".join(fragments.fragment(v) for v in videos) + b"]"
+
+def feed_response(videos):
+    """Response JSON dựng sẵn (FastAPI không chạy lại response_model khi trả Response)"""
+    return Response(content=feed_json(videos), media_type="application/json")
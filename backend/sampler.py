@@ -0,0 +1,121 @@
+"""
+Engine lấy mẫu cho feed Fairness (score_asc).
+Thay vì lấy 200 video điểm thấp nhất rồi shuffle (video ngoài top 200 không bao giờ
+được xuất hiện), mỗi video trong TOÀN BỘ tập ứng viên đều có cơ hội, với xác suất:
+
+    w = (1 / (1 + views)) ^ SAMPLER_VIEW_ALPHA * (SAMPLER_RECENCY_FLOOR + e^(-tuổi / SAMPLER_RECENCY_TAU))
+
+Trọng số tính bằng NumPy trên snapshot điểm (làm mới định kỳ ở background), cộng dồn
+(cumsum) 1 lần; mỗi lần lấy mẫu chỉ là searchsorted => O(k log N), không phụ thuộc N.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+import database as db
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+SAMPLER_VIEW_ALPHA = float(os.getenv("SAMPLER_VIEW_ALPHA", "1.0"))
+SAMPLER_RECENCY_TAU = float(os.getenv("SAMPLER_RECENCY_TAU", str(14 * 86400)))
+SAMPLER_RECENCY_FLOOR = float(os.getenv("SAMPLER_RECENCY_FLOOR", "0.2"))
+SAMPLER_REFRESH_SECONDS = int(os.getenv("SAMPLER_REFRESH_SECONDS", "120"))
+SNAPSHOT_CHUNK = 50_000
+
+def compute_weights(views, published_at, now=None):
+    """Trọng số theo nghịch đảo lượt xem và độ mới (vector hóa)"""
+    now = time.time() if now is None else now
+    views = np.maximum(np.asarray(views, dtype=np.float64), 0)
+    age = np.maximum(now - np.asarray(published_at, dtype=np.float64), 0)
+    return (1.0 / (1.0 + views)) ** SAMPLER_VIEW_ALPHA * (SAMPLER_RECENCY_FLOOR + np.exp(-age / SAMPLER_RECENCY_TAU))
+
+class WeightedSampler:
+    """Lấy mẫu không lặp theo trọng số trên 1 tập ID cố định"""
+
+    def __init__(self, ids, weights):
+        self.ids = ids
+        self.cumulative = np.cumsum(weights)
+        self.total = float(self.cumulative[-1]) if len(self.cumulative) else 0.0
+        self._rng = np.random.default_rng()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def draw(self, n, exclude=(), max_rounds=6):
+        """Trả về tối đa n ID khác nhau (không nằm trong exclude), theo thứ tự bốc được"""
+        if not self.total: return []
+        n = min(n, len(self.ids))
+        picked, seen_idx = [], set()
+        for _ in range(max_rounds):
+            need = n - len(picked)
+            if need <= 0: break
+            points = self._rng.random(need * 2 + 8) * self.total
+            for idx in np.searchsorted(self.cumulative, points, side="right"):
+                idx = min(int(idx), len(self.ids) - 1)
+                if idx in seen_idx: continue
+                seen_idx.add(idx)
+                vid = self.ids[idx]
+                if vid in exclude: continue
+                picked.append(vid)
+                if len(picked) >= n: break
+        return picked
+
+def weighted_sample(ids, views, published_at, k, exclude=()):
+    """Lấy mẫu 1 lần trên tập nhỏ (VD: feed sub của 1 user)"""
+    if not ids: return []
+    return WeightedSampler(list(ids), compute_weights(views, published_at)).draw(k, exclude)
+
+def load_global_snapshot():
+    """
+    Đọc toàn bộ videos:score + videos:all bằng ZSCAN theo từng khúc, dựng sampler toàn hệ thống.
+    Không phân trang bằng offset: zset đang bị ghi liên tục thì offset trượt, làm sót/lặp video.
+    ZSCAN vẫn có thể trả trùng -> gom vào dict để bỏ trùng.
+    """
+    published = dict(db.r.zscan_iter("videos:all", count=SNAPSHOT_CHUNK))
+    views = dict(db.r.zscan_iter("videos:score", count=SNAPSHOT_CHUNK))
+
+    ids = list(views)
+    now = time.time()
+    timestamps = [published.get(vid, now) for vid in ids]
+    return WeightedSampler(ids, compute_weights(list(views.values()), timestamps, now))
+
+class GlobalSampler:
+    """Sampler toàn hệ thống, tự làm mới snapshot ở background"""
+
+    def __init__(self):
+        self.sampler = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def ready(self):
+        return self.sampler is not None and len(self.sampler) > 0
+
+    def draw(self, n, exclude=()):
+        return self.sampler.draw(n, exclude) if self.ready() else []
+
+    def refresh(self):
+        self.sampler = load_global_snapshot()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("⚠️ [Sampler] Lỗi làm mới snapshot điểm: %s", e)
+            if self._stop.wait(SAMPLER_REFRESH_SECONDS):
+                return
+
+    def start(self):
+        if self._thread: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="score-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+global_sampler = GlobalSampler()
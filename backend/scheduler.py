@@ -0,0 +1,254 @@
+"""
+Lịch crawl định kỳ, chạy thành process riêng (không nằm trong process API):
+
+    python scheduler.py            # chạy vòng lặp (chạy nhiều bản cũng được, chỉ 1 bản làm leader)
+    python scheduler.py --plan     # in kế hoạch sắp tới rồi thoát
+
+- Leader lock trên Redis: chỉ 1 process được xếp lịch, các process khác đứng chờ thay thế
+- Mỗi kênh có lịch riêng trong zset crawl:schedule (score = thời điểm quét tiếp)
+- Chu kỳ quét theo tần suất đăng video (số video mới crawler thấy trong 30 ngày gần nhất,
+  channel:{id}:arrivals, không tính lần quét đầu): kênh đăng nhiều quét dày,
+  kênh ít đăng quét thưa -> tải rải đều cả ngày thay vì dồn vào 03:00
+- Đến hạn thì chỉ enqueue job sync_channel (dedup theo kênh), worker.py mới là nơi crawl
+- Leader cũng chạy db.renormalize_trending() mỗi TRENDING_RENORM_SECONDS (dọn điểm trending đã nguội)
+"""
+import os
+import socket
+import time
+import uuid
+import zlib
+
+import database as db
+import job_queue
+import metrics
+from logs import get_logger
+
+logger = get_logger("scheduler")
+
+SCHEDULE_KEY = "crawl:schedule"      # zset: channel_id -> thời điểm quét tiếp
+LEADER_KEY = "crawl:scheduler:leader"
+STATUS_KEY = "crawl:scheduler:status"  # hash: leader, last_tick, enqueued...
+
+LEADER_TTL = int(os.getenv("SCHEDULER_LEADER_TTL", "60"))
+TICK_SECONDS = int(os.getenv("SCHEDULER_TICK_SECONDS", "30"))
+MAX_ENQUEUE_PER_TICK = int(os.getenv("SCHEDULER_MAX_ENQUEUE_PER_TICK", "50"))
+RECONCILE_SECONDS = int(os.getenv("SCHEDULER_RECONCILE_SECONDS", "3600"))
+TRENDING_RENORM_SECONDS = int(os.getenv("TRENDING_RENORM_SECONDS", "3600"))
+MIN_INTERVAL = int(os.getenv("CRAWL_MIN_INTERVAL", str(2 * 3600)))
+MAX_INTERVAL = int(os.getenv("CRAWL_MAX_INTERVAL", str(24 * 3600)))
+CRAWL_LIMIT = int(os.getenv("SCHEDULED_CRAWL_LIMIT", "10"))
+ACTIVITY_WINDOW = db.ARRIVALS_WINDOW
+
+ENQUEUED = metrics.Counter("scheduler_enqueued_total", "Số job sync_channel do scheduler tạo", ("created",))
+SCHEDULED_CHANNELS = metrics.Gauge("scheduler_channels", "Số kênh đang có lịch quét")
+
+# Gia hạn / nhả khóa chỉ khi khóa vẫn là của mình
+_renew_script = db.r.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+""")
+_release_script = db.r.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+class LeaderLock:
+    def __init__(self, ttl=LEADER_TTL):
+        self.ttl = ttl
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.held = False
+
+    def acquire_or_renew(self):
+        """Gọi mỗi tick: đang giữ thì gia hạn, chưa giữ thì thử chiếm. Trả về True nếu đang là leader."""
+        if self.held:
+            self.held = bool(_renew_script(keys=[LEADER_KEY], args=[self.token, self.ttl]))
+        if not self.held:
+            self.held = bool(db.r.set(LEADER_KEY, self.token, nx=True, ex=self.ttl))
+        return self.held
+
+    def release(self):
+        if self.held:
+            _release_script(keys=[LEADER_KEY], args=[self.token])
+            self.held = False
+
+# === TÍNH CHU KỲ QUÉT ===
+def _jitter(channel_id, span):
+    """Độ lệch cố định theo kênh trong [0, span) để các kênh không trùng giờ"""
+    return zlib.crc32(channel_id.encode()) % max(1, int(span))
+
+def crawl_interval(uploads_per_day):
+    """Kênh đăng k video/ngày -> quét khoảng 2 lần giữa 2 video, kẹp trong [MIN, MAX]"""
+    if uploads_per_day <= 0: return MAX_INTERVAL
+    return int(min(MAX_INTERVAL, max(MIN_INTERVAL, 86400 / uploads_per_day / 2)))
+
+def channel_intervals(channel_ids, now=None):
+    """{channel_id: (chu kỳ, last_sync)} cho cả lô, 1 round trip"""
+    now = now or time.time()
+    pipe = db.r.pipeline(transaction=False)
+    for cid in channel_ids:
+        pipe.zcount(db._arrivals_key(cid), now - ACTIVITY_WINDOW, "+inf")
+        pipe.hget(f"channel:{cid}:info", "last_sync")
+    values = pipe.execute()
+    result = {}
+    for i, cid in enumerate(channel_ids):
+        recent, last_sync = values[2 * i], values[2 * i + 1]
+        result[cid] = (crawl_interval(recent / (ACTIVITY_WINDOW / 86400)), int(last_sync or 0))
+    return result
+
+def _initial_run_at(channel_id, interval, last_sync, now):
+    # Chưa quá hạn: quét đúng hạn. Đã quá hạn (VD lần đầu bật scheduler): rải đều trong 1 chu kỳ
+    due = last_sync + interval
+    return due if due > now else now + _jitter(channel_id, interval)
+
+# === XẾP LỊCH ===
+def reconcile(batch_size=500):
+    """Thêm kênh mới trong registry vào lịch, bỏ kênh đã xóa khỏi lịch. Trả về (thêm, bỏ)."""
+    now = time.time()
+    added = 0
+    batch = []
+    for cid in db.r.sscan_iter(db.CHANNEL_REGISTRY_KEY, count=batch_size):
+        batch.append(cid)
+        if len(batch) >= batch_size:
+            added += _schedule_missing(batch, now)
+            batch = []
+    if batch:
+        added += _schedule_missing(batch, now)
+
+    removed = 0
+    stale = []
+    for cid, _ in db.r.zscan_iter(SCHEDULE_KEY, count=batch_size):
+        stale.append(cid)
+        if len(stale) >= batch_size:
+            removed += _unschedule_deleted(stale)
+            stale = []
+    if stale:
+        removed += _unschedule_deleted(stale)
+    SCHEDULED_CHANNELS.set(db.r.zcard(SCHEDULE_KEY))
+    return added, removed
+
+def _schedule_missing(channel_ids, now):
+    scheduled = db.r.zmscore(SCHEDULE_KEY, channel_ids)
+    missing = [cid for cid, score in zip(channel_ids, scheduled) if score is None]
+    if not missing: return 0
+    plan = {cid: _initial_run_at(cid, interval, last_sync, now)
+            for cid, (interval, last_sync) in channel_intervals(missing, now).items()}
+    return db.r.zadd(SCHEDULE_KEY, plan, nx=True)
+
+def _unschedule_deleted(channel_ids):
+    exists = db.r.smismember(db.CHANNEL_REGISTRY_KEY, channel_ids)
+    gone = [cid for cid, ok in zip(channel_ids, exists) if not ok]
+    return db.r.zrem(SCHEDULE_KEY, *gone) if gone else 0
+
+def tick(now=None):
+    """Enqueue các kênh đến hạn (tối đa MAX_ENQUEUE_PER_TICK) rồi xếp lịch lần sau. Trả về số job."""
+    now = now or time.time()
+    due = db.r.zrangebyscore(SCHEDULE_KEY, "-inf", now, start=0, num=MAX_ENQUEUE_PER_TICK)
+    if not due: return 0
+    # Kênh đã bị xóa thì bỏ khỏi lịch (crawl lại sẽ tạo lại kênh)
+    exists = db.r.smismember(db.CHANNEL_REGISTRY_KEY, due)
+    gone = [cid for cid, ok in zip(due, exists) if not ok]
+    if gone:
+        db.r.zrem(SCHEDULE_KEY, *gone)
+        due = [cid for cid, ok in zip(due, exists) if ok]
+        if not due: return 0
+
+    intervals = channel_intervals(due, now)
+    next_runs = {}
+    for cid in due:
+        _, created = job_queue.enqueue("sync_channel", dedup=cid, channel_id=cid, limit=CRAWL_LIMIT)
+        ENQUEUED.inc(created=str(created).lower())
+        interval, _ = intervals[cid]
+        # Thêm chút lệch để các kênh cùng chu kỳ không dồn lại một chỗ theo thời gian
+        next_runs[cid] = now + interval + _jitter(cid, interval * 0.1)
+    db.r.zadd(SCHEDULE_KEY, next_runs, xx=True)
+    db.r.hincrby(STATUS_KEY, "enqueued", len(due))
+    return len(due)
+
+def get_plan(limit=50, horizon=86400):
+    """
+    Kế hoạch sắp tới: các kênh sắp đến hạn + số kênh đến hạn theo từng giờ trong `horizon` giây
+    (để kiểm tra tải có rải đều không) + thông tin leader.
+    """
+    now = time.time()
+    pipe = db.r.pipeline(transaction=False)
+    pipe.zrangebyscore(SCHEDULE_KEY, "-inf", "+inf", start=0, num=limit, withscores=True)
+    pipe.zcard(SCHEDULE_KEY)
+    pipe.zcount(SCHEDULE_KEY, "-inf", now)
+    hours = max(1, horizon // 3600)
+    for h in range(hours):
+        pipe.zcount(SCHEDULE_KEY, now + h * 3600, f"({now + (h + 1) * 3600}")
+    pipe.get(LEADER_KEY)
+    pipe.hgetall(STATUS_KEY)
+    upcoming, total, overdue, *per_hour, leader, status = pipe.execute()
+    return {
+        "now": int(now),
+        "leader": leader,
+        "status": status,
+        "scheduled": total,
+        "overdue": overdue,
+        "per_hour": per_hour,
+        "upcoming": [{"channel_id": cid, "run_at": int(ts), "in_seconds": int(ts - now)} for cid, ts in upcoming],
+    }
+
+# === VÒNG LẶP CHÍNH ===
+def run_scheduler():
+    import signal
+
+    stopping = []
+    def stop(*_):
+        logger.info("🛑 Scheduler: Nhận tín hiệu dừng...")
+        stopping.append(True)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    metrics.serve()
+    lock = LeaderLock()
+    last_reconcile = last_renorm = 0
+    logger.info("⏰ Scheduler %s: Khởi động", lock.token)
+    try:
+        while not stopping:
+            try:
+                if lock.acquire_or_renew():
+                    if time.time() - last_reconcile >= RECONCILE_SECONDS:
+                        added, removed = reconcile()
+                        last_reconcile = time.time()
+                        logger.info("🗓️ Scheduler: +%d / -%d kênh trong lịch", added, removed)
+                    if time.time() - last_renorm >= TRENDING_RENORM_SECONDS:
+                        removed, shifted = db.renormalize_trending()
+                        last_renorm = time.time()
+                        if removed or shifted:
+                            logger.info("📉 Scheduler: Trending bỏ %d video nguội, dời điểm %d video", removed, shifted)
+                    count = tick()
+                    db.r.hset(STATUS_KEY, mapping={"leader": lock.token, "last_tick": int(time.time())})
+                    if count:
+                        logger.info("📤 Scheduler: Đã enqueue %d kênh đến hạn", count)
+                else:
+                    # Mất quyền leader -> lần sau lên lại thì phải reconcile lại từ đầu
+                    last_reconcile = 0
+            except Exception as e:
+                logger.warning("⚠️ Scheduler: Lỗi: %s", e)
+            # Ngủ từng giây để nhận tín hiệu dừng nhanh
+            for _ in range(TICK_SECONDS):
+                if stopping: break
+                time.sleep(1)
+    finally:
+        lock.release()
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Scheduler crawl định kỳ")
+    parser.add_argument("--plan", action="store_true", help="In kế hoạch sắp tới rồi thoát")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    if args.plan:
+        print(json.dumps(get_plan(limit=args.limit), indent=2, ensure_ascii=False))
+    else:
+        run_scheduler()
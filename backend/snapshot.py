@@ -0,0 +1,260 @@
+"""
+Snapshot toàn bộ dữ liệu ra 1 file để dựng node mới trong vài giây thay vì crawl lại YouTube.
+
+    python manage.py export-snapshot data.snap                    # toàn bộ
+    python manage.py export-snapshot delta.snap --since 1718000000  # chỉ video đăng từ thời điểm này
+    python manage.py import-snapshot data.snap
+
+Định dạng file: MAGIC rồi một dãy khối, mỗi khối = header (loại, số bản ghi, số byte) + payload.
+Payload là các cột (dict tên cột -> list) serialize bằng orjson rồi nén zlib: cột cùng kiểu nằm
+liền nhau nên nén tốt hơn hẳn theo từng bản ghi. Mỗi khối tối đa CHUNK_RECORDS bản ghi
+-> export / import chỉ giữ 1 khối trong RAM dù dữ liệu lớn cỡ nào.
+
+Loại khối:
+    META  thông tin snapshot (thời điểm, since, version, epoch điểm trending)
+    CHAN  info kênh (+ high-water mark crawl)  VIDS  video (+ điểm view, điểm trending)
+    SUBS  danh sách sub của user UINF info user
+    END   tổng số bản ghi từng loại (file thiếu khối này = export bị ngắt giữa chừng)
+Dữ liệu suy ra được (channel:{id}:videos, followers, index khám phá / tìm kiếm) được dựng lại khi import.
+--since chỉ lọc video; kênh và sub (nhỏ hơn nhiều) luôn được export đủ.
+Import vào DB đang chạy không làm tụt điểm: điểm view / trending chỉ được ghi nếu cao hơn điểm hiện có,
+published_at của video đã có được giữ nguyên.
+"""
+import struct
+import time
+import zlib
+
+import orjson
+
+import database as db
+import text_index
+
+MAGIC = b"YTSNAP01"
+VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)  # v1: chưa có điểm trending / high-water mark
+CHUNK_RECORDS = 5000
+_HEADER = struct.Struct(">4sII")  # loại khối, số bản ghi, số byte payload
+
+class SnapshotError(Exception):
+    pass
+
+# === ĐỌC / GHI KHỐI ===
+def write_chunk(f, kind, columns, count):
+    payload = zlib.compress(orjson.dumps(columns), 6)
+    f.write(_HEADER.pack(kind, count, len(payload)))
+    f.write(payload)
+    return _HEADER.size + len(payload)
+
+def read_chunks(f):
+    """Duyệt (loại, cột) từng khối; lỗi nếu file hỏng hoặc không phải snapshot"""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise SnapshotError("Không phải file snapshot")
+    while True:
+        header = f.read(_HEADER.size)
+        if not header:
+            raise SnapshotError("File snapshot bị cắt cụt (thiếu khối END)")
+        kind, count, size = _HEADER.unpack(header)
+        payload = f.read(size)
+        if len(payload) != size:
+            raise SnapshotError("File snapshot bị cắt cụt")
+        columns = orjson.loads(zlib.decompress(payload))
+        yield kind, columns
+        if kind == b"END ":
+            return
+
+# === EXPORT ===
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _video_id_batches(since, size):
+    """Toàn bộ: ZSCAN videos:all. Có since: duyệt theo hạng (ZRANGE O(log N + lô)), không dùng offset"""
+    if since is None:
+        yield from _batched((vid for vid, _ in db.r.zscan_iter("videos:all", count=size)), size)
+        return
+    rank = db.r.zcount("videos:all", "-inf", f"({since}")
+    while True:
+        video_ids = db.r.zrange("videos:all", rank, rank + size - 1)
+        if not video_ids: return
+        yield video_ids
+        rank += len(video_ids)
+
+def _export_videos(f, since, size):
+    count = 0
+    for video_ids in _video_id_batches(since, size):
+        pipe = db.r.pipeline(transaction=False)
+        pipe.zmscore("videos:score", video_ids)
+        pipe.zmscore(db.TRENDING_KEY, video_ids)
+        scores, trending = pipe.execute()
+        columns = {"id": [], "channel_id": [], "published_at": [], "title": [], "thumbnail": [], "score": [],
+                   "trending": []}
+        for video, score, hot in zip(db.load_videos(video_ids), scores, trending):
+            if not video: continue  # ID mồ côi (xem gc_orphan_videos)
+            columns["id"].append(video["id"])
+            columns["channel_id"].append(video["channel_id"])
+            columns["published_at"].append(int(video["published_at"]))
+            columns["title"].append(video["title"])
+            # Ảnh chuẩn thì để trống, dựng lại từ id khi import (giống định dạng gọn)
+            thumbnail = video["thumbnail"]
+            columns["thumbnail"].append("" if thumbnail == db.thumbnail_url(video["id"]) else thumbnail)
+            columns["score"].append(int(score or 0))
+            columns["trending"].append(hot)  # None: video không có trong videos:trending
+        if columns["id"]:
+            write_chunk(f, b"VIDS", columns, len(columns["id"]))
+            count += len(columns["id"])
+    return count
+
+def _export_channels(f, size):
+    count = 0
+    for channel_ids in _batched(db.r.sscan_iter(db.CHANNEL_REGISTRY_KEY, count=size), size):
+        infos = db.get_channels_info(channel_ids)
+        fields = ("id", "name", "avatar", "description", "last_sync", "last_video_id")
+        columns = {field: [info.get(field, "") for info in infos] for field in fields}
+        if infos:
+            write_chunk(f, b"CHAN", columns, len(infos))
+            count += len(infos)
+    return count
+
+def _export_user_keys(f, kind, pattern, key_type, read, size):
+    """SCAN user:*:{subs|info} theo lô, mỗi lô đọc bằng 1 pipeline"""
+    count = 0
+    for keys in _batched(db.r.scan_iter(match=pattern, count=size, _type=key_type), size):
+        pipe = db.r.pipeline(transaction=False)
+        for key in keys:
+            getattr(pipe, read)(key)
+        values = pipe.execute()
+        columns = {"id": [key.split(":")[1] for key in keys], "value": [
+            sorted(value) if isinstance(value, set) else value for value in values]}
+        write_chunk(f, kind, columns, len(keys))
+        count += len(keys)
+    return count
+
+def export_snapshot(path, since=None, chunk_records=CHUNK_RECORDS):
+    """Ghi snapshot ra `path`. Trả về thống kê (số bản ghi từng loại, bytes, records/s)."""
+    start = time.perf_counter()
+    counts = {}
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        trending_epoch = db.r.get(db.TRENDING_EPOCH_KEY)
+        write_chunk(f, b"META", {"version": VERSION, "created_at": int(time.time()), "since": since,
+                                 "trending_epoch": float(trending_epoch) if trending_epoch else None}, 0)
+        counts["channels"] = _export_channels(f, chunk_records)
+        counts["videos"] = _export_videos(f, since, chunk_records)
+        counts["subscriptions"] = _export_user_keys(f, b"SUBS", "user:*:subs", "set", "smembers", chunk_records)
+        counts["users"] = _export_user_keys(f, b"UINF", "user:*:info", "hash", "hgetall", chunk_records)
+        write_chunk(f, b"END ", counts, 0)
+        size = f.tell()
+    return _stats(counts, size, time.perf_counter() - start)
+
+def _stats(counts, size, elapsed):
+    records = sum(counts.values())
+    return {**counts, "bytes": size, "seconds": round(elapsed, 2),
+            "records_per_sec": round(records / elapsed) if elapsed else records}
+
+# === IMPORT ===
+def _trending_shift(snapshot_epoch):
+    """
+    Điểm trending tính theo epoch của từng DB -> độ lệch cần trừ khi import (None: snapshot không có điểm).
+    DB đích chưa có epoch thì nhận luôn epoch của snapshot.
+    """
+    if snapshot_epoch is None: return None
+    db.r.set(db.TRENDING_EPOCH_KEY, repr(snapshot_epoch), nx=True)
+    return (float(db.r.get(db.TRENDING_EPOCH_KEY)) - snapshot_epoch) * db.TRENDING_DECAY
+
+def _import_channels(columns, meta):
+    pipe = db.r.pipeline(transaction=False)
+    for row in zip(*columns.values()):
+        info = dict(zip(columns.keys(), row))
+        # High-water mark: DB đích đã crawl kênh thì giữ mốc của nó (mới hơn snapshot), bỏ qua chuỗi rỗng
+        hwm = info.pop("last_video_id", None)
+        pipe.hset(f"channel:{info['id']}:info", mapping=info)
+        if hwm:
+            pipe.hsetnx(f"channel:{info['id']}:info", "last_video_id", hwm)
+        pipe.sadd(db.CHANNEL_REGISTRY_KEY, info["id"])
+        text_index.queue_index_channel(pipe, info["id"], info["name"])
+        # Info kênh vừa bị ghi đè -> báo các replica bỏ cache (cùng round trip)
+        db.publish_invalidation(pipe, info["id"])
+    pipe.execute()
+    for channel_id in columns["id"]:
+        db.channel_cache.invalidate(channel_id)
+
+def _import_videos(columns, meta):
+    pipe = db.r.pipeline(transaction=False)
+    by_channel = {}
+    for video_id, channel_id, published_at, title, thumbnail in zip(
+            columns["id"], columns["channel_id"], columns["published_at"], columns["title"], columns["thumbnail"]):
+        pipe.set(db._video_key(video_id), db.pack_video(video_id, channel_id, published_at, title, thumbnail))
+        text_index.queue_index_video(pipe, video_id, title, published_at)
+        by_channel.setdefault(channel_id, {})[video_id] = published_at
+    # NX: giữ published_at đã có; GT: không ghi đè điểm view đang chạy bằng điểm cũ hơn
+    pipe.zadd("videos:all", dict(zip(columns["id"], columns["published_at"])), nx=True)
+    pipe.zadd("videos:score", dict(zip(columns["id"], columns["score"])), gt=True)
+    shift = meta.get("trending_shift")
+    if shift is not None:
+        trending = {vid: hot - shift for vid, hot in zip(columns["id"], columns.get("trending", ())) if hot is not None}
+        if trending:
+            pipe.zadd(db.TRENDING_KEY, trending, gt=True)
+    for channel_id, videos in by_channel.items():
+        pipe.zadd(f"channel:{channel_id}:videos", videos, nx=True)
+    pipe.execute()
+
+def _import_subscriptions(columns, meta):
+    pipe = db.r.pipeline(transaction=False)
+    for user_id, channel_ids in zip(columns["id"], columns["value"]):
+        if not channel_ids: continue
+        pipe.sadd(f"user:{user_id}:subs", *channel_ids)
+        for channel_id in channel_ids:
+            pipe.sadd(f"channel:{channel_id}:followers", user_id)
+        # Feed Sub dựng lại từ đầu ở lần đọc đầu tiên (xem rebuild_user_feed)
+        pipe.delete(db._user_feed_key(user_id))
+    pipe.execute()
+
+def _import_users(columns, meta):
+    pipe = db.r.pipeline(transaction=False)
+    for user_id, info in zip(columns["id"], columns["value"]):
+        if info:
+            pipe.hset(f"user:{user_id}:info", mapping=info)
+    pipe.execute()
+
+_IMPORTERS = {
+    b"CHAN": ("channels", _import_channels),
+    b"VIDS": ("videos", _import_videos),
+    b"SUBS": ("subscriptions", _import_subscriptions),
+    b"UINF": ("users", _import_users),
+}
+
+def import_snapshot(path, on_progress=None):
+    """
+    Nạp snapshot vào Redis hiện tại (ghi đè bản ghi trùng id, không xóa dữ liệu khác;
+    điểm view / trending chỉ tăng, không giảm).
+    Trả về thống kê như export_snapshot.
+    """
+    start = time.perf_counter()
+    was_empty = db.r.dbsize() == 0
+    counts = {name: 0 for name, _ in _IMPORTERS.values()}
+    meta = {}
+    with open(path, "rb") as f:
+        for kind, columns in read_chunks(f):
+            if kind in _IMPORTERS:
+                name, importer = _IMPORTERS[kind]
+                importer(columns, meta)
+                counts[name] += len(columns["id"])
+                if on_progress:
+                    on_progress(counts)
+            elif kind == b"META":
+                if columns.get("version") not in SUPPORTED_VERSIONS:
+                    raise SnapshotError(f"Snapshot version {columns.get('version')} không được hỗ trợ")
+                meta = {**columns, "trending_shift": _trending_shift(columns.get("trending_epoch"))}
+        size = f.tell()
+
+    # DB trống lúc đầu -> mọi video:{id} đều ở định dạng gọn, bỏ qua fallback hash cũ
+    if was_empty:
+        db.r.set(db.VIDEO_FORMAT_KEY, "packed")
+    db.rebuild_explore_index()
+    return _stats(counts, size, time.perf_counter() - start)
@@ -0,0 +1,68 @@
+"""
+Cấu hình chung cho test.
+Test chạy trên TEST_REDIS_URL nếu có (sẽ FLUSHDB DB đó!), không thì tự bật 1 server
+fakeredis (giao thức Redis thật qua TCP, có Lua) trong process -> không cần cài Redis.
+"""
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+def _start_fake_redis():
+    from fakeredis import TcpFakeServer
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    server.daemon_threads = True  # connection còn mở không được giữ process lại lúc thoát
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+# Phải set REDIS_URL trước khi bất kỳ test nào import database
+USE_FAKE_REDIS = not os.getenv("TEST_REDIS_URL")
+os.environ["REDIS_URL"] = os.getenv("TEST_REDIS_URL") or _start_fake_redis()
+os.environ.setdefault("MEDIA_PROXY_URL", "")
+
+import database as db  # noqa: E402
+
+def _preload_scripts():
+    """
+    Server fakeredis qua TCP đóng connection sau mọi reply lỗi, kể cả NOSCRIPT của lần EVALSHA
+    đầu tiên (redis-py dựa vào lỗi đó để SCRIPT LOAD) -> nạp sẵn mọi script đã register_script.
+    """
+    from redis.commands.core import Script
+    for module in list(sys.modules.values()):
+        if not (getattr(module, "__file__", None) or "").startswith(BACKEND_DIR): continue
+        for value in list(vars(module).values()):
+            if isinstance(value, Script):
+                db.r.script_load(value.script)
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    db.r.flushdb()
+    db.channel_cache.clear()
+    if USE_FAKE_REDIS:
+        _preload_scripts()
+    db.reset_round_trips()
+    yield
+
+@pytest.fixture
+def fake_youtube():
+    """Server YouTube giả lập (benchmarks/fake_youtube.py); gọi fake_youtube(latency=...) -> base_url"""
+    from benchmarks.fake_youtube import start_server
+    servers = []
+
+    def start(latency=0.0, padding_kb=0):
+        server, base_url = start_server(latency=latency, padding_kb=padding_kb)
+        servers.append(server)
+        return base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
@@ -0,0 +1,80 @@
+"""Hydrate 1 trang feed tốn số round trip Redis cố định, không phụ thuộc kích thước trang."""
+import asyncio
+
+import pytest
+
+import database as db
+import database_async as adb
+
+CHANNELS = 8
+VIDEOS_PER_CHANNEL = 25
+
+@pytest.fixture
+def seeded():
+    video_ids = []
+    for c in range(CHANNELS):
+        channel_id = f"UCtest{c:03d}"
+        db.add_channel_to_db(channel_id, f"Kênh {c}", f"https://yt3.example/{c}.jpg")
+        videos = [{"id": f"vid{c:03d}{i:04d}", "title": f"Video {c} {i}", "thumbnail": "",
+                   "published_at": 1_700_000_000 + c * 1000 + i} for i in range(VIDEOS_PER_CHANNEL)]
+        db.add_videos_to_db(channel_id, videos)
+        video_ids += [v["id"] for v in videos]
+    db.subscribe_channel("user1", "UCtest000")
+    db.subscribe_channel("user1", "UCtest001")
+    return video_ids
+
+def round_trips(fn, *args):
+    db.reset_round_trips()
+    result = fn(*args)
+    return db.get_round_trips(), result
+
+@pytest.mark.parametrize("warm_cache", [False, True])
+def test_hydration_cost_is_constant(seeded, warm_cache):
+    costs = {}
+    for size in (1, 5, 20, 100):
+        # Trộn video của mọi kênh để trang nào cũng phải lấy info nhiều kênh
+        page = seeded[::len(seeded) // size][:size]
+        if warm_cache:
+            db.get_videos_from_ids(page)
+        else:
+            db.channel_cache.clear()
+        costs[size], videos = round_trips(db.get_videos_from_ids, page)
+        assert [v["id"] for v in videos] == page
+        assert all(v["channel_name"].startswith("Kênh") for v in videos)
+    assert len(set(costs.values())) == 1, costs
+    assert costs[1] == (1 if warm_cache else 2)
+
+def test_channels_info_cost_is_constant(seeded):
+    channel_ids = [f"UCtest{c:03d}" for c in range(CHANNELS)]
+    for size in (1, 4, CHANNELS):
+        cost, infos = round_trips(db.get_channels_info, channel_ids[:size])
+        assert cost == 1
+        assert len(infos) == size
+
+@pytest.mark.parametrize("user_id", [None, "user1"])
+def test_session_pages_cost_is_constant(seeded, user_id):
+    assert db.init_feed_session("s1", user_id, "time")
+    db.get_videos_from_ids(seeded)  # làm nóng cache kênh
+    costs = []
+    for limit in (5, 10, 20):
+        cost, videos = round_trips(db.get_videos_from_session, "s1", limit)
+        assert len(videos) == limit
+        costs.append(cost)
+    assert len(set(costs)) == 1, costs
+
+def test_async_feed_page_cost_is_constant(seeded):
+    async def page_costs():
+        await adb.init_feed_session("s2", "user1", "score_asc")
+        costs = []
+        for limit in (5, 10, 20):
+            db.channel_cache.clear()
+            db.reset_round_trips()
+            video_ids, _ = await adb.pop_session_video_ids("s2", limit)
+            videos = await adb.get_videos_from_ids(video_ids)
+            assert len(videos) == limit
+            costs.append(db.get_round_trips())
+        await adb.close()
+        return costs
+
+    costs = asyncio.run(page_costs())
+    assert len(set(costs)) == 1, costs
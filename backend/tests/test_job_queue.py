@@ -0,0 +1,59 @@
+"""Visibility timeout / heartbeat của job_queue.py"""
+import pytest
+
+import job_queue
+
+@pytest.fixture
+def short_timeout(monkeypatch):
+    monkeypatch.setattr(job_queue, "VISIBILITY_TIMEOUT", -1)  # reserve xong là quá hạn ngay
+
+def test_expired_job_counts_as_attempt(short_timeout):
+    job_id, _ = job_queue.enqueue("sync_channel", dedup="UC1", channel_id="UC1")
+    assert job_queue.reserve()["id"] == job_id
+    # Worker "chết": lần reserve sau trả job về hàng đợi và tính 1 lần thử
+    job = job_queue.reserve()
+    assert job["id"] == job_id
+    assert job["attempts"] == "1"
+
+def test_poison_job_goes_to_dead_letter(short_timeout, monkeypatch):
+    monkeypatch.setattr(job_queue, "MAX_ATTEMPTS", 3)
+    job_id, _ = job_queue.enqueue("sync_channel", dedup="UC2", channel_id="UC2")
+    reserved = 0
+    while job_queue.reserve():
+        reserved += 1
+        assert reserved <= 3
+    stats = job_queue.queue_stats()
+    assert (stats["dead"], stats["queued"], stats["processing"]) == (1, 0, 0)
+    assert job_queue.r.hget(job_queue._job_key(job_id), "status") == "dead"
+    # Dedup được giải phóng -> enqueue lại được job mới
+    assert job_queue.enqueue("sync_channel", dedup="UC2", channel_id="UC2")[1]
+
+def test_extend_keeps_long_job_reserved(monkeypatch):
+    job_queue.enqueue("sync_channel", channel_id="UC3")
+    monkeypatch.setattr(job_queue, "VISIBILITY_TIMEOUT", -1)
+    job = job_queue.reserve()
+    assert job_queue.extend(job, timeout=60)
+    assert job_queue.reserve() is None  # đã gia hạn -> không bị worker khác lấy
+    job_queue.ack(job)
+    assert not job_queue.extend(job)
+
+def test_failed_crawl_is_retried_then_dead_lettered(monkeypatch):
+    import scrapetube
+    import worker
+
+    def broken_scrape(**kwargs):
+        raise ConnectionError("YouTube down")
+    monkeypatch.setattr(scrapetube, "get_channel", broken_scrape)
+    monkeypatch.setattr(worker, "get_channel_details", lambda channel_id, stats=None: ("Kênh", "", ""))
+    monkeypatch.setattr(job_queue, "MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(job_queue, "BACKOFF_BASE", 0)  # retry đến hạn ngay
+
+    job_id, _ = job_queue.enqueue("sync_channel", dedup="UC3", channel_id="UC3")
+    runs = []
+    while job := job_queue.reserve():
+        runs.append(worker.process_job(job))
+        assert len(runs) <= 3
+    assert runs == [False, False, False]
+    stats = job_queue.queue_stats()
+    assert (stats["dead"], stats["retried"], stats["queued"]) == (1, 2, 0)
+    assert "lỗi khi quét" in job_queue.r.hget(job_queue._job_key(job_id), "last_error")
@@ -0,0 +1,18 @@
+"""Các việc dọn dẹp định kỳ (manage.py gc)."""
+import logging
+
+import database as db
+
+def test_gc_orphan_videos_counts_and_logs(caplog):
+    db.add_videos_to_db("UCgc", [{"id": f"gcvid{i:06d}", "title": f"Video {i}", "published_at": 1000 + i}
+                                 for i in range(3)])
+    # ID mồ côi: còn trong index nhưng video:{id} không còn
+    db.r.zadd("videos:score", {"orphan00001": 1, "orphan00002": 2})
+    db.r.zadd("videos:all", {"orphan00001": 1})
+
+    with caplog.at_level(logging.INFO, logger="database"):
+        removed = db.gc_orphan_videos(batch_size=2)
+
+    assert removed == {"videos:score": 2, "videos:all": 1, db.TRENDING_KEY: 0}
+    assert db.r.zcard("videos:score") == 3
+    assert "đã xóa 3 ID mồ côi" in caplog.text
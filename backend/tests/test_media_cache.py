@@ -0,0 +1,84 @@
+"""Proxy ảnh (media_cache.py + /media/*) với nguồn ảnh giả lập local."""
+import pytest
+from fastapi.testclient import TestClient
+
+import database as db
+import media_cache
+
+@pytest.fixture
+def origin(fake_youtube, tmp_path, monkeypatch):
+    monkeypatch.setattr(media_cache, "MEDIA_PROXY_URL", "/media")
+    monkeypatch.setattr(media_cache, "cache", media_cache.DiskCache(root=str(tmp_path)))
+    return fake_youtube()
+
+@pytest.fixture
+def client():
+    import main
+    return TestClient(main.app)  # không dùng "with": không chạy startup (sampler, pool, ...)
+
+def add_video(video_id, thumbnail):
+    db.add_channel_to_db("UCmedia", "Kênh ảnh", "")
+    db.add_videos_to_db("UCmedia", [{"id": video_id, "title": "Video ảnh", "thumbnail": thumbnail,
+                                     "published_at": 1_700_000_000}])
+
+def test_prefetch_stores_original_and_webp(origin):
+    ids = [f"pf{i:09d}" for i in range(6)]
+    cached = media_cache.prefetch_thumbnails([{"id": vid, "thumbnail": f"{origin}/vi/{vid}/hqdefault.jpg"}
+                                              for vid in ids])
+    assert cached == len(ids)
+    path, media_type = media_cache.cache.lookup("thumb", ids[0])
+    assert media_type == "image/jpeg"
+    if media_cache.MEDIA_WEBP:
+        small, small_type = media_cache.cache.lookup("thumb", ids[0], accept_webp=True)
+        assert small_type == "image/webp"
+        assert small.endswith(".small.webp")
+    # Lần 2 không tải lại
+    assert media_cache.prefetch_thumbnails([{"id": ids[0], "thumbnail": "http://127.0.0.1:9/unreachable"}]) == 1
+
+def test_oversized_image_is_rejected(origin, monkeypatch):
+    monkeypatch.setattr(media_cache, "MAX_IMAGE_BYTES", 100)
+    assert not media_cache.fetch("thumb", "big00000001", f"{origin}/vi/big00000001/hqdefault.jpg")
+    assert media_cache.cache.lookup("thumb", "big00000001") is None
+
+def test_thumbnail_served_from_disk(origin, client):
+    add_video("srv00000001", f"{origin}/vi/srv00000001/hqdefault.jpg")
+    resp = client.get("/media/thumb/srv00000001", headers={"Accept": "image/jpeg"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/jpeg"
+    assert resp.headers["cache-control"] == media_cache.CACHE_CONTROL
+    assert media_cache.sniff(resp.content)[1] == "jpg"
+    if media_cache.MEDIA_WEBP:
+        webp = client.get("/media/thumb/srv00000001", headers={"Accept": "image/webp,image/*"})
+        assert webp.headers["content-type"] == "image/webp"
+        assert len(webp.content) < len(resp.content)
+
+def test_thumbnail_origin_failure_redirects(origin, client):
+    broken = f"{origin}/missing/brk00000001.jpg"  # fake_youtube trả 404
+    add_video("brk00000001", broken)
+    resp = client.get("/media/thumb/brk00000001", follow_redirects=False)
+    assert resp.status_code == 302
+    assert resp.headers["location"] == broken
+
+def test_avatar_placeholder_and_invalid_key(origin, client):
+    db.add_channel_to_db("UCnoavatar", "Kênh", "https://via.placeholder.com/150")
+    resp = client.get("/media/avatar/UCnoavatar")
+    assert resp.headers["content-type"].startswith("image/svg+xml")
+    assert client.get("/media/thumb/bad..key").status_code == 404
+
+def test_avatar_fetched_from_origin(origin, client):
+    avatar = f"{origin}/avatar/UCwithavatar.jpg"
+    db.add_channel_to_db("UCwithavatar", "Kênh", avatar)
+    link = media_cache.avatar_link("UCwithavatar", avatar)
+    assert link.startswith("/media/avatar/UCwithavatar?v=")
+    resp = client.get(link, headers={"Accept": "image/jpeg"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/jpeg"
+
+def test_eviction_keeps_cache_under_limit(tmp_path):
+    cache = media_cache.DiskCache(root=str(tmp_path), max_bytes=5000)
+    jpeg = b"\xff\xd8\xff\xe0" + bytes(1500)
+    for i in range(10):
+        cache.store("thumb", f"ev{i:09d}", jpeg, "jpg")
+    assert cache.usage() <= 5000
+    assert cache.evicted > 0
+    assert cache.lookup("thumb", "ev000000009") is not None
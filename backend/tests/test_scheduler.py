@@ -0,0 +1,24 @@
+"""Chu kỳ quét theo tần suất đăng video thật (channel:{id}:arrivals), không theo giờ crawl."""
+import database as db
+import scheduler
+
+def videos(prefix, n, published_at):
+    return [{"id": f"{prefix}{i:05d}", "title": f"Video {i}", "published_at": published_at - i} for i in range(n)]
+
+def test_backfill_does_not_count_as_uploads():
+    db.add_channel_to_db("UCdormant", "Dormant", "")
+    # Lần quét đầu: 100 video cũ nhưng published_at = giờ crawl
+    db.add_videos_to_db("UCdormant", videos("old", 100, 1_800_000_000))
+    interval, _ = scheduler.channel_intervals(["UCdormant"])["UCdormant"]
+    assert interval == scheduler.MAX_INTERVAL
+    assert db.r.zscore(db.EXPLORE_KEY, "UCdormant") == 0
+
+def test_new_arrivals_shorten_interval():
+    db.add_channel_to_db("UCbusy", "Busy", "")
+    db.add_videos_to_db("UCbusy", videos("bak", 100, 1_800_000_000))
+    # Các lần quét sau: 60 video mới trong 30 ngày -> 2 video/ngày -> quét mỗi 6 giờ
+    db.add_videos_to_db("UCbusy", videos("new", 60, 1_800_000_000), track_arrivals=True)
+    db.add_videos_to_db("UCbusy", videos("new", 60, 1_800_000_000), track_arrivals=True)  # đã có: không tính lại
+    interval, _ = scheduler.channel_intervals(["UCbusy"])["UCbusy"]
+    assert interval == 6 * 3600
+    assert db.r.zscore(db.EXPLORE_KEY, "UCbusy") == 60 * db.EXPLORE_ACTIVITY_WEIGHT
@@ -0,0 +1,38 @@
+"""Tìm video theo token đầy đủ + tiền tố: kết quả đúng, mới trước, phân trang không trùng."""
+import pytest
+
+import database as db
+
+TITLES = {
+    "v01": "Son Tung MTP live", "v02": "Sơn Tùng hát mới", "v03": "son tung song", "v04": "Son Ha concert",
+    "v05": "Tung hoa", "v06": "MTP son tung remix", "v07": "nhạc sơn ca", "v08": "Sonny tung tăng",
+}
+
+@pytest.fixture
+def indexed():
+    db.add_channel_to_db("UCsearch", "Search", "")
+    db.add_videos_to_db("UCsearch", [{"id": vid, "title": title, "published_at": 1000 + i}
+                                     for i, (vid, title) in enumerate(TITLES.items())])
+
+def all_pages(query, limit):
+    ids, cursor = [], 0
+    while True:
+        page, cursor = db.search(query, "videos", cursor, limit)
+        ids += page
+        if not cursor: return ids
+
+@pytest.mark.parametrize("query, expected", [
+    ("son", ["v08", "v07", "v06", "v04", "v03", "v02", "v01"]),  # chỉ tiền tố: son, sonny, song
+    ("son tu", ["v06", "v03", "v02", "v01"]),                    # son + (tung...), "sonny" không khớp "son"
+    ("tung so", ["v08", "v06", "v03", "v02", "v01"]),            # tung + (son | song | sonny)
+    ("mtp son tu", ["v06", "v01"]),
+    ("son xyz", []),
+])
+def test_search_videos(indexed, query, expected):
+    assert all_pages(query, 2) == expected
+    assert db.search(query, "videos", 0, 20)[0] == expected
+
+def test_scan_budget_pages_through_large_driver(indexed, monkeypatch):
+    monkeypatch.setattr(db, "SEARCH_SCAN_BUDGET", 1)
+    monkeypatch.setattr(db, "SEARCH_UNION_MAX", 0)  # luôn duyệt posting list của token đầy đủ
+    assert all_pages("son tu", 20) == ["v06", "v03", "v02", "v01"]
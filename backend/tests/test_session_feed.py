@@ -0,0 +1,84 @@
+"""Feed theo session: không trùng video trong 1 vòng, xem hết thì mở vòng mới trong đúng nguồn."""
+import asyncio
+import random
+
+import pytest
+
+import database as db
+import database_async as adb
+import pool_builder
+import sampler
+
+def add_channel(channel_id, count):
+    db.add_channel_to_db(channel_id, channel_id, "")
+    db.add_videos_to_db(channel_id, [{"id": f"{channel_id}v{i:04d}", "title": f"Video {i}",
+                                      "published_at": 1_700_000_000 + i} for i in range(count)])
+
+@pytest.fixture
+def global_sampler(monkeypatch):
+    monkeypatch.setattr(sampler, "global_sampler", sampler.GlobalSampler())
+    return sampler.global_sampler
+
+def test_exhausted_sub_feed_restarts_instead_of_falling_back_to_global(global_sampler):
+    add_channel("UCsub", 30)
+    add_channel("UCother", 50)
+    db.subscribe_channel("user1", "UCsub")
+    global_sampler.refresh()
+    assert global_sampler.ready()
+
+    popped = []
+    for _ in range(10):
+        db.init_feed_session("s1", "user1", "score_asc")
+        video_ids, _ = db.pop_session_video_ids("s1", 5)
+        popped += video_ids
+
+    assert len(popped) == 50
+    assert all(vid.startswith("UCsubv") for vid in popped)
+    # Vòng đầu: 30 video Sub không trùng, sau đó mới lặp lại
+    assert len(set(popped[:30])) == 30
+
+def test_guest_pages_do_not_repeat_across_snapshot_rebuilds():
+    videos = [{"id": f"g{i:03d}"} for i in range(20)]
+    seen, pages = set(), []
+    for page in range(4):
+        # Snapshot build lại trước mỗi trang: thứ tự (và built_at) đổi
+        random.Random(page).shuffle(videos)
+        snapshot = {"built_at": page, "videos": list(videos)}
+        picked, reset = pool_builder.session_page(snapshot, "guest1", seen, 5)
+        assert not reset
+        seen |= {v["id"] for v in picked}
+        pages += [v["id"] for v in picked]
+    assert len(set(pages)) == 20
+
+    # Đã xem hết -> trang sau mở vòng mới
+    picked, reset = pool_builder.session_page({"built_at": 5, "videos": videos}, "guest1", seen, 5)
+    assert reset and len(picked) == 5
+
+def legacy_subscribe(user_id, channel_id):
+    """Sub kiểu dữ liệu cũ: có user:{id}:subs nhưng chưa từng có user:{id}:feed"""
+    db.r.sadd(f"user:{user_id}:subs", channel_id)
+    db.r.sadd(f"channel:{channel_id}:followers", user_id)
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_subscribe_does_not_leave_legacy_user_with_partial_feed(use_async):
+    add_channel("UCold", 3)
+    add_channel("UCnew", 2)
+    legacy_subscribe("user1", "UCold")
+    if use_async:
+        async def subscribe():
+            await adb.subscribe_channel("user1", "UCnew")
+            await adb.close()
+        asyncio.run(subscribe())
+    else:
+        db.subscribe_channel("user1", "UCnew")
+
+    video_ids = db.get_subscribed_video_ids("user1", sort_by="time")
+    assert sorted(video_ids) == sorted([f"UColdv{i:04d}" for i in range(3)] + [f"UCnewv{i:04d}" for i in range(2)])
+
+def test_new_videos_do_not_leave_legacy_user_with_partial_feed():
+    add_channel("UCold", 3)
+    legacy_subscribe("user1", "UCold")
+    db.add_videos_to_db("UCold", [{"id": "UColdfresh", "title": "Mới", "published_at": 1_800_000_000}])
+
+    video_ids = db.get_subscribed_video_ids("user1", sort_by="time")
+    assert video_ids[0] == "UColdfresh" and len(video_ids) == 4
@@ -0,0 +1,65 @@
+"""Snapshot: import vào DB đang chạy không làm tụt điểm, trending + high-water mark đi kèm snapshot."""
+import database as db
+import snapshot
+
+def add_channel(channel_id, count):
+    db.add_channel_to_db(channel_id, channel_id, "")
+    db.add_videos_to_db(channel_id, [{"id": f"{channel_id}v{i}", "title": f"Video {i}",
+                                      "published_at": 1_700_000_000 + i} for i in range(count)])
+
+def test_round_trip_keeps_trending_and_hwm(tmp_path):
+    add_channel("UCa", 3)
+    db.set_channel_hwm("UCa", "UCav2")
+    pipe = db.r.pipeline(transaction=False)
+    db.queue_trending_views(pipe, {"UCav0": 5, "UCav1": 1}, now=1_700_000_000)
+    pipe.execute()
+    trending = db.r.zrange(db.TRENDING_KEY, 0, -1, withscores=True)
+    path = str(tmp_path / "data.snap")
+    snapshot.export_snapshot(path)
+
+    db.r.flushdb()
+    db.channel_cache.clear()
+    snapshot.import_snapshot(path)
+
+    assert db.get_channel_hwm("UCa") == "UCav2"
+    assert db.r.zrange(db.TRENDING_KEY, 0, -1, withscores=True) == trending
+    assert float(db.r.get(db.TRENDING_EPOCH_KEY)) == 1_700_000_000
+
+def test_import_into_live_db_does_not_lower_scores(tmp_path):
+    add_channel("UCa", 2)
+    db.r.zadd("videos:score", {"UCav0": 3, "UCav1": 3})
+    pipe = db.r.pipeline(transaction=False)
+    db.queue_trending_views(pipe, {"UCav0": 1}, now=1_700_000_000)
+    pipe.execute()
+    path = str(tmp_path / "data.snap")
+    snapshot.export_snapshot(path)
+
+    # DB tiếp tục chạy: có thêm view, epoch trending khác, kênh đã crawl tới video mới hơn
+    db.r.zadd("videos:score", {"UCav0": 10})
+    db.r.set(db.TRENDING_EPOCH_KEY, 1_700_000_000 + db.TRENDING_HALF_LIFE)
+    db.r.zadd(db.TRENDING_KEY, {"UCav0": 5.0})
+    db.set_channel_hwm("UCa", "UCav9")
+    snapshot.import_snapshot(path)
+
+    assert db.r.zscore("videos:score", "UCav0") == 10
+    assert db.r.zscore("videos:score", "UCav1") == 3
+    assert db.r.zscore(db.TRENDING_KEY, "UCav0") == 5.0
+    assert db.get_channel_hwm("UCa") == "UCav9"
+
+def test_trending_scores_are_shifted_to_local_epoch(tmp_path):
+    add_channel("UCa", 1)
+    pipe = db.r.pipeline(transaction=False)
+    db.queue_trending_views(pipe, {"UCav0": 1}, now=1_700_000_000 + db.TRENDING_HALF_LIFE)
+    pipe.execute()
+    path = str(tmp_path / "data.snap")
+    snapshot.export_snapshot(path)
+
+    db.r.flushdb()
+    db.r.set(db.TRENDING_EPOCH_KEY, 1_700_000_000)
+    snapshot.import_snapshot(path)
+
+    # Cùng 1 view lúc now, tính theo epoch của DB đích
+    local = db.r.pipeline(transaction=False)
+    db.queue_trending_views(local, {"UCbv0": 1}, now=1_700_000_000 + db.TRENDING_HALF_LIFE)
+    local.execute()
+    assert abs(db.r.zscore(db.TRENDING_KEY, "UCav0") - db.r.zscore(db.TRENDING_KEY, "UCbv0")) < 1e-9
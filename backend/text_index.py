@@ -0,0 +1,61 @@
+"""
+Tách từ cho tìm kiếm + các lệnh ghi index (đưa vào pipeline có sẵn của database.py).
+- Bỏ dấu tiếng Việt (NFD + bỏ dấu, đ -> d), chữ thường: "Đường Về Nhà" -> duong, ve, nha
+- Index trong Redis:
+    search:v:{token}  zset video_id -> published_at (video có token trong title)
+    search:c:{token}  zset channel_id -> 0 (kênh có token trong tên)
+    search:vocab      zset mọi token (score 0) để tìm theo tiền tố bằng ZRANGEBYLEX
+"""
+import re
+import unicodedata
+
+VOCAB_KEY = "search:vocab"
+MAX_TOKENS = 32
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def fold(text):
+    """Bỏ dấu + chữ thường"""
+    text = (text or "").replace("đ", "d").replace("Đ", "D")
+    text = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+def tokenize(text):
+    """Token không trùng, giữ thứ tự; bỏ token 1 ký tự chữ (quá nhiều kết quả)"""
+    tokens = dict.fromkeys(t for t in _TOKEN_RE.findall(fold(text)) if len(t) > 1 or t.isdigit())
+    return list(tokens)[:MAX_TOKENS]
+
+def video_token_key(token):
+    return f"search:v:{token}"
+
+def channel_token_key(token):
+    return f"search:c:{token}"
+
+def queue_index_video(pipe, video_id, title, published_at, old_title=None):
+    """Thêm video vào index (old_title: title cũ khi đổi title -> gỡ token không còn dùng)"""
+    tokens = tokenize(title)
+    if old_title is not None:
+        stale = set(tokenize(old_title)) - set(tokens)
+        for token in stale:
+            pipe.zrem(video_token_key(token), video_id)
+    for token in tokens:
+        pipe.zadd(video_token_key(token), {video_id: int(published_at)})
+    if tokens:
+        pipe.zadd(VOCAB_KEY, {token: 0 for token in tokens})
+
+def queue_unindex_video(pipe, video_id, title):
+    for token in tokenize(title):
+        pipe.zrem(video_token_key(token), video_id)
+
+def queue_index_channel(pipe, channel_id, name, old_name=None):
+    tokens = tokenize(name)
+    if old_name is not None:
+        for token in set(tokenize(old_name)) - set(tokens):
+            pipe.zrem(channel_token_key(token), channel_id)
+    for token in tokens:
+        pipe.zadd(channel_token_key(token), {channel_id: 0})
+    if tokens:
+        pipe.zadd(VOCAB_KEY, {token: 0 for token in tokens})
+
+def queue_unindex_channel(pipe, channel_id, name):
+    for token in tokenize(name):
+        pipe.zrem(channel_token_key(token), channel_id)
@@ -0,0 +1,86 @@
+"""
+Gom lượt view trong RAM rồi ghi Redis theo lô (write-behind).
+Thay vì 1 ZINCRBY cho mỗi view, cộng dồn theo video rồi flush bằng 1 pipeline
+khi đủ số lượng (FLUSH_MAX_PENDING) hoặc đủ thời gian (FLUSH_INTERVAL).
+Chỉ thread nền mới ghi Redis: add() chạy trên event loop nên không bao giờ được chặn.
+"""
+import os
+import threading
+
+import database as db
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "2"))
+FLUSH_MAX_PENDING = int(os.getenv("VIEW_FLUSH_MAX_PENDING", "500"))
+
+class ViewAggregator:
+    def __init__(self, flush_interval=FLUSH_INTERVAL, max_pending=FLUSH_MAX_PENDING, writer=None):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.writer = writer or db.increase_video_scores
+        self._counts = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {"views": 0, "flushes": 0, "videos_written": 0}
+
+    def add(self, video_id, count=1):
+        """Ghi nhận view (chỉ thao tác RAM). Đủ ngưỡng thì đánh thức thread flush, không ghi tại chỗ."""
+        with self._lock:
+            self._counts[video_id] = self._counts.get(video_id, 0) + count
+            self._pending += count
+            self.stats["views"] += count
+            should_flush = self._pending >= self.max_pending
+        if should_flush:
+            self._wake.set()
+
+    def flush(self):
+        """Ghi toàn bộ view đang gom xuống Redis bằng 1 pipeline. Trả về số video đã ghi, None nếu lỗi."""
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts, self._pending = self._counts, {}, 0
+            if not counts: return 0
+            try:
+                self.writer(counts)
+            except Exception as e:
+                # Redis lỗi -> trả view lại buffer để lần sau ghi tiếp
+                logger.warning("⚠️ [Views] Flush lỗi, giữ lại %d video: %s", len(counts), e)
+                with self._lock:
+                    for vid, n in counts.items():
+                        self._counts[vid] = self._counts.get(vid, 0) + n
+                        self._pending += n
+                return None
+            self.stats["flushes"] += 1
+            self.stats["videos_written"] += len(counts)
+            return len(counts)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set(): break
+            if self.flush() is None:
+                # Redis lỗi: chờ hết 1 chu kỳ rồi mới thử lại, kể cả khi buffer đã vượt ngưỡng
+                self._stop.wait(self.flush_interval)
+
+    def start(self):
+        if self._thread: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="view-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Dừng thread và flush phần còn lại (gọi lúc shutdown)"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+aggregator = ViewAggregator()
@@ -1,21 +1,50 @@
 import scrapetube
-import requests
-import re
 import json
+import os
 import time
-from database import add_video_to_db, add_channel_to_db
+import logging
+import http_client
+import channel_page
+import metrics
+import media_cache
+from logs import get_logger, sampled
+from concurrent.futures import ThreadPoolExecutor
+from database import (
+    add_videos_to_db, add_channel_to_db, get_channel_hwm, set_channel_hwm,
+    get_oembed_failures, mark_oembed_failures,
+)
+
+logger = get_logger(__name__)
+
+# Cho phép trỏ sang server giả lập khi benchmark
+YOUTUBE_BASE_URL = os.getenv("YOUTUBE_BASE_URL", "https://www.youtube.com")
+
+# scrapetube tự tạo requests.Session riêng cho mỗi lần quét -> gắn rate limit theo host của
+# http_client vào session đó, để mọi request tới YouTube (kể cả phân trang) dùng chung 1 limiter.
+# Giãn cách giữa các trang giờ do limiter lo, SCRAPETUBE_SLEEP chỉ là khoảng nghỉ cộng thêm.
+SCRAPETUBE_SLEEP = float(os.getenv("SCRAPETUBE_SLEEP", "0"))
+_scrapetube_session = scrapetube.scrapetube.get_session
+scrapetube.scrapetube.get_session = lambda proxies=None: http_client.rate_limited(_scrapetube_session(proxies))
 
 # === 1. HÀM CỨU VIỆN (GỌI OEMBED) ===
+OEMBED_CONCURRENCY = int(os.getenv("OEMBED_CONCURRENCY", "8"))
+# Chỉ các mã này mới chắc chắn video không xem được (private/xóa) -> được negative cache.
+# 429, 5xx... là lỗi tạm thời, xử lý như lỗi mạng.
+OEMBED_DEAD_STATUSES = frozenset((401, 403, 404))
+
 def fetch_video_info_fallback(video_id):
     """
     Khi scrapetube không trả về title, dùng hàm này để hỏi trực tiếp YouTube.
     API: oEmbed (Công khai, không cần key, rất nhanh)
+    Trả về dict info, {} nếu video chắc chắn không xem được (401/403/404),
+    None nếu lỗi mạng hoặc lỗi tạm thời (429, 5xx...).
     """
     try:
         # URL chuẩn để hỏi info video
-        url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
+        url = f"{YOUTUBE_BASE_URL}/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
         
-        response = requests.get(url, timeout=5)
+        response = http_client.get(url, timeout=5)
+        metrics.CRAWL_HTTP_BYTES.inc(len(response.content))
         if response.status_code == 200:
             data = response.json()
             return {
@@ -23,148 +52,260 @@ def fetch_video_info_fallback(video_id):
                 "author_name": data.get("author_name"), # Tiện thể lấy luôn tên kênh chuẩn
                 "author_url": data.get("author_url")
             }
+        if response.status_code in OEMBED_DEAD_STATUSES:
+            return {}
+        metrics.CRAWL_ERRORS.inc(stage="oembed")
+        sampled(logger, logging.WARNING, "⚠️ oEmbed trả %s cho video %s, để lần sau thử lại",
+                response.status_code, video_id, rate=0.1)
+        return None
     except Exception as e:
-        print(f"⚠️ Lỗi gọi oEmbed cho video {video_id}: {e}")
+        metrics.CRAWL_ERRORS.inc(stage="oembed")
+        sampled(logger, logging.WARNING, "⚠️ Lỗi gọi oEmbed cho video %s: %s", video_id, e, rate=0.1)
     
     return None
 
-# === 2. HÀM TÌM TEXT ĐỆ QUY (GIỮ LẠI) ===
-def find_text_recursive(data, target_keys=['text', 'simpleText', 'label']):
-    found_texts = []
-    if isinstance(data, dict):
-        for k, v in data.items():
-            if k in target_keys and isinstance(v, str):
-                if len(v) > 5 and not v.replace(':', '').isdigit(): 
-                    found_texts.append(v)
-            elif isinstance(v, (dict, list)):
-                found_texts.extend(find_text_recursive(v, target_keys))
-    elif isinstance(data, list):
-        for item in data:
-            found_texts.extend(find_text_recursive(item, target_keys))
-    return found_texts
+def fetch_titles_fallback(video_ids, unresolved=None):
+    """
+    Gọi oEmbed song song cho cả lô video thiếu title. Trả về {video_id: title}.
+    Video đã từng bị YouTube từ chối (negative cache) thì bỏ qua, không gọi lại.
+    unresolved (list, tùy chọn): nhận thêm ID bị lỗi mạng/lỗi tạm thời (chưa biết có title hay không).
+    """
+    known_bad = get_oembed_failures(video_ids)
+    to_fetch = [vid for vid in video_ids if vid not in known_bad]
+    metrics.CRAWL_OEMBED_SKIPPED.inc(len(known_bad))
+    if not to_fetch: return {}
+
+    metrics.CRAWL_OEMBED_FALLBACKS.inc(len(to_fetch))
+    logger.debug("🔦 Đang gọi API oEmbed để lấy info cho %d video...", len(to_fetch))
+    with ThreadPoolExecutor(max_workers=min(OEMBED_CONCURRENCY, len(to_fetch))) as pool:
+        infos = list(pool.map(fetch_video_info_fallback, to_fetch))
 
-# === 3. HÀM TRÍCH XUẤT TIÊU ĐỀ (LOGIC MỚI) ===
-def extract_video_info(video):
+    titles, failed = {}, []
+    for video_id, info in zip(to_fetch, infos):
+        if info and info.get("title"):
+            titles[video_id] = info["title"]
+        elif info is not None:
+            # YouTube trả lời rõ ràng là không có -> nhớ lại; lỗi mạng/429/5xx thì lần sau thử tiếp
+            failed.append(video_id)
+        elif unresolved is not None:
+            unresolved.append(video_id)
+    mark_oembed_failures(failed)
+    return titles
+
+# === 2. HÀM TÌM TEXT (DUYỆT KHÔNG ĐỆ QUY) ===
+TEXT_KEYS = frozenset(('text', 'simpleText', 'label'))
+MAX_WALK_NODES = 5000
+
+# Các vị trí title quen thuộc trong renderer của scrapetube (thử trước, rất rẻ)
+TITLE_PATHS = (
+    ('headline', 'runs', 0, 'text'),
+    ('headline', 'simpleText'),
+    ('title', 'runs', 0, 'text'),
+    ('title', 'simpleText'),
+    ('overlayMetadata', 'primaryText', 'content'),
+)
+
+def _get_path(data, path):
+    for key in path:
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return data if isinstance(data, str) else None
+
+def _is_title_like(text):
+    return len(text) > 5 and not text.replace(':', '').isdigit()
+
+def find_best_text(data, target_keys=TEXT_KEYS, max_nodes=MAX_WALK_NODES):
     """
-    Trả về (title, channel_name_fallback)
+    Duyệt renderer bằng stack (không đệ quy, không tạo list trung gian),
+    chỉ giữ lại chuỗi dài nhất thay vì gom tất cả rồi mới max().
     """
-    video_id = video.get('videoId')
-    title = None
+    best = None
+    stack = [data]
+    visited = 0
+    while stack and visited < max_nodes:
+        node = stack.pop()
+        visited += 1
+        if isinstance(node, dict):
+            for k, v in node.items():
+                if isinstance(v, str):
+                    if k in target_keys and (best is None or len(v) > len(best)) and _is_title_like(v):
+                        best = v
+                elif isinstance(v, (dict, list)):
+                    stack.append(v)
+        elif isinstance(node, list):
+            stack.extend(item for item in node if isinstance(item, (dict, list)))
+    return best
 
-    # CÁCH 1: Tìm trong JSON có sẵn (Nhanh nhất)
-    try:
-        if 'headline' in video: title = video['headline']['runs'][0]['text']
-        elif 'title' in video:
-            if 'runs' in video['title']: title = video['title']['runs'][0]['text']
-            elif 'simpleText' in video['title']: title = video['title']['simpleText']
-    except: pass
+# === 3. HÀM TRÍCH XUẤT TIÊU ĐỀ (LOGIC MỚI) ===
+def extract_title(video):
+    """Lấy title từ JSON có sẵn, không gọi mạng. Không tìm thấy thì trả về None."""
+    # CÁCH 1: Các vị trí quen thuộc (Nhanh nhất)
+    for path in TITLE_PATHS:
+        title = _get_path(video, path)
+        if title: return title
+
+    # CÁCH 2: Vét cạn (có giới hạn số node)
+    return find_best_text(video)
 
-    # CÁCH 2: Vét cạn recursive
-    if not title:
-        candidates = find_text_recursive(video)
-        if candidates: title = max(candidates, key=len)
+def extract_video_info(video):
+    """
+    Trả về title (gọi oEmbed cho riêng video này nếu JSON không có).
+    Crawl nhiều video thì dùng extract_title + fetch_titles_fallback để gọi oEmbed theo lô.
+    """
+    title = extract_title(video)
 
     # CÁCH 3: GỌI CỨU VIỆN (Nếu Cách 1 & 2 thất bại)
     if not title or title == "Unknown Title":
-        print(f"🔦 Đang gọi API oEmbed để lấy info cho: {video_id}...")
-        fallback_data = fetch_video_info_fallback(video_id)
-        if fallback_data and fallback_data.get("title"):
-            return fallback_data["title"]
+        title = fetch_titles_fallback([video.get('videoId')]).get(video.get('videoId'))
 
     return title if title else "Unknown Title"
 
 # === 4. CÁC HÀM HỖ TRỢ KHÁC ===
-def get_channel_details(channel_id):
-    url = f"https://www.youtube.com/channel/{channel_id}"
-    print(f"🔄 Đang cập nhật info kênh: {url}")
+def get_channel_details(channel_id, stats=None):
+    """Lỗi thì trả về tên/avatar mặc định; có stats thì cộng thêm vào stats["errors"]"""
+    url = f"{YOUTUBE_BASE_URL}/channel/{channel_id}"
+    logger.debug("🔄 Đang cập nhật info kênh: %s", url)
     try:
-        headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)", "Accept-Language": "en-US"}
-        response = requests.get(url, headers=headers, timeout=10)
-        html = response.text
-        
-        # 1. Lấy Tên
-        channel_name = f"Channel {channel_id}"
-        name_match = re.search(r'<meta property="og:title" content="(.*?)">', html)
-        if name_match: channel_name = name_match.group(1)
-        
-        # 2. Lấy Avatar
-        avatar_url = "https://via.placeholder.com/150"
-        avatar_match = re.search(r'<meta property="og:image" content="(.*?)">', html)
-        if avatar_match: avatar_url = avatar_match.group(1)
-
-        # 3. Lấy Mô tả (Nâng cấp)
-        description = ""
-        
-        # Cách 1: Thử tìm trong JSON (Thường chứa full text nhất)
-        json_match = re.search(r'"description":\{"simpleText":"(.*?)"\}', html)
-        if json_match:
-            # Giải mã ký tự xuống dòng của JSON
-            description = json_match.group(1).replace('\\n', '\n')
-        
-        # Cách 2: Nếu không có JSON, dùng thẻ Meta (Thêm re.DOTALL để lấy xuống dòng)
-        if not description:
-            desc_match = re.search(r'<meta property="og:description" content="(.*?)">', html, re.DOTALL)
-            if desc_match: description = desc_match.group(1)
-        
-        # Cleanup: Xóa các ký tự thừa nếu có
-        if description:
-            description = description.replace('&quot;', '"').replace('&#39;', "'")
-
-        return channel_name, avatar_url, description
+        # Đọc stream, đủ tên/avatar/mô tả là dừng; trang không đổi (304) thì dùng lại kết quả cũ
+        return channel_page.fetch_channel_details(url, channel_id)
     except Exception as e:
-        print(f"⚠️ Lỗi lấy info kênh {channel_id}: {e}")
+        metrics.CRAWL_ERRORS.inc(stage="channel_page")
+        logger.warning("⚠️ Lỗi lấy info kênh %s: %s", channel_id, e)
+        if stats is not None:
+            stats["errors"] += 1
         return f"Channel {channel_id}", "https://via.placeholder.com/150", ""
 
 def get_channel_id_from_url(url):
     try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=10)
-        match = re.search(r'"browseId":"(UC[\w-]+)"', response.text)
-        if match: return match.group(1)
-        match = re.search(r'itemprop="identifier" content="(UC[\w-]+)"', response.text)
-        if match: return match.group(1)
-        return None
+        return channel_page.resolve_channel_id(url)
+    except: return None
+
+async def get_channel_id_from_url_async(url):
+    """Bản async cho API (không chặn event loop)"""
+    try:
+        return await channel_page.resolve_channel_id_async(url)
     except: return None
 
 # === 5. WORKER CHÍNH ===
-def sync_channel_data(channel_id, limit=100):
-    """Hàm cốt lõi: Quét video từ ID kênh và lưu vào DB"""
-    print(f"🚀 Worker: Bắt đầu quét video kênh {channel_id}...")
+SYNC_CHUNK_SIZE = 25
+
+class SyncError(Exception):
+    """Lần quét kênh có lỗi (phần đã lưu vẫn giữ) -> job trong hàng đợi cần được retry"""
+
+def sync_channel_data(channel_id, limit=100, incremental=True, heartbeat=None, raise_on_error=False):
+    """
+    Hàm cốt lõi: Quét video từ ID kênh và lưu vào DB. Trả về số video mới.
+    Video được xử lý theo lô SYNC_CHUNK_SIZE: title thiếu trong lô thì gọi oEmbed song song,
+    rồi ghi cả lô bằng add_videos_to_db (2 round trip / lô).
+    incremental=True: video trả về theo thứ tự mới -> cũ, nên gặp high-water mark hoặc
+    lô có video đã biết là dừng luôn, không tải thêm trang.
+    High-water mark chỉ được dời khi lần quét không có lỗi nào (cào, trích xuất, oEmbed, ghi DB),
+    nếu không lần sau sẽ dừng ở HWM mới và bỏ sót video chưa lưu được.
+    heartbeat: gọi sau mỗi lô (chạy từ hàng đợi job thì là job_queue.extend, xem JOB_HANDLERS).
+    raise_on_error=True: quét có lỗi thì raise SyncError sau khi đã lưu phần làm được,
+    để hàng đợi job retry/backoff/dead-letter thay vì coi là xong.
+    """
+    logger.debug("🚀 Worker: Bắt đầu quét video kênh %s...", channel_id)
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "errors": 0}
+    known_hwm = get_channel_hwm(channel_id)
+    hwm = known_hwm if incremental else None
+    # Kênh chưa quét xong lần nào: video nào cũng "mới" -> không tính vào tần suất đăng
+    track_arrivals = known_hwm is not None
+    newest_id = None
+    # Video đứng trước (mới hơn) được published_at lớn hơn, giữ đúng thứ tự của kênh
+    started_at = int(time.time())
+    position = 0
+    chunk = []
     try:
-        # Lấy số video mới nhất theo limit
-        videos = scrapetube.get_channel(channel_id=channel_id, content_type="shorts", sleep=1, limit=limit)
-        count = 0
+        # Lấy số video mới nhất theo limit (generator: chỉ tải trang tiếp khi cần)
+        videos = scrapetube.get_channel(channel_id=channel_id, content_type="shorts", sleep=SCRAPETUBE_SLEEP, limit=limit)
         for video in videos:
             try:
                 if 'videoId' not in video: continue
                 video_id = video['videoId']
-                
-                title = extract_video_info(video)
-                thumbnail_url = f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
-                
-                if title == "Unknown Title": continue
-
-                add_video_to_db(channel_id, video_id, title, thumbnail_url)
-                count += 1
+                if newest_id is None: newest_id = video_id
+
+                if incremental and video_id == hwm:
+                    logger.debug("⏹️ Worker: Gặp high-water mark %s -> dừng quét.", video_id)
+                    break
+
+                chunk.append({"id": video_id, "title": extract_title(video), "published_at": started_at - position})
+                position += 1
+                if len(chunk) >= SYNC_CHUNK_SIZE:
+                    known = _store_chunk(channel_id, chunk, stats, track_arrivals)
+                    chunk = []
+                    if heartbeat: heartbeat()
+                    if incremental and known:
+                        logger.debug("⏹️ Worker: Lô vừa ghi có video đã biết -> dừng quét.")
+                        break
             except Exception as e: 
+                metrics.CRAWL_ERRORS.inc(stage="extract")
+                stats["errors"] += 1
                 continue
     except Exception as e:
-        print(f"⚠️ Worker: Lỗi khi cào video: {e}")
+        metrics.CRAWL_ERRORS.inc(stage="scrape")
+        stats["errors"] += 1
+        logger.warning("⚠️ Worker: Lỗi khi cào video kênh %s: %s", channel_id, e)
+
+    if chunk:
+        _store_chunk(channel_id, chunk, stats, track_arrivals)
 
-    print(f"✅ Worker: Quét xong {count} video cho kênh {channel_id}.")
+    count = stats["inserted"]
+    logger.info("✅ Worker: Quét xong %d video mới (%d đổi title) cho kênh %s.", count, stats["updated"], channel_id)
 
     # Cập nhật lại Avatar/Tên/Mô tả 
-    new_name, new_avatar, new_desc = get_channel_details(channel_id)
+    new_name, new_avatar, new_desc = get_channel_details(channel_id, stats)
     # Gọi hàm DB mới có thêm tham số description
     add_channel_to_db(channel_id, new_name, new_avatar, new_desc)
-    
-    return True
+    media_cache.prefetch_avatar(channel_id, new_avatar)
+    if stats["errors"]:
+        logger.warning("⚠️ Worker: Kênh %s quét có %d lỗi -> giữ nguyên high-water mark.", channel_id, stats["errors"])
+    elif newest_id and newest_id != hwm:
+        set_channel_hwm(channel_id, newest_id)
+    if stats["errors"] and raise_on_error:
+        raise SyncError(f"Kênh {channel_id}: {stats['errors']} lỗi khi quét")
+    return count
+
+def _store_chunk(channel_id, chunk, stats, track_arrivals):
+    """
+    Bổ sung title bằng oEmbed (song song) cho video thiếu, rồi ghi cả lô.
+    Cộng dồn số inserted/updated/unchanged vào stats, trả về số video đã có từ trước.
+    Lỗi ghi DB hoặc video chưa lấy được title vì lỗi mạng được cộng vào stats["errors"].
+    """
+    metrics.CRAWL_VIDEOS_SCRAPED.inc(len(chunk))
+    missing = [v["id"] for v in chunk if not v["title"] or v["title"] == "Unknown Title"]
+    unresolved = []
+    fallback = fetch_titles_fallback(missing, unresolved) if missing else {}
+    stats["errors"] += len(unresolved)
+
+    batch = []
+    for video in chunk:
+        title = fallback.get(video["id"], video["title"])
+        if not title or title == "Unknown Title": continue
+        batch.append({**video, "title": title,
+                      "thumbnail": f"https://i.ytimg.com/vi/{video['id']}/hqdefault.jpg"})
+    try:
+        result = add_videos_to_db(channel_id, batch, track_arrivals=track_arrivals)
+    except Exception as e:
+        metrics.CRAWL_ERRORS.inc(stage="store")
+        logger.warning("⚠️ Worker: Lỗi lưu %d video: %s", len(batch), e)
+        stats["errors"] += 1
+        return 0
+    for key in ("inserted", "updated", "unchanged"):
+        stats[key] += result[key]
+        metrics.CRAWL_VIDEOS_STORED.inc(result[key], result=key)
+    # Tải sẵn thumbnail video mới vào cache ảnh (chỉ khi bật MEDIA_PROXY_URL)
+    new_ids = set(result["new_ids"])
+    media_cache.prefetch_thumbnails([v for v in batch if v["id"] in new_ids])
+    return result["updated"] + result["unchanged"]
 
 def sync_full_channel(channel_url):
     """Dùng cho lúc Add Channel (Có URL)"""
     real_channel_id = get_channel_id_from_url(channel_url)
     if not real_channel_id:
-        print(f"❌ Worker: Không lấy được ID từ {channel_url}")
+        logger.warning("❌ Worker: Không lấy được ID từ %s", channel_url)
         return
     
     # Gọi hàm chung
@@ -176,3 +317,54 @@ def sync_channel_by_id(channel_id):
     sync_channel_data(channel_id)
 
 
+
+# === 6. PROCESS WORKER (ĐỌC JOB TỪ HÀNG ĐỢI REDIS) ===
+# Chạy: python worker.py  (chạy nhiều process để tăng tốc độ crawl)
+# handler(job, heartbeat): job dài gọi heartbeat() định kỳ để gia hạn visibility timeout
+JOB_HANDLERS = {
+    "sync_channel": lambda job, heartbeat: sync_channel_data(
+        job["channel_id"], limit=int(job.get("limit", 100)), heartbeat=heartbeat, raise_on_error=True),
+}
+
+def process_job(job):
+    """Chạy 1 job đã reserve: xong thì ack, handler raise thì fail (retry với backoff / dead-letter)"""
+    import job_queue
+
+    handler = JOB_HANDLERS.get(job["kind"])
+    try:
+        if not handler:
+            raise ValueError(f"Không có handler cho job {job['kind']}")
+        handler(job, lambda: job_queue.extend(job))
+        job_queue.ack(job)
+        metrics.JOBS_PROCESSED.inc(kind=job["kind"], status="ok")
+        return True
+    except Exception as e:
+        metrics.JOBS_PROCESSED.inc(kind=job["kind"], status="error")
+        logger.warning("⚠️ Worker: Job %s (%s) lỗi: %s", job["id"], job["kind"], e)
+        job_queue.fail(job, e)
+        return False
+
+def run_worker(poll_interval=1.0):
+    import signal
+    import job_queue
+
+    stopping = []
+    def stop(*_):
+        logger.info("🛑 Worker: Nhận tín hiệu dừng, chạy nốt job hiện tại...")
+        stopping.append(True)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    metrics.serve()
+    logger.info("👷 Worker: Đang chờ job...")
+    while not stopping:
+        job = job_queue.reserve()
+        if not job:
+            time.sleep(poll_interval)
+            continue
+        process_job(job)
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    run_worker()
@@ -6,6 +6,8 @@ const ExploreModal = ({ isOpen, onClose, userId, onListChanged }) => {
   const [channels, setChannels] = useState([]);
   const [loading, setLoading] = useState(false);
   const [subbedIds, setSubbedIds] = useState([]);
+  // Cursor trang tiếp theo (server trả trong header X-Next-Cursor, "0" = hết)
+  const [nextCursor, setNextCursor] = useState('0');
   
   // State lưu kênh đang được đọc mô tả chi tiết (để hiện modal phụ)
   const [readingChannel, setReadingChannel] = useState(null);
@@ -17,12 +19,18 @@ const ExploreModal = ({ isOpen, onClose, userId, onListChanged }) => {
     }
   }, [isOpen, userId]);
 
-  const fetchExploreChannels = async () => {
+  const fetchExploreChannels = async (cursor = '0') => {
     setLoading(true);
     try {
       const API_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
-      const res = await axios.get(`${API_URL}/api/channels/explore?user_id=${userId}`);
-      setChannels(res.data);
+      const res = await axios.get(`${API_URL}/api/channels/explore?user_id=${userId}&cursor=${cursor}`);
+      // Bỏ kênh trùng (thứ hạng có thể xê dịch giữa 2 lần tải trang)
+      setChannels(prev => {
+        if (cursor === '0') return res.data;
+        const seen = new Set(prev.map(c => c.id));
+        return [...prev, ...res.data.filter(c => !seen.has(c.id))];
+      });
+      setNextCursor(res.headers['x-next-cursor'] || '0');
     } catch (error) {
       console.error("Lỗi tải kênh gợi ý:", error);
     } finally {
@@ -67,7 +75,7 @@ const ExploreModal = ({ isOpen, onClose, userId, onListChanged }) => {
         </div>
 
         <div style={listStyle}>
-          {loading ? (
+          {loading && channels.length === 0 ? (
             <p style={{ textAlign: 'center', color: '#888', marginTop: '20px' }}>Đang tìm kênh thú vị...</p>
           ) : channels.length === 0 ? (
             <p style={{ textAlign: 'center', color: '#888', marginTop: '20px' }}>
@@ -157,6 +165,15 @@ const ExploreModal = ({ isOpen, onClose, userId, onListChanged }) => {
                 );
             })
           )}
+          {nextCursor !== '0' && (
+            <button
+                onClick={() => fetchExploreChannels(nextCursor)}
+                disabled={loading}
+                style={loadMoreBtnStyle}
+            >
+                {loading ? 'Đang tải...' : 'Xem thêm kênh'}
+            </button>
+          )}
         </div>
       </div>
 
@@ -235,6 +252,12 @@ const unsubBtnStyle = {
   display: 'flex', alignItems: 'center', gap: '5px', fontSize: '13px'
 };
 
+const loadMoreBtnStyle = {
+  backgroundColor: 'transparent', color: '#3ea6ff', border: '1px solid #3a3a3a',
+  padding: '8px 12px', borderRadius: '20px', cursor: 'pointer',
+  width: '100%', marginTop: '10px', fontSize: '13px', fontWeight: '600'
+};
+
 // --- STYLES CHO SUB-MODAL ---
 const subModalOverlayStyle = {
     position: 'fixed', // Đổi từ absolute sang fixed để chắc chắn full màn hình
@@ -13,6 +13,10 @@ import VideoCard from './VideoCard';
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
 const generateSessionId = () => Math.random().toString(36).substring(2) + Date.now().toString(36);
 
+// Gom view rồi gửi 1 lần (POST /api/views) thay vì mỗi view 1 request
+const VIEW_FLUSH_SIZE = 5;
+const VIEW_FLUSH_INTERVAL = 10000;
+
 const VideoFeed = ({ userId, isCaptionOn, onToggleCaption, isMutedGlobal, onToggleMuteGlobal }) => {
   const [videos, setVideos] = useState([]);
   const [loading, setLoading] = useState(false);
@@ -25,6 +29,36 @@ const VideoFeed = ({ userId, isCaptionOn, onToggleCaption, isMutedGlobal, onTogg
   const [isPlaying, setIsPlaying] = useState(false); 
   const [isVideoLoaded, setIsVideoLoaded] = useState(false); 
   const [hasCountedView, setHasCountedView] = useState(false);
+  const pendingViewsRef = useRef([]);
+
+  const flushViews = () => {
+    const videoIds = pendingViewsRef.current;
+    if (videoIds.length === 0) return;
+    pendingViewsRef.current = [];
+    // keepalive: request vẫn được gửi kể cả khi user đóng tab
+    fetch(`${API_BASE_URL}/api/views`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ video_ids: videoIds }),
+      keepalive: true,
+    }).catch(() => {});
+  };
+
+  const queueView = (videoId) => {
+    pendingViewsRef.current.push(videoId);
+    if (pendingViewsRef.current.length >= VIEW_FLUSH_SIZE) flushViews();
+  };
+
+  useEffect(() => {
+    const interval = setInterval(flushViews, VIEW_FLUSH_INTERVAL);
+    const onHide = () => { if (document.visibilityState === 'hidden') flushViews(); };
+    document.addEventListener('visibilitychange', onHide);
+    return () => {
+      clearInterval(interval);
+      document.removeEventListener('visibilitychange', onHide);
+      flushViews();
+    };
+  }, []);
 
   const fetchVideos = async () => {
     if (loading || !hasMore) return;
@@ -140,7 +174,7 @@ const VideoFeed = ({ userId, isCaptionOn, onToggleCaption, isMutedGlobal, onTogg
         interval = setInterval(() => {
             if (playerRef.current && typeof playerRef.current.getCurrentTime === 'function') {
                 if (playerRef.current.getCurrentTime() >= 15) {
-                    axios.post(`${API_BASE_URL}/api/view/${videos[activeIndex].id}`).catch(()=>{});
+                    queueView(videos[activeIndex].id);
                     setHasCountedView(true);
                     clearInterval(interval);
                 }